@@ -0,0 +1,145 @@
+"""Benchmark del percorso sensore → PowerCoordinator → listener del PowerManager.
+
+Confronta il vecchio percorso (un task asyncio creato per ogni evento) con il
+percorso sincrono attuale (ricalcolo e notifica inline nel callback), misurando:
+
+- numero di task creati per evento;
+- iterazioni del loop e latenza tra ``hass.states.async_set`` e l'invocazione
+  del listener.
+
+Uso (dalla root del repository, con Home Assistant installato):
+
+    python benchmarks/bench_coordinator_dispatch.py --sensors 30 --events 20000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from homeassistant.core import CoreState, HomeAssistant, callback  # noqa: E402
+
+from custom_components.avoidblackout.coordinator import PowerCoordinator  # noqa: E402
+from custom_components.avoidblackout.dispatcher import StateUpdate  # noqa: E402
+
+
+class LegacyPowerCoordinator(PowerCoordinator):
+    """Riproduce il comportamento precedente: un task per ogni evento."""
+
+    @callback
+    def _handle_state_change(self, update: StateUpdate) -> None:
+        entity_id = update.entity_id
+        new_state = update.new_state
+        if new_state is None:
+            return
+        self._apply_sensor_value(entity_id, update.power)
+        self.hass.async_create_task(self._async_update_power_task())
+
+    async def _async_update_power_task(self) -> None:
+        self._async_publish_power()
+
+
+async def _run(coordinator_cls: type[PowerCoordinator], sensors: int, events: int) -> dict:
+    """Esegue il benchmark per una classe di coordinator.
+
+    Args:
+        coordinator_cls: Classe del coordinator da misurare
+        sensors: Numero di sensori di potenza
+        events: Numero di eventi da generare
+
+    Returns:
+        Dict con task e iterazioni per evento e percentili di latenza (µs)
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.set_state(CoreState.running)
+
+        entity_ids = [f"sensor.bench_power_{i}" for i in range(sensors)]
+        for entity_id in entity_ids:
+            hass.states.async_set(entity_id, "0")
+
+        # Coalescenza e deadband disattivate: si misura il solo percorso di dispatch
+        coordinator = coordinator_cls(
+            hass,
+            {
+                "power_sensors": entity_ids,
+                "max_threshold": 1_000_000,
+                "coalesce_window": 0,
+                "notify_deadband": 0,
+            },
+        )
+        await coordinator.async_start()
+
+        # Conta i task creati da hass durante la misura
+        created_tasks = 0
+        original_create_task = hass.async_create_task
+
+        def counting_create_task(*args, **kwargs):
+            nonlocal created_tasks
+            created_tasks += 1
+            return original_create_task(*args, **kwargs)
+
+        hass.async_create_task = counting_create_task
+
+        notified_at: list[float] = []
+
+        @callback
+        def _listener() -> None:
+            notified_at.append(time.perf_counter())
+
+        coordinator.async_add_listener(_listener)
+
+        latencies: list[float] = []
+        loop_iterations = 0
+
+        for index in range(events):
+            sent_at = time.perf_counter()
+            # Valore sempre diverso: ogni evento produce una notifica
+            hass.states.async_set(entity_ids[index % sensors], str(100 + index))
+            # Cede il loop finché il listener non è stato invocato
+            while len(notified_at) <= index:
+                loop_iterations += 1
+                await asyncio.sleep(0)
+            latencies.append(notified_at[index] - sent_at)
+
+        await hass.async_block_till_done()
+        await coordinator.async_stop()
+        hass.async_create_task = original_create_task
+        await hass.async_stop(force=True)
+
+    latencies_us = sorted(value * 1e6 for value in latencies)
+    return {
+        "tasks_per_event": created_tasks / events,
+        "iterations_per_event": loop_iterations / events,
+        "p50_us": statistics.median(latencies_us),
+        "p99_us": latencies_us[int(len(latencies_us) * 0.99) - 1],
+    }
+
+
+def main() -> None:
+    """Entry point del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sensors", type=int, default=30)
+    parser.add_argument("--events", type=int, default=20000)
+    args = parser.parse_args()
+
+    for label, coordinator_cls in (
+        ("prima (task per evento)", LegacyPowerCoordinator),
+        ("dopo (percorso sincrono)", PowerCoordinator),
+    ):
+        result = asyncio.run(_run(coordinator_cls, args.sensors, args.events))
+        print(
+            f"{label:28s} task/evento={result['tasks_per_event']:.2f} "
+            f"iterazioni/evento={result['iterations_per_event']:.2f} "
+            f"p50={result['p50_us']:.1f}µs p99={result['p99_us']:.1f}µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Latenza del percorso di emergenza: evento del sensore → chiamata turn_off.
+
+Con la soglia rigida (hard_threshold_pct) il PowerManager deve spegnere un carico
+senza attendere il debounce. Il benchmark usa il core reale di Home Assistant su
+un event loop normale: per ogni prova riporta la potenza sotto soglia, riaccende
+il carico, attende lo stato di monitoraggio e poi scrive un valore di potenza
+oltre la soglia rigida, misurando con perf_counter il tempo fino all'invocazione
+del servizio switch.turn_off.
+
+Esce con codice 1 se il p99 supera il target.
+
+Uso (dalla root del repository, con Home Assistant installato):
+
+    python benchmarks/bench_emergency_latency.py --trials 200 --target-ms 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from homeassistant.core import CoreState, HomeAssistant, ServiceCall  # noqa: E402
+
+from custom_components.avoidblackout.const import STATE_MONITORING  # noqa: E402
+from custom_components.avoidblackout.coordinator import PowerCoordinator  # noqa: E402
+from custom_components.avoidblackout.power_manager import PowerManager  # noqa: E402
+
+THRESHOLD = 3000
+HARD_THRESHOLD_PCT = 50
+SENSOR = "sensor.emergency_power"
+LOAD = "switch.emergency_load"
+BASE_POWER = 1500.0
+SEVERE_POWER = THRESHOLD * (1 + HARD_THRESHOLD_PCT / 100) + 500
+
+
+async def _wait_for(condition, timeout: float = 5.0) -> None:
+    """Cede il loop finché condition() non è vera.
+
+    Args:
+        condition: Predicato da attendere
+        timeout: Secondi massimi di attesa
+
+    Raises:
+        TimeoutError: Se la condizione non si verifica in tempo
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condizione non raggiunta")
+        await asyncio.sleep(0.01)
+
+
+async def _measure(trials: int, debounce: int) -> list[float]:
+    """Esegue le prove e restituisce le latenze in millisecondi.
+
+    Args:
+        trials: Numero di prove
+        debounce: Debounce configurato (deve essere ignorato dal percorso rapido)
+
+    Returns:
+        Latenze evento → turn_off in ms
+    """
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.set_state(CoreState.running)
+
+        hass.states.async_set(SENSOR, str(BASE_POWER), {"unit_of_measurement": "W"})
+        hass.states.async_set(LOAD, "on")
+        called_at: list[float] = []
+
+        async def _turn_off(call: ServiceCall) -> None:
+            called_at.append(time.perf_counter())
+            hass.states.async_set(LOAD, "off")
+            hass.states.async_set(SENSOR, str(BASE_POWER), {"unit_of_measurement": "W"})
+
+        hass.services.async_register("switch", "turn_off", _turn_off)
+
+        config = {
+            "power_sensors": [SENSOR],
+            "max_threshold": THRESHOLD,
+            "debounce_time": debounce,
+            "managed_entities": [LOAD],
+            "hard_threshold_pct": HARD_THRESHOLD_PCT,
+            "shed_verify_window": 0,
+        }
+        coordinator = PowerCoordinator(hass, config)
+        await coordinator.async_start()
+        manager = PowerManager(hass, coordinator, config)
+        await manager.async_start()
+
+        latencies: list[float] = []
+        for trial in range(trials):
+            hass.states.async_set(LOAD, "on")
+            # Valore leggermente diverso ad ogni prova: lo stato cambia sempre
+            hass.states.async_set(
+                SENSOR, f"{BASE_POWER + trial % 2:.1f}", {"unit_of_measurement": "W"}
+            )
+            await _wait_for(
+                lambda: manager.get_status()["state"] == STATE_MONITORING
+            )
+            await asyncio.sleep(0.06)  # oltre la finestra di coalescenza
+
+            expected = len(called_at) + 1
+            started = time.perf_counter()
+            hass.states.async_set(
+                SENSOR, f"{SEVERE_POWER + trial % 2:.1f}", {"unit_of_measurement": "W"}
+            )
+            await _wait_for(lambda: len(called_at) >= expected)
+            latencies.append((called_at[-1] - started) * 1000)
+
+        await manager.async_stop()
+        await coordinator.async_stop()
+        await hass.async_stop(force=True)
+
+    return latencies
+
+
+def main() -> None:
+    """Entry point del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trials", type=int, default=200)
+    parser.add_argument("--debounce", type=int, default=30)
+    parser.add_argument("--target-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    # I log di distacco dell'integrazione coprirebbero i risultati
+    logging.disable(logging.WARNING)
+
+    latencies = sorted(asyncio.run(_measure(args.trials, args.debounce)))
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"evento → turn_off su {len(latencies)} prove (debounce {args.debounce}s): "
+        f"p50={p50:.2f}ms p99={p99:.2f}ms max={latencies[-1]:.2f}ms "
+        f"(target {args.target_ms:.0f}ms)"
+    )
+    if p99 > args.target_ms:
+        print("Target di latenza superato")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
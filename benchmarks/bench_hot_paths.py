@@ -0,0 +1,166 @@
+"""Benchmark pytest-benchmark dei percorsi critici di coordinator e manager.
+
+Misura, sul sostituto di Home Assistant del pacchetto simulation:
+
+- _calculate_total_power con 1, 10, 100 e 1000 sensori;
+- il flusso degli eventi di stato fino a _handle_state_change (dispatcher incluso);
+- le transizioni MONITORING → WAITING → MONITORING di _handle_power_update;
+- la latenza completa evento del sensore → chiamata turn_off (soglia di emergenza).
+
+I tempi medi vengono confrontati con baseline.json (vedi conftest.py); la
+fixture loop a tempo virtuale è quella del conftest.py nella root.
+
+Uso (dalla root del repository, con pytest-benchmark installato):
+
+    python -m pytest benchmarks
+    python -m pytest benchmarks --update-baseline
+"""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.avoidblackout.const import STATE_MONITORING, STATE_WAITING
+from custom_components.avoidblackout.coordinator import PowerCoordinator
+from custom_components.avoidblackout.power_manager import PowerManager
+from simulation.clock import VirtualTimeLoop
+from simulation.hass import SimDispatcher, SimHomeAssistant, SimServiceCall
+
+THRESHOLD = 3000
+LOAD = "switch.bench_load"
+# Eventi per round nel benchmark di throughput
+EVENTS_PER_ROUND = 1000
+# Cicli di transizioni per round (eseguiti nel loop, come in Home Assistant)
+CYCLES_PER_ROUND = 100
+
+
+def _sensors(count: int) -> list[str]:
+    """Entity id dei sensori di potenza."""
+    return [f"sensor.bench_power_{index}" for index in range(count)]
+
+
+def _set_power(hass: SimHomeAssistant, entity_id: str, value: float) -> None:
+    """Scrive un valore di potenza su un sensore."""
+    hass.states.async_set(entity_id, f"{value:.1f}", {"unit_of_measurement": "W"})
+
+
+def _setup(
+    loop: VirtualTimeLoop, sensors: int = 1, **options
+) -> tuple[SimHomeAssistant, PowerCoordinator, PowerManager, list[SimServiceCall]]:
+    """Avvia coordinator e manager su un'istanza simulata.
+
+    Args:
+        loop: Loop a tempo virtuale
+        sensors: Numero di sensori di potenza
+        **options: Opzioni aggiuntive della configurazione
+
+    Returns:
+        Istanza, coordinator, manager e chiamate turn_off ricevute
+    """
+    hass = SimHomeAssistant(loop)
+    calls: list[SimServiceCall] = []
+
+    def _turn_off(call: SimServiceCall) -> None:
+        calls.append(call)
+        hass.states.async_set(call.data["entity_id"], "off")
+
+    hass.services.async_register("switch", "turn_off", _turn_off)
+    hass.states.async_set(LOAD, "on", {"current_power_w": 1500})
+    for index, entity_id in enumerate(_sensors(sensors)):
+        _set_power(hass, entity_id, 100 + index % 7)
+
+    config = {
+        "power_sensors": _sensors(sensors),
+        "max_threshold": THRESHOLD,
+        "debounce_time": 30,
+        "managed_entities": [LOAD],
+        "shed_verify_window": 0,
+        **options,
+    }
+    coordinator = PowerCoordinator(hass, config, SimDispatcher(hass))
+    manager = PowerManager(hass, coordinator, config)
+    loop.run_until_complete(coordinator.async_start())
+    loop.run_until_complete(manager.async_start())
+    # Lascia esaurire i task avviati da coordinator e manager
+    loop.run_until_complete(asyncio.sleep(2))
+    return hass, coordinator, manager, calls
+
+
+@pytest.mark.parametrize("sensors", [1, 10, 100, 1000])
+def test_calculate_total_power(benchmark, loop, sensors: int) -> None:
+    """Scansione completa dei sensori (avvio e risincronizzazione)."""
+    _, coordinator, _, _ = _setup(loop, sensors)
+
+    result = benchmark(coordinator._calculate_total_power)
+
+    assert result["total_power"] > 0
+
+
+def test_handle_state_change_throughput(benchmark, loop) -> None:
+    """EVENTS_PER_ROUND eventi di stato: macchina a stati, dispatcher e coordinator."""
+    hass, coordinator, _, _ = _setup(loop, 10)
+    sensors = _sensors(10)
+    # Valori alterni: ogni scrittura è un cambio di stato effettivo
+    values = [
+        (sensors[index % 10], 200.0 + (index // 10) % 2)
+        for index in range(EVENTS_PER_ROUND)
+    ]
+
+    def _dispatch() -> None:
+        for entity_id, value in values:
+            _set_power(hass, entity_id, value)
+
+    benchmark(_dispatch)
+
+    assert coordinator.data["sensor_values"]
+    # L'ultimo valore di ogni sensore è 201 W: il totale ha seguito ogni evento
+    assert coordinator._total_power == pytest.approx(2010.0)
+
+
+def test_handle_power_update_transitions(benchmark, loop) -> None:
+    """CYCLES_PER_ROUND cicli MONITORING → WAITING → MONITORING della macchina a stati."""
+    _, coordinator, manager, _ = _setup(loop)
+    over = {**coordinator.data, "total_power": THRESHOLD + 500, "is_over_threshold": True}
+    under = {**coordinator.data, "total_power": THRESHOLD - 500, "is_over_threshold": False}
+    states: list[str] = []
+
+    async def _cycles() -> None:
+        for _ in range(CYCLES_PER_ROUND):
+            coordinator.data = over
+            manager._handle_power_update()
+            states.append(manager.get_status()["state"])
+            coordinator.data = under
+            manager._handle_power_update()
+        # Lascia terminare i task di debounce annullati
+        await asyncio.sleep(0)
+
+    benchmark(lambda: loop.run_until_complete(_cycles()))
+
+    assert set(states) == {STATE_WAITING}
+    assert manager.get_status()["state"] == STATE_MONITORING
+
+
+def test_event_to_shed_latency(benchmark, loop) -> None:
+    """Evento del sensore oltre la soglia di emergenza → chiamata turn_off."""
+    hass, _, manager, calls = _setup(loop, hard_threshold_pct=50)
+    sensor = _sensors(1)[0]
+
+    def _reset() -> None:
+        hass.states.async_set(LOAD, "on", {"current_power_w": 1500})
+        _set_power(hass, sensor, 1500)
+        loop.run_until_complete(asyncio.sleep(5))
+        assert manager.get_status()["state"] == STATE_MONITORING
+
+    async def _wait_for_shed(expected: int) -> None:
+        while len(calls) < expected:
+            await asyncio.sleep(0)
+
+    def _trigger() -> None:
+        expected = len(calls) + 1
+        _set_power(hass, sensor, THRESHOLD * 1.5 + 500)
+        loop.run_until_complete(_wait_for_shed(expected))
+
+    benchmark.pedantic(_trigger, setup=_reset, rounds=200, iterations=1)
+
+    assert len(calls) >= 200
@@ -0,0 +1,211 @@
+"""Replay di tracce di potenza: distacco reattivo contro distacco predittivo.
+
+Riproduce tracce sintetiche a 1 Hz (rampe che superano la soglia e rampe che si
+assestano appena sotto) attraverso il PowerCoordinator e il PowerManager, sul
+sostituto di Home Assistant e sull'event loop a tempo virtuale del pacchetto
+simulation: i timer (debounce, coalescenza) scadono istantaneamente e una
+traccia di minuti viene eseguita in pochi millisecondi.
+
+Per ogni modalità misura:
+
+- tempo al distacco: secondi tra il superamento effettivo della soglia e lo
+  spegnimento del carico;
+- falsi allarmi: tracce che non superano mai la soglia ma in cui il manager ha
+  avviato un'attesa (falsi allarmi) o spento un carico (falsi distacchi);
+- distacchi anticipati: tracce che superano la soglia ma in cui il carico è
+  stato spento prima del superamento effettivo.
+
+Uso (dalla root del repository, con Home Assistant installato):
+
+    python benchmarks/bench_predictive_replay.py --traces 50 --debounce 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from homeassistant.core import callback  # noqa: E402
+
+from custom_components.avoidblackout.const import STATE_WAITING  # noqa: E402
+from custom_components.avoidblackout.coordinator import PowerCoordinator  # noqa: E402
+from custom_components.avoidblackout.power_manager import PowerManager  # noqa: E402
+from simulation.clock import VirtualTimeLoop  # noqa: E402
+from simulation.hass import SimDispatcher, SimHomeAssistant, SimServiceCall  # noqa: E402
+
+THRESHOLD = 3000
+SENSOR = "sensor.replay_power"
+LOAD = "switch.replay_load"
+
+
+def make_trace(rng: random.Random, crosses: bool, seconds: int = 180) -> list[float]:
+    """Genera una traccia a 1 Hz: base stabile, rampa e plateau con rumore.
+
+    Args:
+        rng: Generatore casuale
+        crosses: Se il plateau finale supera la soglia
+        seconds: Durata della traccia
+
+    Returns:
+        Potenze in Watt, un valore al secondo
+    """
+    base = rng.uniform(1200, 2000)
+    plateau = (
+        rng.uniform(THRESHOLD + 100, THRESHOLD + 1500)
+        if crosses
+        else rng.uniform(THRESHOLD - 400, THRESHOLD - 80)
+    )
+    ramp_start = rng.uniform(20, 40)
+    ramp_rate = rng.uniform(15, 80)  # W/s
+    trace = []
+    for second in range(seconds):
+        value = min(plateau, base + max(0.0, second - ramp_start) * ramp_rate)
+        trace.append(max(0.0, value + rng.gauss(0, 15)))
+    return trace
+
+
+async def _replay(trace: list[float], predictive: bool, debounce: int) -> dict:
+    """Riproduce una traccia e registra crossing, attese e distacchi.
+
+    Args:
+        trace: Potenze a 1 Hz
+        predictive: Se attivare il distacco predittivo
+        debounce: Tempo di debounce in secondi
+
+    Returns:
+        Dict con istante del crossing, del distacco e numero di attese avviate
+    """
+    loop = asyncio.get_running_loop()
+    hass = SimHomeAssistant(loop)
+
+    hass.states.async_set(SENSOR, "0", {"unit_of_measurement": "W"})
+    hass.states.async_set(LOAD, "on")
+    shed_at: list[float] = []
+
+    def _turn_off(call: SimServiceCall) -> None:
+        shed_at.append(loop.time())
+        hass.states.async_set(LOAD, "off")
+
+    hass.services.async_register("switch", "turn_off", _turn_off)
+
+    config = {
+        "power_sensors": [SENSOR],
+        "max_threshold": THRESHOLD,
+        "debounce_time": debounce,
+        "managed_entities": [LOAD],
+        "predictive_shedding": predictive,
+    }
+    coordinator = PowerCoordinator(hass, config, SimDispatcher(hass))
+    await coordinator.async_start()
+    manager = PowerManager(hass, coordinator, config)
+    await manager.async_start()
+
+    waits = 0
+    last_state = None
+
+    @callback
+    def _manager_update() -> None:
+        nonlocal waits, last_state
+        state = manager.get_status()["state"]
+        if state == STATE_WAITING and last_state != STATE_WAITING and not shed_at:
+            waits += 1
+        last_state = state
+
+    manager.async_add_listener(_manager_update)
+
+    start = loop.time()
+    crossed_at = None
+    for second, value in enumerate(trace):
+        # Lo spegnimento del carico riporta la potenza al livello di base
+        power = trace[0] if shed_at else value
+        if crossed_at is None and power > THRESHOLD:
+            crossed_at = start + second
+        hass.states.async_set(SENSOR, f"{power:.1f}", {"unit_of_measurement": "W"})
+        await asyncio.sleep(1)
+
+    await manager.async_stop()
+    await coordinator.async_stop()
+
+    return {
+        "crossed_at": crossed_at,
+        "shed_at": shed_at[0] if shed_at else None,
+        "waits": waits,
+    }
+
+
+def _run(args: argparse.Namespace, predictive: bool) -> dict:
+    """Esegue tutte le tracce in una modalità.
+
+    Args:
+        args: Argomenti da riga di comando
+        predictive: Se attivare il distacco predittivo
+
+    Returns:
+        Dict con statistiche di tempo al distacco e falsi allarmi
+    """
+    rng = random.Random(args.seed)
+    delays: list[float] = []
+    false_alarms = 0
+    false_sheds = 0
+    early_sheds = 0
+    negatives = 0
+
+    for index in range(args.traces):
+        crosses = index % 2 == 0
+        trace = make_trace(rng, crosses)
+        loop = VirtualTimeLoop()
+        try:
+            result = loop.run_until_complete(_replay(trace, predictive, args.debounce))
+        finally:
+            loop.close()
+
+        if result["crossed_at"] is not None:
+            if result["shed_at"] is not None:
+                delays.append(result["shed_at"] - result["crossed_at"])
+                early_sheds += result["shed_at"] < result["crossed_at"]
+        else:
+            negatives += 1
+            false_alarms += result["waits"] > 0
+            false_sheds += result["shed_at"] is not None
+
+    return {
+        "shed_mean": statistics.mean(delays) if delays else float("nan"),
+        "shed_min": min(delays) if delays else float("nan"),
+        "shed_max": max(delays) if delays else float("nan"),
+        "shed_count": len(delays),
+        "false_alarm_rate": false_alarms / negatives if negatives else 0.0,
+        "false_shed_rate": false_sheds / negatives if negatives else 0.0,
+        "early_shed_rate": early_sheds / len(delays) if delays else 0.0,
+    }
+
+
+def main() -> None:
+    """Entry point del benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--traces", type=int, default=50)
+    parser.add_argument("--debounce", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    # I log di distacco dell'integrazione coprirebbero i risultati
+    logging.disable(logging.WARNING)
+
+    for label, predictive in (("reattivo", False), ("predittivo", True)):
+        result = _run(args, predictive)
+        print(
+            f"{label:12s} tempo al distacco medio={result['shed_mean']:.1f}s "
+            f"min={result['shed_min']:.1f}s max={result['shed_max']:.1f}s "
+            f"(su {result['shed_count']} tracce) "
+            f"falsi allarmi={result['false_alarm_rate']:.0%} "
+            f"falsi distacchi={result['false_shed_rate']:.0%} "
+            f"anticipati={result['early_shed_rate']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
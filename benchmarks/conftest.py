@@ -0,0 +1,88 @@
+"""Configurazione pytest dei benchmark (pytest-benchmark) con controllo di regressione.
+
+Ogni benchmark che usa la fixture `benchmark` viene confrontato con il tempo medio
+salvato in baseline.json: il test fallisce se è più lento oltre la tolleranza.
+Le baseline si aggiornano sulla macchina di riferimento con --update-baseline.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Rallentamento tollerato rispetto alla baseline (0.5 = +50%)
+DEFAULT_TOLERANCE = 0.5
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Opzioni della riga di comando per le baseline."""
+    group = parser.getgroup("avoidblackout baseline")
+    group.addoption(
+        "--update-baseline",
+        action="store_true",
+        help="Salva i tempi medi misurati come nuova baseline",
+    )
+    group.addoption(
+        "--baseline-tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Rallentamento tollerato rispetto alla baseline (default 0.5 = +50%%)",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    """Carica le baseline salvate."""
+    try:
+        with open(BASELINE_FILE, encoding="utf-8") as file:
+            config.stash[_BASELINES] = json.load(file)
+    except FileNotFoundError:
+        config.stash[_BASELINES] = {}
+    config.stash[_MEASURED] = {}
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    """Scrive le nuove baseline se richiesto."""
+    measured = config.stash.get(_MEASURED, {})
+    if not config.getoption("--update-baseline") or not measured:
+        return
+    baselines = {**config.stash[_BASELINES], **measured}
+    with open(BASELINE_FILE, "w", encoding="utf-8") as file:
+        json.dump(dict(sorted(baselines.items())), file, indent=2)
+        file.write("\n")
+
+
+@pytest.fixture(autouse=True)
+def _check_baseline(request: pytest.FixtureRequest):
+    """Confronta il tempo medio del benchmark con la baseline salvata."""
+    if "benchmark" not in request.fixturenames:
+        yield
+        return
+    # Richiesta prima del test: la fixture benchmark viene chiusa dopo questa
+    benchmark = request.getfixturevalue("benchmark")
+    yield
+    if benchmark.disabled or benchmark.stats is None:
+        return
+
+    config = request.config
+    mean = benchmark.stats.stats.mean
+    name = request.node.name
+    config.stash[_MEASURED][name] = mean
+    baseline = config.stash[_BASELINES].get(name)
+    if baseline is None or config.getoption("--update-baseline"):
+        return
+    limit = baseline * (1 + config.getoption("--baseline-tolerance"))
+    if mean > limit:
+        pytest.fail(
+            f"Regressione: {name} media {mean * 1e6:.1f}µs, "
+            f"baseline {baseline * 1e6:.1f}µs (limite {limit * 1e6:.1f}µs)"
+        )
+
+
+_BASELINES = pytest.StashKey[dict]()
+_MEASURED = pytest.StashKey[dict]()
@@ -0,0 +1,29 @@
+"""Fixture condivise da test di comportamento e benchmark.
+
+Entrambe le suite girano sull'event loop a tempo virtuale del pacchetto
+simulation: debounce e scritture ritardate scadono istantaneamente.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import pytest
+
+from simulation.clock import VirtualTimeLoop
+
+
+@pytest.fixture
+def loop():
+    """Event loop a tempo virtuale, senza i log dell'integrazione."""
+    logging.disable(logging.WARNING)
+    loop = VirtualTimeLoop()
+    yield loop
+    # Annulla le attese ancora in corso prima di chiudere
+    tasks = asyncio.all_tasks(loop)
+    for task in tasks:
+        task.cancel()
+    if tasks:
+        loop.run_until_complete(asyncio.wait(tasks))
+    loop.close()
+    logging.disable(logging.NOTSET)
@@ -4,23 +4,31 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import Event, HomeAssistant, ServiceCall, callback
 from homeassistant.helpers.typing import ConfigType
 
-from homeassistant.const import CONF_NAME, Platform
+from homeassistant.const import CONF_NAME, EVENT_HOMEASSISTANT_STOP, Platform
 from .const import (
+    ADVANCED_OPTION_KEYS,
     CONF_DEBOUNCE_TIME,
     CONF_MANAGED_ENTITIES,
     CONF_MAX_THRESHOLD,
     CONF_POWER_SENSORS,
     CONF_TEST_MODE,
+    CONF_THRESHOLD_SCHEDULE,
+    DATA_DISPATCHER,
     DOMAIN,
+    OPTIONS_SAVE_DELAY,
     SERVICE_SIMULATE_OVERLOAD,
     SERVICE_RESET_HISTORY,
 )
 from .coordinator import PowerCoordinator
+from .dispatcher import StateDispatcher
+from .learner import DevicePowerLearner
+from .options_writer import OptionsWriter
 from .power_manager import PowerManager
+from .schedule import ThresholdSchedule, ThresholdScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -79,11 +87,26 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Recupera configurazione unendo data e options
     config = {**entry.data, **entry.options}
 
-    # Crea coordinator per monitoring
-    coordinator = PowerCoordinator(hass, config)
+    # Crea coordinator per monitoring: i cambi di stato arrivano dal dispatcher
+    # di dominio, che segue ogni entità una sola volta per tutte le entry
+    coordinator = PowerCoordinator(hass, config, _async_get_dispatcher(hass))
 
     # Crea PowerManager per load shedding
-    manager = PowerManager(hass, coordinator, config)
+    manager = PowerManager(hass, coordinator, config, entry.entry_id)
+
+    # Soglia per fasce orarie: la soglia della config entry vale fuori dalle fasce
+    schedule = None
+    if config.get(CONF_THRESHOLD_SCHEDULE):
+        try:
+            schedule = ThresholdSchedule.from_config(config[CONF_THRESHOLD_SCHEDULE])
+        except ValueError as err:
+            _LOGGER.error("Fasce orarie della soglia non valide, ignorate: %s", err)
+    scheduler = ThresholdScheduler(
+        hass, coordinator, manager, config[CONF_MAX_THRESHOLD], schedule
+    )
+
+    # Scrittura coalescente delle options modificate dai number entity
+    options_writer = OptionsWriter(hass, entry, config, OPTIONS_SAVE_DELAY)
 
     # Salva nel hass.data per accesso globale
     hass.data.setdefault(DOMAIN, {})
@@ -91,14 +114,21 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         "coordinator": coordinator,
         "manager": manager,
         "config": config,
+        "options_writer": options_writer,
+        "threshold_scheduler": scheduler,
     }
 
-    # Avvia manager
-    await manager.async_start()
-
-    # Avvia coordinator
+    # Avvia coordinator: i valori dei sensori sono pronti per il controllo iniziale
     await coordinator.async_start()
 
+    # Applica la fascia oraria corrente e programma la prossima transizione:
+    # il controllo iniziale del manager usa già la soglia in vigore adesso
+    scheduler.async_start()
+    entry.async_on_unload(scheduler.async_stop)
+
+    # Avvia manager (ripristina lo snapshot e valuta subito la potenza)
+    await manager.async_start()
+
     # Registra i servizi
     await _async_register_services(hass, entry)
 
@@ -108,6 +138,15 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Registra update listener per options flow
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
+    @callback
+    def _async_flush_options(_event: Event) -> None:
+        """Scrive le options in attesa prima che Home Assistant salvi le config entry."""
+        options_writer.async_flush()
+
+    entry.async_on_unload(
+        hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, _async_flush_options)
+    )
+
     _LOGGER.info(
         "Setup completato: %d sensori, %d dispositivi, soglia=%dW",
         len(config.get("power_sensors", [])),
@@ -118,6 +157,20 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+def _async_get_dispatcher(hass: HomeAssistant) -> StateDispatcher:
+    """Dispatcher dei cambi di stato condiviso da tutte le config entry.
+
+    Args:
+        hass: Istanza Home Assistant
+
+    Returns:
+        Dispatcher di dominio (creato al primo uso)
+    """
+    if DATA_DISPATCHER not in hass.data:
+        hass.data[DATA_DISPATCHER] = StateDispatcher(hass)
+    return hass.data[DATA_DISPATCHER]
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload dell'integrazione.
 
@@ -138,6 +191,12 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     coordinator: PowerCoordinator = data.get("coordinator")
     manager: PowerManager = data.get("manager")
 
+    # Scrive subito le modifiche runtime in attesa: le userà il prossimo setup
+    data["options_writer"].async_flush()
+
+    # Nessuna transizione della soglia durante l'arresto
+    data["threshold_scheduler"].async_stop()
+
     # Ferma manager
     if manager:
         await manager.async_stop()
@@ -155,8 +214,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     else:
         return False
 
-    # Rimuovi servizi se è l'ultima entry rimossa
+    # Rimuovi servizi e dispatcher se è l'ultima entry rimossa
     if not hass.data[DOMAIN]:
+        hass.data.pop(DATA_DISPATCHER, None)
         for service in [SERVICE_SIMULATE_OVERLOAD, SERVICE_RESET_HISTORY]:
             if hass.services.has_service(DOMAIN, service):
                 hass.services.async_remove(DOMAIN, service)
@@ -181,6 +241,10 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
 
     if not data:
+        if entry.state is not ConfigEntryState.LOADED:
+            # Options scritte durante l'unload (OptionsWriter): le legge il prossimo setup
+            _LOGGER.debug("Entry %s non caricata, options lette al prossimo setup", entry.entry_id)
+            return
         # Nessun dato in memoria → ricarica normalmente
         _LOGGER.warning("Nessun dato in memoria per entry %s, ricarico", entry.entry_id)
         await hass.config_entries.async_reload(entry.entry_id)
@@ -199,8 +263,19 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
 
     _LOGGER.debug("Listener opzioni: chiavi modificate = %s", changed_keys)
 
+    # Le modifiche dei number entity sono già in data["config"] (OptionsWriter):
+    # qui arrivano solo quelle dell'options flow, che prevalgono su quelle in attesa
+    writer: OptionsWriter = data["options_writer"]
+    for key in changed_keys:
+        writer.async_discard(key)
+
     # Chiavi che richiedono reload completo (cambiano la struttura del sistema)
-    reload_required_keys = {CONF_POWER_SENSORS, CONF_MANAGED_ENTITIES, CONF_TEST_MODE}
+    reload_required_keys = {
+        CONF_POWER_SENSORS,
+        CONF_MANAGED_ENTITIES,
+        CONF_TEST_MODE,
+        *ADVANCED_OPTION_KEYS,
+    }
     needs_reload = changed_keys & reload_required_keys
 
     if needs_reload:
@@ -212,38 +287,24 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
         return
 
     # --- Applicazione in-place senza restart ---
-    coordinator = data["coordinator"]
     manager = data["manager"]
 
     if CONF_MAX_THRESHOLD in changed_keys:
         new_threshold = int(new_config[CONF_MAX_THRESHOLD])
+        # Soglia base: la fascia oraria attiva resta in vigore fino alla transizione
+        data["threshold_scheduler"].async_set_base(new_threshold)
 
-        # Controlla se la modifica viene già applicata dal number entity
-        # (flag impostato da AvoidBlackoutThresholdNumber.async_set_native_value)
-        from_entity = data.pop("_updating_threshold", False)
-
-        if not from_entity:
-            # Modifica dall'options flow → applica al coordinator e manager
-            coordinator.update_threshold(new_threshold)
-            manager.update_threshold(new_threshold)
-
-        # Aggiorna il number entity per tenerlo sincronizzato (se non è stato lui a cambiare)
+        # Aggiorna il number entity per tenerlo sincronizzato
         threshold_entity = data.get("threshold_entity")
         if threshold_entity:
             threshold_entity.async_refresh_from_config(new_threshold)
 
         data["config"][CONF_MAX_THRESHOLD] = new_threshold
-        _LOGGER.info("Soglia aggiornata in-place: %dW (da_entity=%s)", new_threshold, from_entity)
+        _LOGGER.info("Soglia aggiornata in-place: %dW", new_threshold)
 
     if CONF_DEBOUNCE_TIME in changed_keys:
         new_debounce = int(new_config[CONF_DEBOUNCE_TIME])
-
-        # Controlla se la modifica viene già applicata dal debounce entity
-        from_entity = data.pop("_updating_debounce", False)
-
-        if not from_entity:
-            # Modifica dall'options flow → applica al manager
-            manager.update_debounce(new_debounce)
+        manager.update_debounce(new_debounce)
 
         # Aggiorna il debounce entity per tenerlo sincronizzato
         debounce_entity = data.get("debounce_entity")
@@ -251,8 +312,7 @@ async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
             debounce_entity.async_refresh_from_config(new_debounce)
 
         data["config"][CONF_DEBOUNCE_TIME] = new_debounce
-        _LOGGER.info("Debounce aggiornato in-place: %ds (da_entity=%s)", new_debounce, from_entity)
-
+        _LOGGER.info("Debounce aggiornato in-place: %ds", new_debounce)
 
 
 async def _async_register_services(
@@ -341,4 +401,6 @@ async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
         entry: Config entry rimossa
     """
     _LOGGER.info("Config entry %s rimossa", entry.entry_id)
-    # Cleanup già fatto in async_unload_entry
+    # Cleanup runtime già fatto in async_unload_entry, restano i dati persistenti
+    await DevicePowerLearner.async_remove_store(hass, entry.entry_id)
+    await PowerManager.async_remove_store(hass, entry.entry_id)
@@ -0,0 +1,341 @@
+"""Modello gerarchico dei circuiti per AvoidBlackout.
+
+Il contratto principale (sensori, soglia e dispositivi della config entry) è la
+radice; sotto di essa si possono dichiarare circuiti secondari (es. quadro cucina
+16 A, garage 10 A) con sensori, soglia, debounce e dispositivi propri.
+
+La potenza di un circuito è la somma dei suoi sensori; un circuito senza sensori
+è la somma dei suoi figli. Un aggiornamento di sensore applica il delta al suo
+circuito e lo propaga verso la radice solo attraverso i circuiti senza sensori:
+vengono rivalutati soltanto i nodi sul percorso.
+
+In una fornitura trifase le fasi (L1, L2, L3) sono circuiti di primo livello con
+soglia propria: un dispositivo trifase può essere collegato a più fasi. Soglie e
+sensori possono essere espressi in corrente (A), convertiti con la tensione del
+circuito.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+import math
+from typing import Any
+
+# Nome riservato al contratto principale (radice dell'albero)
+ROOT_CIRCUIT = "main"
+
+# Tensione di fase per convertire correnti in potenze (V)
+DEFAULT_VOLTAGE = 230.0
+
+# Unità dei sensori di corrente
+CURRENT_UNIT = "A"
+
+
+class CircuitNode:
+    """Circuito secondario con soglia propria."""
+
+    __slots__ = (
+        "name",
+        "parent",
+        "children",
+        "sensors",
+        "threshold",
+        "debounce",
+        "entities",
+        "voltage",
+        "phase",
+        "power",
+        "over",
+        "depth",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        sensors: tuple[str, ...],
+        threshold: float,
+        debounce: int,
+        entities: tuple[str, ...],
+        voltage: float = DEFAULT_VOLTAGE,
+        phase: bool = False,
+    ) -> None:
+        """Inizializza il circuito.
+
+        Args:
+            name: Nome univoco
+            sensors: Sensori di potenza del circuito (vuoto = somma dei figli)
+            threshold: Soglia in Watt
+            debounce: Debounce in secondi
+            entities: Dispositivi gestiti collegati direttamente al circuito
+            voltage: Tensione per convertire i sensori di corrente
+            phase: True per una fase della fornitura trifase
+        """
+        self.name = name
+        self.parent: CircuitNode | None = None  # None = figlio della radice
+        self.children: list[CircuitNode] = []
+        self.sensors = sensors
+        self.threshold = threshold
+        self.debounce = debounce
+        self.entities = entities
+        self.voltage = voltage
+        self.phase = phase
+        self.power = 0.0
+        self.over = False
+        self.depth = 0
+
+
+class CircuitTree:
+    """Albero dei circuiti secondari, valutato in modo incrementale."""
+
+    def __init__(self, nodes: list[CircuitNode]) -> None:
+        """Inizializza l'albero da nodi già collegati (vedi from_config).
+
+        Args:
+            nodes: Circuiti, ogni padre prima dei suoi figli
+        """
+        self._nodes = {node.name: node for node in nodes}
+        self._sensor_nodes: dict[str, CircuitNode] = {}
+        # Un dispositivo trifase è collegato a più fasi
+        self._entity_nodes: dict[str, tuple[CircuitNode, ...]] = {}
+        self._sensor_values: dict[str, float | None] = {}
+        self._overloaded: set[CircuitNode] = set()
+        for node in nodes:
+            for sensor in node.sensors:
+                self._sensor_nodes[sensor] = node
+            for entity_id in node.entities:
+                self._entity_nodes[entity_id] = (
+                    *self._entity_nodes.get(entity_id, ()),
+                    node,
+                )
+
+    @classmethod
+    def from_config(
+        cls,
+        circuits: list[dict[str, Any]],
+        managed_entities: list[str],
+        default_debounce: int,
+        phases: dict[str, dict[str, Any]] | None = None,
+    ) -> CircuitTree:
+        """Costruisce e valida l'albero dalla configurazione.
+
+        Ogni circuito è un dict con name, power_sensors, max_threshold (W) o
+        max_current (A) e, opzionali, parent (default: contratto principale),
+        debounce_time, managed_entities e voltage. Le fasi hanno gli stessi campi
+        (senza name e parent) indicizzati per nome di fase e possono essere padri
+        dei circuiti.
+
+        Args:
+            circuits: Circuiti secondari
+            managed_entities: Dispositivi gestiti della config entry
+            default_debounce: Debounce della config entry
+            phases: Fasi della fornitura trifase (nome → circuito)
+
+        Returns:
+            Albero dei circuiti
+
+        Raises:
+            ValueError: Se la configurazione non descrive un albero valido
+        """
+        if not isinstance(circuits, list):
+            raise ValueError("I circuiti devono essere una lista")
+        if not isinstance(phases or {}, dict):
+            raise ValueError("Le fasi devono essere un dizionario nome → circuito")
+
+        specs: dict[str, dict[str, Any]] = {}
+        # Le fasi sono circuiti di primo livello, dichiarati prima dei circuiti
+        phase_specs = [
+            {**spec, "name": name, "phase": True, "parent": None}
+            if isinstance(spec, dict)
+            else spec
+            for name, spec in (phases or {}).items()
+        ]
+        for spec in [*phase_specs, *circuits]:
+            if not isinstance(spec, dict) or not spec.get("name"):
+                raise ValueError(f"Circuito senza nome: {spec!r}")
+            name = str(spec["name"])
+            if name == ROOT_CIRCUIT or name in specs:
+                raise ValueError(f"Nome di circuito duplicato o riservato: {name}")
+            specs[name] = spec
+
+        nodes: dict[str, CircuitNode] = {}
+        assigned: dict[str, bool] = {}  # entity_id → collegato a una fase
+        metered: set[str] = set()
+        for name, spec in specs.items():
+            phase = bool(spec.get("phase"))
+            try:
+                voltage = float(spec.get("voltage", DEFAULT_VOLTAGE))
+                if "max_current" in spec:
+                    threshold = float(spec["max_current"]) * voltage
+                else:
+                    threshold = float(spec["max_threshold"])
+                debounce = int(spec.get("debounce_time", default_debounce))
+            except (KeyError, TypeError, ValueError) as err:
+                raise ValueError(f"Soglia o debounce non validi per {name}") from err
+            if threshold <= 0 or debounce < 0 or voltage <= 0:
+                raise ValueError(f"Soglia o debounce non validi per {name}")
+
+            sensors = tuple(spec.get("power_sensors") or ())
+            if metered & set(sensors):
+                raise ValueError(f"Sensori di {name} già usati da un altro circuito")
+            metered.update(sensors)
+            entities = tuple(spec.get("managed_entities") or ())
+            for entity_id in entities:
+                if entity_id not in managed_entities:
+                    raise ValueError(f"{entity_id} non è un dispositivo gestito")
+                # Solo un dispositivo trifase può comparire più volte, e solo tra le fasi
+                if entity_id in assigned and not (phase and assigned[entity_id]):
+                    raise ValueError(f"{entity_id} assegnato a più circuiti")
+                assigned[entity_id] = phase
+            nodes[name] = CircuitNode(
+                name, sensors, threshold, debounce, entities, voltage, phase
+            )
+
+        # Collegamento ai padri e ordinamento dalla radice verso le foglie
+        for name, spec in specs.items():
+            parent = spec.get("parent") or ROOT_CIRCUIT
+            if parent == ROOT_CIRCUIT:
+                continue
+            if parent not in nodes:
+                raise ValueError(f"Circuito padre {parent} di {name} inesistente")
+            nodes[name].parent = nodes[parent]
+            nodes[parent].children.append(nodes[name])
+
+        ordered: list[CircuitNode] = []
+        pending = [node for node in nodes.values() if node.parent is None]
+        while pending:
+            node = pending.pop()
+            node.depth = node.parent.depth + 1 if node.parent else 1
+            ordered.append(node)
+            pending.extend(node.children)
+        if len(ordered) != len(nodes):
+            raise ValueError("I circuiti formano un ciclo")
+
+        for node in ordered:
+            if not node.sensors and not node.children:
+                raise ValueError(f"Il circuito {node.name} non ha sensori né circuiti figli")
+        return cls(ordered)
+
+    @property
+    def sensors(self) -> tuple[str, ...]:
+        """Sensori di tutti i circuiti."""
+        return tuple(self._sensor_nodes)
+
+    @property
+    def overloaded(self) -> tuple[CircuitNode, ...]:
+        """Circuiti sopra soglia, dal più profondo (a pari profondità per nome)."""
+        return tuple(sorted(self._overloaded, key=lambda node: (-node.depth, node.name)))
+
+    def node(self, name: str) -> CircuitNode:
+        """Circuito per nome."""
+        return self._nodes[name]
+
+    def circuits_of(self, entity_id: str) -> tuple[CircuitNode, ...]:
+        """Circuiti a cui è collegato un dispositivo (vuoto = contratto principale).
+
+        Più di uno solo per un dispositivo trifase collegato a più fasi.
+        """
+        return self._entity_nodes.get(entity_id, ())
+
+    def share(self, entity_id: str) -> float:
+        """Frazione dell'assorbimento di un dispositivo che grava su ogni suo circuito.
+
+        Un carico trifase bilanciato collegato a n fasi pesa 1/n su ciascuna.
+        """
+        return 1.0 / max(len(self._entity_nodes.get(entity_id, ())), 1)
+
+    def path(self, node: CircuitNode | None) -> Iterator[CircuitNode]:
+        """Itera dal circuito verso la radice (esclusa).
+
+        Args:
+            node: Circuito di partenza (None = nessuno)
+
+        Yields:
+            Il circuito e i suoi antenati
+        """
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def contains(self, node: CircuitNode, entity_id: str) -> bool:
+        """Verifica se un dispositivo è nel sottoalbero di un circuito.
+
+        Args:
+            node: Radice del sottoalbero
+            entity_id: Dispositivo gestito
+
+        Returns:
+            True se il dispositivo è collegato al circuito o a un suo discendente
+        """
+        return any(
+            node in self.path(circuit) for circuit in self._entity_nodes.get(entity_id, ())
+        )
+
+    def apply_sensor(
+        self, entity_id: str, value: float | None, unit: str | None = None
+    ) -> bool:
+        """Applica il nuovo valore di un sensore ai circuiti sul suo percorso.
+
+        Args:
+            entity_id: Sensore aggiornato
+            value: Nuovo valore (None se non disponibile)
+            unit: Unità del valore; in Ampere viene convertito con la tensione del circuito
+
+        Returns:
+            True se l'insieme dei circuiti sopra soglia è cambiato
+        """
+        node = self._sensor_nodes.get(entity_id)
+        if node is None:
+            return False
+        if value is not None and unit == CURRENT_UNIT:
+            value *= node.voltage
+
+        delta = (value or 0.0) - (self._sensor_values.get(entity_id) or 0.0)
+        self._sensor_values[entity_id] = value
+        changed = False
+        while node is not None:
+            node.power += delta
+            changed |= self._evaluate(node)
+            node = node.parent
+            # Un circuito con sensori propri non dipende dai figli
+            if node is not None and node.sensors:
+                break
+        return changed
+
+    def resync(self) -> None:
+        """Ricalcola esattamente la potenza di tutti i circuiti dai valori in cache."""
+        for node in sorted(self._nodes.values(), key=lambda node: -node.depth):
+            if node.sensors:
+                node.power = math.fsum(
+                    self._sensor_values.get(sensor) or 0.0 for sensor in node.sensors
+                )
+            else:
+                node.power = math.fsum(child.power for child in node.children)
+            self._evaluate(node)
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Stato dei circuiti per get_status() e la diagnostica."""
+        return {
+            node.name: {
+                "parent": node.parent.name if node.parent else ROOT_CIRCUIT,
+                "power": round(node.power, 1),
+                "threshold": node.threshold,
+                "is_over_threshold": node.over,
+                "phase": node.phase,
+            }
+            for node in self._nodes.values()
+        }
+
+    def _evaluate(self, node: CircuitNode) -> bool:
+        """Aggiorna lo stato di sovraccarico di un circuito.
+
+        Returns:
+            True se lo stato è cambiato
+        """
+        over = node.power > node.threshold
+        if over == node.over:
+            return False
+        node.over = over
+        if over:
+            self._overloaded.add(node)
+        else:
+            self._overloaded.discard(node)
+        return True
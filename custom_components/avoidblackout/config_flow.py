@@ -12,27 +12,101 @@ from homeassistant.core import callback
 from homeassistant.helpers import selector
 
 from .const import (
+    ADVANCED_OPTION_KEYS,
+    COALESCE_WINDOW_STEP,
+    CONF_AUTO_RESTORE,
+    CONF_BATCH_SHEDDING,
+    CONF_CIRCUITS,
+    CONF_COALESCE_WINDOW,
     CONF_DEBOUNCE_TIME,
+    CONF_HARD_THRESHOLD_PCT,
+    CONF_LATENCY_METRICS,
     CONF_MANAGED_ENTITIES,
+    CONF_MAX_ACTIONS_PER_MINUTE,
     CONF_MAX_THRESHOLD,
+    CONF_MIN_OFF_TIME,
+    CONF_MIN_ON_TIME,
+    CONF_NOTIFY_DEADBAND,
+    CONF_NOTIFY_DEADBAND_PCT,
+    CONF_NOTIFY_MAX_SILENCE,
+    CONF_PHASES,
     CONF_POWER_SENSORS,
+    CONF_PREDICTIVE,
+    CONF_PREDICTIVE_HORIZON,
+    CONF_RESTORE_MARGIN,
+    CONF_RESTORE_SPACING,
+    CONF_SHED_VERIFY_WINDOW,
     CONF_TEST_MODE,
+    CONF_THRESHOLD_SCHEDULE,
+    CONF_TRIP_CURVE,
+    CONF_TRIP_CURVE_ENABLED,
     DEBOUNCE_STEP,
+    DEFAULT_AUTO_RESTORE,
+    DEFAULT_BATCH_SHEDDING,
+    DEFAULT_COALESCE_WINDOW,
     DEFAULT_DEBOUNCE,
+    DEFAULT_HARD_THRESHOLD_PCT,
+    DEFAULT_LATENCY_METRICS,
+    DEFAULT_MAX_ACTIONS_PER_MINUTE,
+    DEFAULT_MIN_OFF_TIME,
+    DEFAULT_MIN_ON_TIME,
+    DEFAULT_NOTIFY_DEADBAND,
+    DEFAULT_NOTIFY_DEADBAND_PCT,
+    DEFAULT_NOTIFY_MAX_SILENCE,
+    DEFAULT_PREDICTIVE,
+    DEFAULT_PREDICTIVE_HORIZON,
+    DEFAULT_RESTORE_MARGIN,
+    DEFAULT_RESTORE_SPACING,
+    DEFAULT_SHED_VERIFY_WINDOW,
     DEFAULT_TEST_MODE,
     DEFAULT_THRESHOLD,
+    DEFAULT_TRIP_CURVE,
+    DEFAULT_TRIP_CURVE_ENABLED,
     DOMAIN,
+    ERROR_CIRCUITS_INVALID,
     ERROR_DEBOUNCE_INVALID,
     ERROR_INVALID_POWER_SENSORS,
     ERROR_NO_DEVICES_SELECTED,
+    ERROR_PHASES_INVALID,
+    ERROR_SCHEDULE_INVALID,
     ERROR_THRESHOLD_INVALID,
+    ERROR_TRIP_CURVE_INVALID,
+    MAX_COALESCE_WINDOW,
     MAX_DEBOUNCE,
+    MAX_HARD_THRESHOLD_PCT,
+    MAX_MAX_ACTIONS_PER_MINUTE,
+    MAX_MIN_OFF_TIME,
+    MAX_MIN_ON_TIME,
+    MAX_NOTIFY_DEADBAND,
+    MAX_NOTIFY_DEADBAND_PCT,
+    MAX_NOTIFY_MAX_SILENCE,
+    MAX_PREDICTIVE_HORIZON,
+    MAX_RESTORE_MARGIN,
+    MAX_RESTORE_SPACING,
+    MAX_SHED_VERIFY_WINDOW,
     MAX_THRESHOLD,
+    MIN_COALESCE_WINDOW,
     MIN_DEBOUNCE,
+    MIN_HARD_THRESHOLD_PCT,
+    MIN_MAX_ACTIONS_PER_MINUTE,
+    MIN_MIN_OFF_TIME,
+    MIN_MIN_ON_TIME,
+    MIN_NOTIFY_DEADBAND,
+    MIN_NOTIFY_DEADBAND_PCT,
+    MIN_NOTIFY_MAX_SILENCE,
+    MIN_PREDICTIVE_HORIZON,
+    MIN_RESTORE_MARGIN,
+    MIN_RESTORE_SPACING,
+    MIN_SHED_VERIFY_WINDOW,
     MIN_THRESHOLD,
+    NOTIFY_DEADBAND_STEP,
     POWER_UNIT_OF_MEASUREMENT,
+    RESTORE_MARGIN_STEP,
     THRESHOLD_STEP,
 )
+from .circuits import CircuitTree
+from .schedule import ThresholdSchedule
+from .trip_curve import TripCurve
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -411,12 +485,19 @@ class AvoidBlackoutOptionsFlow(config_entries.OptionsFlow):
             
             # Se tutto valido, salva
             if sensors_valid and threshold_valid and debounce_valid and devices_valid:
+                # Impostazioni avanzate richieste: prosegui allo step dedicato
+                if user_input.get("advanced_settings"):
+                    self._user_input_cache = user_input
+                    return await self.async_step_advanced()
+
                 _LOGGER.info(
                     "Configurazione aggiornata: soglia=%dW, debounce=%ds",
                     threshold,
                     debounce,
                 )
-                return self.async_create_entry(title="", data=user_input)
+                return self.async_create_entry(
+                    title="", data=self._with_advanced_options(user_input)
+                )
 
             # Gestione Errori
             if not sensors_valid:
@@ -430,6 +511,13 @@ class AvoidBlackoutOptionsFlow(config_entries.OptionsFlow):
             else:
                 errors["base"] = "invalid_input"
 
+        if user_input is None and self._user_input_cache is None:
+            # Prima apertura: scrive le modifiche runtime ancora in attesa
+            # (number entity), così il form parte dai valori in uso
+            entry_data = self.hass.data.get(DOMAIN, {}).get(self._config_entry.entry_id)
+            if entry_data and "options_writer" in entry_data:
+                entry_data["options_writer"].async_flush()
+
         # Schema per modificare TUTTI i parametri
         current_config = {**self.config_entry.data, **self.config_entry.options}
         if self._user_input_cache:
@@ -487,6 +575,10 @@ class AvoidBlackoutOptionsFlow(config_entries.OptionsFlow):
                     "reorder_devices",
                     default=False,
                 ): selector.BooleanSelector(),
+                vol.Optional(
+                    "advanced_settings",
+                    default=False,
+                ): selector.BooleanSelector(),
             }
         )
 
@@ -538,8 +630,15 @@ class AvoidBlackoutOptionsFlow(config_entries.OptionsFlow):
                     # Rimuovi flag temporaneo se presente
                     if "reorder_devices" in final_data:
                         del final_data["reorder_devices"]
-                        
-                    return self.async_create_entry(title="", data=final_data)
+
+                    # Impostazioni avanzate richieste insieme al riordino
+                    if final_data.get("advanced_settings"):
+                        self._user_input_cache = final_data
+                        return await self.async_step_advanced()
+
+                    return self.async_create_entry(
+                        title="", data=self._with_advanced_options(final_data)
+                    )
 
         # Prepara le opzioni per i selettori. 
         # Usiamo SelectSelector che accetta label/value.
@@ -569,3 +668,305 @@ class AvoidBlackoutOptionsFlow(config_entries.OptionsFlow):
                 "count": str(len(current_devices))
             }
         )
+
+    async def async_step_advanced(
+        self, user_input: dict[str, Any] | None = None
+    ) -> config_entries.FlowResult:
+        """Gestisce le impostazioni avanzate di prestazioni.
+
+        Args:
+            user_input: Dati inseriti dall'utente
+
+        Returns:
+            FlowResult con form o salvataggio options
+        """
+        errors = {}
+
+        if user_input is not None:
+            base_config = {
+                **self.config_entry.data,
+                **self.config_entry.options,
+                **(self._user_input_cache or {}),
+            }
+            try:
+                curve = TripCurve.parse(
+                    user_input.get(CONF_TRIP_CURVE, DEFAULT_TRIP_CURVE)
+                )
+            except ValueError as err:
+                _LOGGER.debug("Curva di intervento non valida: %s", err)
+                errors["base"] = ERROR_TRIP_CURVE_INVALID
+            managed = base_config.get(CONF_MANAGED_ENTITIES, [])
+            debounce = base_config.get(CONF_DEBOUNCE_TIME, DEFAULT_DEBOUNCE)
+            phases = user_input.get(CONF_PHASES) or {}
+            try:
+                # Prima le sole fasi, poi i circuiti che possono dipendere da esse
+                CircuitTree.from_config([], managed, debounce, phases)
+            except ValueError as err:
+                _LOGGER.debug("Fasi non valide: %s", err)
+                errors[CONF_PHASES] = ERROR_PHASES_INVALID
+            else:
+                try:
+                    CircuitTree.from_config(
+                        user_input.get(CONF_CIRCUITS) or [], managed, debounce, phases
+                    )
+                except ValueError as err:
+                    _LOGGER.debug("Circuiti non validi: %s", err)
+                    errors[CONF_CIRCUITS] = ERROR_CIRCUITS_INVALID
+            try:
+                ThresholdSchedule.from_config(user_input.get(CONF_THRESHOLD_SCHEDULE) or [])
+            except ValueError as err:
+                _LOGGER.debug("Fasce orarie non valide: %s", err)
+                errors[CONF_THRESHOLD_SCHEDULE] = ERROR_SCHEDULE_INVALID
+            if not errors:
+                final_data = {**(self._user_input_cache or {}), **user_input}
+                final_data.pop("advanced_settings", None)
+                # Salva la curva in forma normalizzata (punti ordinati)
+                final_data[CONF_TRIP_CURVE] = str(curve)
+                _LOGGER.info(
+                    "Impostazioni avanzate aggiornate: coalescenza=%dms, deadband=%dW/%d%%",
+                    final_data.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW),
+                    final_data.get(CONF_NOTIFY_DEADBAND, DEFAULT_NOTIFY_DEADBAND),
+                    final_data.get(CONF_NOTIFY_DEADBAND_PCT, DEFAULT_NOTIFY_DEADBAND_PCT),
+                )
+                return self.async_create_entry(title="", data=final_data)
+
+        current_config = {**self.config_entry.data, **self.config_entry.options}
+        if user_input is not None:
+            current_config.update(user_input)
+
+        data_schema = vol.Schema(
+            {
+                vol.Required(
+                    CONF_COALESCE_WINDOW,
+                    default=current_config.get(
+                        CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_COALESCE_WINDOW,
+                        max=MAX_COALESCE_WINDOW,
+                        step=COALESCE_WINDOW_STEP,
+                        unit_of_measurement="ms",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_NOTIFY_DEADBAND,
+                    default=current_config.get(
+                        CONF_NOTIFY_DEADBAND, DEFAULT_NOTIFY_DEADBAND
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_NOTIFY_DEADBAND,
+                        max=MAX_NOTIFY_DEADBAND,
+                        step=NOTIFY_DEADBAND_STEP,
+                        unit_of_measurement="W",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_NOTIFY_DEADBAND_PCT,
+                    default=current_config.get(
+                        CONF_NOTIFY_DEADBAND_PCT, DEFAULT_NOTIFY_DEADBAND_PCT
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_NOTIFY_DEADBAND_PCT,
+                        max=MAX_NOTIFY_DEADBAND_PCT,
+                        step=1,
+                        unit_of_measurement="%",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_NOTIFY_MAX_SILENCE,
+                    default=current_config.get(
+                        CONF_NOTIFY_MAX_SILENCE, DEFAULT_NOTIFY_MAX_SILENCE
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_NOTIFY_MAX_SILENCE,
+                        max=MAX_NOTIFY_MAX_SILENCE,
+                        step=1,
+                        unit_of_measurement="s",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_PREDICTIVE,
+                    default=current_config.get(CONF_PREDICTIVE, DEFAULT_PREDICTIVE),
+                ): selector.BooleanSelector(),
+                vol.Required(
+                    CONF_PREDICTIVE_HORIZON,
+                    default=current_config.get(
+                        CONF_PREDICTIVE_HORIZON, DEFAULT_PREDICTIVE_HORIZON
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_PREDICTIVE_HORIZON,
+                        max=MAX_PREDICTIVE_HORIZON,
+                        step=1,
+                        unit_of_measurement="s",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_BATCH_SHEDDING,
+                    default=current_config.get(
+                        CONF_BATCH_SHEDDING, DEFAULT_BATCH_SHEDDING
+                    ),
+                ): selector.BooleanSelector(),
+                vol.Required(
+                    CONF_HARD_THRESHOLD_PCT,
+                    default=current_config.get(
+                        CONF_HARD_THRESHOLD_PCT, DEFAULT_HARD_THRESHOLD_PCT
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_HARD_THRESHOLD_PCT,
+                        max=MAX_HARD_THRESHOLD_PCT,
+                        step=5,
+                        unit_of_measurement="%",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_SHED_VERIFY_WINDOW,
+                    default=current_config.get(
+                        CONF_SHED_VERIFY_WINDOW, DEFAULT_SHED_VERIFY_WINDOW
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_SHED_VERIFY_WINDOW,
+                        max=MAX_SHED_VERIFY_WINDOW,
+                        step=1,
+                        unit_of_measurement="s",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_AUTO_RESTORE,
+                    default=current_config.get(CONF_AUTO_RESTORE, DEFAULT_AUTO_RESTORE),
+                ): selector.BooleanSelector(),
+                vol.Required(
+                    CONF_RESTORE_MARGIN,
+                    default=current_config.get(
+                        CONF_RESTORE_MARGIN, DEFAULT_RESTORE_MARGIN
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_RESTORE_MARGIN,
+                        max=MAX_RESTORE_MARGIN,
+                        step=RESTORE_MARGIN_STEP,
+                        unit_of_measurement="W",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_RESTORE_SPACING,
+                    default=current_config.get(
+                        CONF_RESTORE_SPACING, DEFAULT_RESTORE_SPACING
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_RESTORE_SPACING,
+                        max=MAX_RESTORE_SPACING,
+                        step=1,
+                        unit_of_measurement="s",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_MIN_OFF_TIME,
+                    default=current_config.get(CONF_MIN_OFF_TIME, DEFAULT_MIN_OFF_TIME),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_MIN_OFF_TIME,
+                        max=MAX_MIN_OFF_TIME,
+                        step=1,
+                        unit_of_measurement="s",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_MIN_ON_TIME,
+                    default=current_config.get(CONF_MIN_ON_TIME, DEFAULT_MIN_ON_TIME),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_MIN_ON_TIME,
+                        max=MAX_MIN_ON_TIME,
+                        step=1,
+                        unit_of_measurement="s",
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_MAX_ACTIONS_PER_MINUTE,
+                    default=current_config.get(
+                        CONF_MAX_ACTIONS_PER_MINUTE, DEFAULT_MAX_ACTIONS_PER_MINUTE
+                    ),
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=MIN_MAX_ACTIONS_PER_MINUTE,
+                        max=MAX_MAX_ACTIONS_PER_MINUTE,
+                        step=1,
+                        mode=selector.NumberSelectorMode.BOX,
+                    )
+                ),
+                vol.Required(
+                    CONF_TRIP_CURVE_ENABLED,
+                    default=current_config.get(
+                        CONF_TRIP_CURVE_ENABLED, DEFAULT_TRIP_CURVE_ENABLED
+                    ),
+                ): selector.BooleanSelector(),
+                vol.Required(
+                    CONF_TRIP_CURVE,
+                    default=current_config.get(CONF_TRIP_CURVE, DEFAULT_TRIP_CURVE),
+                ): selector.TextSelector(),
+                vol.Optional(
+                    CONF_CIRCUITS,
+                    default=current_config.get(CONF_CIRCUITS, []),
+                ): selector.ObjectSelector(),
+                vol.Optional(
+                    CONF_PHASES,
+                    default=current_config.get(CONF_PHASES, {}),
+                ): selector.ObjectSelector(),
+                vol.Optional(
+                    CONF_THRESHOLD_SCHEDULE,
+                    default=current_config.get(CONF_THRESHOLD_SCHEDULE, []),
+                ): selector.ObjectSelector(),
+                vol.Required(
+                    CONF_LATENCY_METRICS,
+                    default=current_config.get(
+                        CONF_LATENCY_METRICS, DEFAULT_LATENCY_METRICS
+                    ),
+                ): selector.BooleanSelector(),
+            }
+        )
+
+        return self.async_show_form(
+            step_id="advanced",
+            data_schema=data_schema,
+            errors=errors,
+        )
+
+    def _with_advanced_options(self, data: dict[str, Any]) -> dict[str, Any]:
+        """Conserva le impostazioni avanzate già salvate.
+
+        Le options vengono sostituite per intero al salvataggio: senza questa
+        unione, salvare il form principale azzererebbe le impostazioni avanzate.
+
+        Args:
+            data: Dati del form da salvare
+
+        Returns:
+            Dati completi da salvare nelle options
+        """
+        advanced = {
+            key: self.config_entry.options[key]
+            for key in ADVANCED_OPTION_KEYS
+            if key in self.config_entry.options
+        }
+        final_data = {**advanced, **data}
+        final_data.pop("advanced_settings", None)
+        return final_data
@@ -3,20 +3,89 @@
 # Dominio dell'integrazione
 DOMAIN = "avoidblackout"
 
+# Chiave di hass.data per il dispatcher dei cambi di stato condiviso tra le entry
+DATA_DISPATCHER = f"{DOMAIN}_dispatcher"
+
 # Configuration keys
 CONF_POWER_SENSORS = "power_sensors"
 CONF_MAX_THRESHOLD = "max_threshold"
 CONF_DEBOUNCE_TIME = "debounce_time"
 CONF_MANAGED_ENTITIES = "managed_entities"
 CONF_TEST_MODE = "test_mode"
+CONF_COALESCE_WINDOW = "coalesce_window"
+CONF_NOTIFY_DEADBAND = "notify_deadband"
+CONF_NOTIFY_DEADBAND_PCT = "notify_deadband_pct"
+CONF_NOTIFY_MAX_SILENCE = "notify_max_silence"
+CONF_PREDICTIVE = "predictive_shedding"
+CONF_PREDICTIVE_HORIZON = "predictive_horizon"
+CONF_TRIP_CURVE_ENABLED = "trip_curve_enabled"
+CONF_TRIP_CURVE = "trip_curve"
+CONF_BATCH_SHEDDING = "batch_shedding"
+CONF_SHED_VERIFY_WINDOW = "shed_verify_window"
+CONF_HARD_THRESHOLD_PCT = "hard_threshold_pct"
+CONF_AUTO_RESTORE = "auto_restore"
+CONF_RESTORE_MARGIN = "restore_margin"
+CONF_RESTORE_SPACING = "restore_spacing"
+CONF_MIN_OFF_TIME = "min_off_time"
+CONF_MIN_ON_TIME = "min_on_time"
+CONF_MAX_ACTIONS_PER_MINUTE = "max_actions_per_minute"
+CONF_CIRCUITS = "circuits"
+CONF_PHASES = "phases"
+CONF_LATENCY_METRICS = "latency_metrics"
+CONF_THRESHOLD_SCHEDULE = "threshold_schedule"
+
+# Opzioni avanzate (step dedicato dell'options flow)
+ADVANCED_OPTION_KEYS = (
+    CONF_COALESCE_WINDOW,
+    CONF_NOTIFY_DEADBAND,
+    CONF_NOTIFY_DEADBAND_PCT,
+    CONF_NOTIFY_MAX_SILENCE,
+    CONF_PREDICTIVE,
+    CONF_PREDICTIVE_HORIZON,
+    CONF_TRIP_CURVE_ENABLED,
+    CONF_TRIP_CURVE,
+    CONF_BATCH_SHEDDING,
+    CONF_SHED_VERIFY_WINDOW,
+    CONF_HARD_THRESHOLD_PCT,
+    CONF_AUTO_RESTORE,
+    CONF_RESTORE_MARGIN,
+    CONF_RESTORE_SPACING,
+    CONF_MIN_OFF_TIME,
+    CONF_MIN_ON_TIME,
+    CONF_MAX_ACTIONS_PER_MINUTE,
+    CONF_CIRCUITS,
+    CONF_PHASES,
+    CONF_LATENCY_METRICS,
+    CONF_THRESHOLD_SCHEDULE,
+)
 
 # Default values
 DEFAULT_THRESHOLD = 3500  # Watt
 DEFAULT_DEBOUNCE = 30  # secondi
 DEFAULT_TEST_MODE = False
+DEFAULT_COALESCE_WINDOW = 50  # millisecondi
+DEFAULT_NOTIFY_DEADBAND = 20  # Watt
+DEFAULT_NOTIFY_DEADBAND_PCT = 0  # percentuale (0 = disattivato)
+DEFAULT_NOTIFY_MAX_SILENCE = 60  # secondi
+DEFAULT_PREDICTIVE = False
+DEFAULT_PREDICTIVE_HORIZON = 15  # secondi
+DEFAULT_TRIP_CURVE_ENABLED = False
+# Rapporto potenza/soglia : secondi prima dell'intervento
+DEFAULT_TRIP_CURVE = "1.1:10800,1.27:600,1.6:120,2.0:5"
+DEFAULT_BATCH_SHEDDING = False
+DEFAULT_SHED_VERIFY_WINDOW = 10  # secondi (0 = disattivata)
+DEFAULT_HARD_THRESHOLD_PCT = 0  # percentuale oltre la soglia (0 = disattivata)
+DEFAULT_AUTO_RESTORE = False
+DEFAULT_RESTORE_MARGIN = 200  # Watt
+DEFAULT_RESTORE_SPACING = 60  # secondi
+DEFAULT_MIN_OFF_TIME = 300  # secondi
+DEFAULT_MIN_ON_TIME = 0  # secondi (0 = disattivato)
+DEFAULT_MAX_ACTIONS_PER_MINUTE = 6  # (0 = nessun limite)
+DEFAULT_LATENCY_METRICS = False
 
 # Event names
 EVENT_LOAD_SHEDDING = "powermanager_load_shedding"
+EVENT_LOAD_RESTORED = "powermanager_load_restored"
 
 # State machine states
 STATE_MONITORING = "monitoring"
@@ -24,6 +93,60 @@ STATE_SHEDDING = "shedding"
 STATE_WAITING = "waiting"
 STATE_TEST_MODE = "test_mode"
 
+# Aggregazione incrementale della potenza
+AGGREGATE_RESYNC_INTERVAL = 1000  # eventi tra due risincronizzazioni del totale
+
+# Storico in memoria della potenza totale
+HISTORY_CAPACITY = 3600  # campioni conservati
+HISTORY_WINDOWS = (10, 60, 300)  # finestre statistiche in secondi
+PREDICTIVE_TREND_WINDOW = 10  # secondi di storico per stimare il trend (in HISTORY_WINDOWS)
+# Attesa anticipata (WAITING sotto soglia) solo con un trend deciso e affidabile
+PREDICTIVE_MIN_SLOPE = 100  # W/s
+PREDICTIVE_MIN_R2 = 0.95  # bontà minima del fit lineare sulla finestra del trend
+PREDICTIVE_MIN_DEBOUNCE = 1  # secondi: debounce minimo dopo un superamento previsto
+
+# Curva di intervento (I²t)
+TRIP_COOLING_TIME = 300  # costante di tempo della dissipazione sotto soglia (s)
+TRIP_LEVEL_AFTER_SHED = 0.5  # calore mantenuto dopo un distacco (1.0 = intervento)
+TRIP_MIN_WAIT = 2  # secondi minimi tra superamento/distacco e distacco successivo
+
+# Distacco multiplo
+BATCH_SHED_MARGIN = 0.1  # quota dell'assorbimento stimato non considerata affidabile
+# Attributi dei dispositivi gestiti che riportano l'assorbimento istantaneo (W)
+DRAW_ATTRIBUTES = ("current_power_w", "power", "current_consumption")
+
+# Spegnimento dei dispositivi
+SHED_CALL_TIMEOUT = 10  # secondi massimi di attesa della chiamata turn_off
+SHED_VERIFY_DROP_RATIO = 0.5  # quota dell'assorbimento stimato che deve sparire
+SHED_VERIFY_MIN_DROP = 20  # Watt, calo minimo che conferma un distacco
+
+# Riaccensione automatica
+RESTORE_AVERAGE_WINDOW = 60  # secondi di media per il margine disponibile (in HISTORY_WINDOWS)
+
+# Governatore anti-oscillazione
+GOVERNOR_BACKOFF_WINDOW = 900  # secondi: distacchi più ravvicinati raddoppiano il tempo minimo spento
+GOVERNOR_MAX_BACKOFF = 4  # raddoppi massimi (min_off_time × 16)
+GOVERNOR_RETRY_DELAY = 30  # secondi prima di ritentare una riaccensione fallita (raddoppiati ad ogni errore)
+
+# Sensori diagnostici delle latenze
+LATENCY_SCAN_INTERVAL = 60  # secondi tra due letture degli istogrammi
+
+# Persistenza (helpers.storage)
+STORAGE_VERSION = 1
+
+# Snapshot della macchina a stati (ripristino al riavvio)
+MANAGER_SAVE_DELAY = 5  # secondi di ritardo del salvataggio su disco
+
+# Options modificate dai number entity (scrittura coalescente della config entry)
+OPTIONS_SAVE_DELAY = 10  # secondi di quiete prima di scrivere le options
+
+# Apprendimento dell'assorbimento dei dispositivi
+LEARNER_WINDOW = 10  # secondi tra commutazione e misura del gradino di potenza
+LEARNER_MAX_SAMPLES = 20  # campioni conservati per dispositivo
+LEARNER_CONFIDENT_SAMPLES = 5  # campioni per la confidenza piena
+LEARNER_MIN_CONFIDENCE = 0.5  # confidenza minima per usare la stima
+LEARNER_SAVE_DELAY = 30  # secondi di ritardo del salvataggio su disco
+
 # Attributi per verificare sensori di potenza validi
 POWER_UNIT_OF_MEASUREMENT = "W"
 
@@ -36,6 +159,10 @@ ERROR_INVALID_POWER_SENSORS = "invalid_power_sensors"
 ERROR_NO_DEVICES_SELECTED = "no_devices_selected"
 ERROR_THRESHOLD_INVALID = "threshold_invalid"
 ERROR_DEBOUNCE_INVALID = "debounce_invalid"
+ERROR_TRIP_CURVE_INVALID = "trip_curve_invalid"
+ERROR_CIRCUITS_INVALID = "circuits_invalid"
+ERROR_PHASES_INVALID = "phases_invalid"
+ERROR_SCHEDULE_INVALID = "schedule_invalid"
 ERROR_CANNOT_CONNECT = "cannot_connect"
 ERROR_UNKNOWN = "unknown"
 
@@ -51,3 +178,30 @@ MIN_DEBOUNCE = 5  # secondi
 MAX_DEBOUNCE = 300  # secondi
 THRESHOLD_STEP = 100  # Watt
 DEBOUNCE_STEP = 5  # secondi
+MIN_COALESCE_WINDOW = 0  # millisecondi (0 = disattivato)
+MAX_COALESCE_WINDOW = 1000  # millisecondi
+COALESCE_WINDOW_STEP = 10  # millisecondi
+MIN_NOTIFY_DEADBAND = 0  # Watt
+MAX_NOTIFY_DEADBAND = 1000  # Watt
+NOTIFY_DEADBAND_STEP = 5  # Watt
+MIN_NOTIFY_DEADBAND_PCT = 0  # percentuale
+MAX_NOTIFY_DEADBAND_PCT = 50  # percentuale
+MIN_NOTIFY_MAX_SILENCE = 5  # secondi
+MAX_NOTIFY_MAX_SILENCE = 3600  # secondi
+MIN_PREDICTIVE_HORIZON = 1  # secondi
+MAX_PREDICTIVE_HORIZON = 120  # secondi
+MIN_SHED_VERIFY_WINDOW = 0  # secondi (0 = disattivata)
+MAX_SHED_VERIFY_WINDOW = 120  # secondi
+MIN_HARD_THRESHOLD_PCT = 0  # percentuale (0 = disattivata)
+MAX_HARD_THRESHOLD_PCT = 200  # percentuale
+MIN_RESTORE_MARGIN = 0  # Watt
+MAX_RESTORE_MARGIN = 2000  # Watt
+RESTORE_MARGIN_STEP = 50  # Watt
+MIN_RESTORE_SPACING = 10  # secondi
+MAX_RESTORE_SPACING = 3600  # secondi
+MIN_MIN_OFF_TIME = 0  # secondi
+MAX_MIN_OFF_TIME = 3600  # secondi
+MIN_MIN_ON_TIME = 0  # secondi
+MAX_MIN_ON_TIME = 3600  # secondi
+MIN_MAX_ACTIONS_PER_MINUTE = 0  # (0 = nessun limite)
+MAX_MAX_ACTIONS_PER_MINUTE = 60
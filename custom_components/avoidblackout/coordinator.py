@@ -1,13 +1,44 @@
 """PowerCoordinator per monitoraggio real-time dei sensori di potenza."""
+import asyncio
 from datetime import datetime
 import logging
+import math
+from types import MappingProxyType
 from typing import Any
 
-from homeassistant.core import Event, HomeAssistant, callback
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
-from .const import CONF_MAX_THRESHOLD, CONF_POWER_SENSORS, DOMAIN
+from .const import (
+    AGGREGATE_RESYNC_INTERVAL,
+    CONF_CIRCUITS,
+    CONF_COALESCE_WINDOW,
+    CONF_DEBOUNCE_TIME,
+    CONF_HARD_THRESHOLD_PCT,
+    CONF_LATENCY_METRICS,
+    CONF_MANAGED_ENTITIES,
+    CONF_MAX_THRESHOLD,
+    CONF_NOTIFY_DEADBAND,
+    CONF_NOTIFY_DEADBAND_PCT,
+    CONF_NOTIFY_MAX_SILENCE,
+    CONF_PHASES,
+    CONF_POWER_SENSORS,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_DEBOUNCE,
+    DEFAULT_HARD_THRESHOLD_PCT,
+    DEFAULT_LATENCY_METRICS,
+    DEFAULT_NOTIFY_DEADBAND,
+    DEFAULT_NOTIFY_DEADBAND_PCT,
+    DEFAULT_NOTIFY_MAX_SILENCE,
+    DOMAIN,
+    HISTORY_CAPACITY,
+    HISTORY_WINDOWS,
+)
+from .circuits import CircuitTree
+from .dispatcher import StateDispatcher, StateUpdate, parse_power
+from .history import PowerHistory
+from .latency import LatencyTracker
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,14 +47,52 @@ class PowerCoordinator(DataUpdateCoordinator):
     """Coordinator per monitorare i sensori di potenza in tempo reale.
 
     Usa un approccio event-driven (non polling) per massimizzare performance e reattività.
+    I cambi di stato arrivano dal dispatcher di dominio (StateDispatcher), condiviso
+    tra le config entry: ogni sensore è seguito e convertito una sola volta.
+    Il totale è mantenuto in modo incrementale: ad ogni evento si applica solo il delta
+    del sensore cambiato, con una risincronizzazione periodica contro la deriva float.
+
+    Gli eventi che arrivano entro la finestra di coalescenza (coalesce_window, in ms)
+    producono un'unica pubblicazione; un attraversamento della soglia (o della soglia
+    di emergenza, hard_threshold_pct) viene invece pubblicato immediatamente, senza
+    attendere la finestra.
+
+    Sopra soglia (principale o di un circuito) i listener vengono notificati ad ogni
+    pubblicazione: il PowerManager tornato in MONITORING ancora in sovraccarico
+    riarma subito il debounce. Sotto soglia vengono notificati solo per variazioni
+    significative: ad ogni attraversamento di una soglia, quando la variazione
+    supera la deadband (assoluta o percentuale) o quando è trascorso il tempo
+    massimo di silenzio.
+    self.data è comunque sempre aggiornato all'ultimo totale pubblicato.
+
+    Ogni totale pubblicato viene registrato in self.history (ring buffer in memoria)
+    per statistiche su finestre recenti senza interrogare il recorder, e inoltrato
+    ai sample listener (async_add_sample_listener), che non sono soggetti al filtro.
+
+    Con circuiti secondari o fasi configurati (self.circuits) i loro sensori
+    aggiornano l'albero in modo incrementale; is_over_threshold segnala il
+    superamento della soglia principale o di quella di un circuito (elencati in
+    overloaded_circuits). I sensori di corrente (A) delle fasi vengono convertiti
+    in Watt con l'unità letta dallo stato già ricevuto nell'evento.
+
+    Con latency_metrics attivo self.latency misura i tempi del percorso evento →
+    pubblicazione → notifica (vedi latency.py); altrimenti è None e non costa nulla.
     """
 
-    def __init__(self, hass: HomeAssistant, config: dict[str, Any]) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        config: dict[str, Any],
+        dispatcher: StateDispatcher | None = None,
+    ) -> None:
         """Inizializza il coordinator.
 
         Args:
             hass: Istanza Home Assistant
-            config: Configurazione con power_sensors e max_threshold
+            config: Configurazione con power_sensors, max_threshold, coalesce_window
+                e parametri della politica di notifica (notify_*)
+            dispatcher: Dispatcher dei cambi di stato condiviso tra le config entry
+                (None = dispatcher privato)
         """
         super().__init__(
             hass,
@@ -31,9 +100,65 @@ class PowerCoordinator(DataUpdateCoordinator):
             name=DOMAIN,
             update_interval=None,  # Event-driven, no polling
         )
+        self.dispatcher = dispatcher or StateDispatcher(hass)
         self._power_sensors = config[CONF_POWER_SENSORS]
+        self._power_sensor_set = frozenset(self._power_sensors)
         self._threshold = config[CONF_MAX_THRESHOLD]
+        self.circuits: CircuitTree | None = None
+        if config.get(CONF_CIRCUITS) or config.get(CONF_PHASES):
+            try:
+                self.circuits = CircuitTree.from_config(
+                    config.get(CONF_CIRCUITS) or [],
+                    config.get(CONF_MANAGED_ENTITIES, []),
+                    config.get(CONF_DEBOUNCE_TIME, DEFAULT_DEBOUNCE),
+                    config.get(CONF_PHASES),
+                )
+            except ValueError as err:
+                _LOGGER.error("Circuiti non validi (%s), uso solo la soglia principale", err)
+        # Soglia di emergenza: percentuale oltre la soglia (0 = disattivata)
+        self._hard_threshold_pct = config.get(
+            CONF_HARD_THRESHOLD_PCT, DEFAULT_HARD_THRESHOLD_PCT
+        )
+        self._hard_threshold = self._compute_hard_threshold()
         self._unsubscribe = None
+
+        # Stato dell'aggregatore incrementale
+        self._sensor_values: dict[str, float | None] = {}
+        self._sensor_values_view = MappingProxyType(self._sensor_values)
+        self._total_power = 0.0
+        self._events_since_resync = 0
+
+        # Coalescenza degli eventi ravvicinati
+        self._coalesce_window = (
+            config.get(CONF_COALESCE_WINDOW, DEFAULT_COALESCE_WINDOW) / 1000
+        )
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._published_over = False
+        self._published_hard = False
+        self._published_circuits: tuple[str, ...] = ()
+
+        # Politica di notifica dei listener
+        self._deadband = config.get(CONF_NOTIFY_DEADBAND, DEFAULT_NOTIFY_DEADBAND)
+        self._deadband_ratio = (
+            config.get(CONF_NOTIFY_DEADBAND_PCT, DEFAULT_NOTIFY_DEADBAND_PCT) / 100
+        )
+        self._max_silence = config.get(
+            CONF_NOTIFY_MAX_SILENCE, DEFAULT_NOTIFY_MAX_SILENCE
+        )
+        self._notified_total = 0.0
+        self._notified_at = 0.0
+        self._silence_handle: asyncio.TimerHandle | None = None
+
+        # Storico recente del totale (timestamp monotoni del loop)
+        self.history = PowerHistory(HISTORY_CAPACITY, HISTORY_WINDOWS)
+        self._sample_listeners: list[CALLBACK_TYPE] = []
+
+        # Latenze del percorso critico (None = misura disattivata)
+        self.latency: LatencyTracker | None = (
+            LatencyTracker()
+            if config.get(CONF_LATENCY_METRICS, DEFAULT_LATENCY_METRICS)
+            else None
+        )
         _LOGGER.debug(
             "PowerCoordinator inizializzato con %d sensori, soglia %dW",
             len(self._power_sensors),
@@ -46,93 +171,227 @@ class PowerCoordinator(DataUpdateCoordinator):
         Registra listener per state changes e calcola i valori iniziali.
         """
         # Registra listener per cambiamenti di stato
-        self._unsubscribe = async_track_state_change_event(
-            self.hass,
-            self._power_sensors,
-            self._handle_state_change,
+        self._unsubscribe = self.dispatcher.async_subscribe(
+            self._tracked_sensors(), self._handle_state_change
         )
 
         # Calcolo iniziale
-        self.data = await self._calculate_total_power()
+        self.data = self._calculate_total_power()
         _LOGGER.info("Monitoring avviato per %d sensori", len(self._power_sensors))
 
     async def async_stop(self) -> None:
         """Ferma il monitoring e rimuove i listener."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._silence_handle:
+            self._silence_handle.cancel()
+            self._silence_handle = None
+
         if self._unsubscribe:
             self._unsubscribe()
             self._unsubscribe = None
             _LOGGER.info("Monitoring fermato")
 
     @callback
-    def _handle_state_change(self, event: Event) -> None:
+    def _handle_state_change(self, update: StateUpdate) -> None:
         """Callback chiamato quando uno dei sensori cambia stato.
 
         Args:
-            event: Evento di cambio stato
+            update: Cambio di stato dal dispatcher, con il valore già convertito
         """
-        entity_id = event.data.get("entity_id")
-        new_state = event.data.get("new_state")
+        entity_id = update.entity_id
+        new_state = update.new_state
 
         if new_state is None:
-            _LOGGER.debug("Sensore %s rimosso, ignorato", entity_id)
-            return
-
-        _LOGGER.debug(
-            "Cambio stato rilevato per %s: %s",
-            entity_id,
-            new_state.state,
+            # Sensore rimosso: come non disponibile, il suo contributo esce dal totale
+            _LOGGER.debug("Sensore %s rimosso, contributo sottratto dal totale", entity_id)
+        else:
+            _LOGGER.debug(
+                "Cambio stato rilevato per %s: %s",
+                entity_id,
+                new_state.state,
+            )
+
+        # Aggiorna il totale con il solo delta del sensore cambiato (None se rimosso)
+        value = update.power
+        if self.latency is not None and value is not None:
+            # Solo le letture valide aprono l'intervallo di aggregazione
+            self.latency.mark_event()
+        if entity_id in self._power_sensor_set:
+            self._apply_sensor_value(entity_id, value)
+        else:
+            # Sensore di un solo circuito secondario: non entra nel totale principale
+            self._sensor_values[entity_id] = value
+        circuits_changed = self.circuits is not None and self.circuits.apply_sensor(
+            entity_id, value, update.unit
         )
+        if new_state is None:
+            # Come nella scansione completa, un sensore rimosso non compare tra i valori
+            del self._sensor_values[entity_id]
+
+        if (
+            self._coalesce_window <= 0
+            or circuits_changed
+            or (self._total_power > self._threshold) != self._published_over
+            or self._is_over_hard(self._total_power) != self._published_hard
+        ):
+            # Finestra disattivata o attraversamento di una soglia: pubblica subito,
+            # il PowerManager viene notificato nella stessa iterazione del loop
+            self._async_publish_power()
+        elif self._flush_handle is None:
+            # Apre una finestra: gli eventi successivi confluiscono in questa pubblicazione
+            self._flush_handle = self.hass.loop.call_later(
+                self._coalesce_window, self._async_publish_power
+            )
 
-        # Ricalcola potenza totale
-        self.hass.async_create_task(self._async_update_power())
+    @callback
+    def _async_publish_power(self, force: bool = False) -> None:
+        """Pubblica il totale corrente e notifica i listener se significativo.
 
-    async def _async_update_power(self) -> None:
-        """Ricalcola la potenza totale e notifica i listener."""
-        self.data = await self._calculate_total_power()
-        # Notifica tutti i listener (PowerManager)
-        self.async_update_listeners()
+        Chiude l'eventuale finestra di coalescenza ancora aperta.
+
+        Args:
+            force: Notifica i listener anche se la variazione non è significativa
+        """
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        self.data = self._build_data()
+        total = self.data["total_power"]
+        is_over = self.data["is_over_threshold"]
+        is_over_hard = self.data["is_over_hard_threshold"]
+        overloaded_circuits = self.data["overloaded_circuits"]
+        now = self.hass.loop.time()
+        self.history.append(now, total)
+        if self.latency is not None:
+            if is_over != self._published_over:
+                self.latency.mark_crossed(is_over)
+            self.latency.mark_aggregated()
+
+        if (
+            force
+            or is_over
+            or is_over != self._published_over
+            or is_over_hard != self._published_hard
+            or overloaded_circuits != self._published_circuits
+            or self._is_significant(total, now)
+        ):
+            self._async_notify_listeners()
+        elif self._silence_handle is None:
+            # Variazione trattenuta: sarà comunque notificata entro max_silence
+            self._silence_handle = self.hass.loop.call_at(
+                self._notified_at + self._max_silence,
+                self._async_notify_listeners,
+            )
+
+        self._published_over = is_over
+        self._published_hard = is_over_hard
+        self._published_circuits = overloaded_circuits
+
+        for sample_callback in self._sample_listeners:
+            sample_callback()
+
+    @callback
+    def async_add_sample_listener(self, sample_callback: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Registra un callback invocato ad ogni totale pubblicato.
 
-    async def _calculate_total_power(self) -> dict[str, Any]:
-        """Calcola la potenza totale da tutti i sensori.
+        A differenza di async_add_listener non passa dal filtro di significatività:
+        serve a chi deve osservare ogni campione (es. stima del trend).
+
+        Args:
+            sample_callback: Callback senza argomenti
 
         Returns:
-            Dict con total_power, sensor_values, last_update, is_over_threshold
+            Funzione per rimuovere il listener
         """
-        total = 0.0
-        sensor_values = {}
+        self._sample_listeners.append(sample_callback)
 
-        for entity_id in self._power_sensors:
-            state = self.hass.states.get(entity_id)
+        @callback
+        def remove_listener() -> None:
+            self._sample_listeners.remove(sample_callback)
 
-            if state is None:
-                # Potrebbe non essere ancora pronto all'avvio
-                _LOGGER.debug("Sensore %s non trovato (o non ancora disponibile)", entity_id)
-                continue
+        return remove_listener
 
-            if state.state in ["unknown", "unavailable"]:
-                _LOGGER.debug(
-                    "Sensore %s in stato %s, ignorato",
-                    entity_id,
-                    state.state,
-                )
-                sensor_values[entity_id] = None
-                continue
+    def _is_significant(self, total: float, now: float) -> bool:
+        """Verifica se il nuovo totale giustifica una notifica ai listener.
 
-            try:
-                value = float(state.state)
-                sensor_values[entity_id] = value
-                total += value
-                _LOGGER.debug("Sensore %s: %.1fW", entity_id, value)
-            except (ValueError, TypeError) as err:
-                _LOGGER.warning(
-                    "Impossibile convertire valore di %s a float: %s (errore: %s)",
-                    entity_id,
-                    state.state,
-                    err,
-                )
-                sensor_values[entity_id] = None
+        Args:
+            total: Totale appena pubblicato
+            now: Istante corrente (tempo monotono del loop)
+
+        Returns:
+            True se la variazione supera la deadband o il silenzio è troppo lungo
+        """
+        delta = abs(total - self._notified_total)
+        return (
+            delta > self._deadband
+            or delta > abs(self._notified_total) * self._deadband_ratio > 0
+            or now - self._notified_at >= self._max_silence
+        )
+
+    @callback
+    def _async_notify_listeners(self) -> None:
+        """Notifica i listener con l'ultimo totale pubblicato."""
+        if self._silence_handle:
+            self._silence_handle.cancel()
+            self._silence_handle = None
+
+        self._notified_total = self.data["total_power"]
+        self._notified_at = self.hass.loop.time()
+        if self.latency is not None:
+            self.latency.mark_notified()
+        # Notifica tutti i listener (PowerManager)
+        self.async_update_listeners()
 
-        is_over_threshold = total > self._threshold
+    @callback
+    def _apply_sensor_value(self, entity_id: str, value: float | None) -> None:
+        """Aggiorna il totale applicando il delta di un singolo sensore.
+
+        Ogni AGGREGATE_RESYNC_INTERVAL eventi il totale viene ricalcolato
+        dai valori in cache per azzerare l'errore accumulato dalle somme float.
+
+        Args:
+            entity_id: ID del sensore cambiato
+            value: Nuovo valore in Watt (None se non disponibile)
+        """
+        old_value = self._sensor_values.get(entity_id)
+        self._sensor_values[entity_id] = value
+        self._total_power += (value or 0.0) - (old_value or 0.0)
+
+        self._events_since_resync += 1
+        if self._events_since_resync >= AGGREGATE_RESYNC_INTERVAL:
+            self._resync_total()
+
+    @callback
+    def _resync_total(self) -> None:
+        """Ricalcola il totale esatto dai valori in cache (senza leggere gli stati)."""
+        self._total_power = math.fsum(
+            value
+            for entity_id, value in self._sensor_values.items()
+            if value is not None and entity_id in self._power_sensor_set
+        )
+        if self.circuits is not None:
+            self.circuits.resync()
+        self._events_since_resync = 0
+
+    @callback
+    def _build_data(self) -> dict[str, Any]:
+        """Costruisce il dict dei dati a partire dall'aggregatore.
+
+        Returns:
+            Dict con total_power, sensor_values, last_update, is_over_threshold,
+            is_over_hard_threshold, overloaded_circuits
+        """
+        total = self._total_power
+        overloaded_circuits = (
+            tuple(node.name for node in self.circuits.overloaded)
+            if self.circuits is not None
+            else ()
+        )
+        is_over_threshold = total > self._threshold or bool(overloaded_circuits)
 
         _LOGGER.debug(
             "Potenza totale calcolata: %.1fW (soglia: %dW, superata: %s)",
@@ -143,18 +402,91 @@ class PowerCoordinator(DataUpdateCoordinator):
 
         return {
             "total_power": total,
-            "sensor_values": sensor_values,
+            # Vista in sola lettura sulla cache: evita una copia O(N) ad ogni evento
+            "sensor_values": self._sensor_values_view,
             "last_update": datetime.now(),
             "is_over_threshold": is_over_threshold,
+            "is_over_hard_threshold": self._is_over_hard(total),
+            # Circuiti secondari sopra soglia, dal più profondo
+            "overloaded_circuits": overloaded_circuits,
         }
 
+    def _tracked_sensors(self) -> list[str]:
+        """Sensori della soglia principale e dei circuiti secondari, senza duplicati."""
+        sensors = list(self._power_sensors)
+        if self.circuits is not None:
+            sensors.extend(
+                sensor for sensor in self.circuits.sensors if sensor not in self._power_sensor_set
+            )
+        return sensors
+
+    def _compute_hard_threshold(self) -> float | None:
+        """Calcola la soglia di emergenza dalla soglia corrente.
+
+        Returns:
+            Soglia di emergenza in Watt, o None se disattivata
+        """
+        if self._hard_threshold_pct <= 0:
+            return None
+        return self._threshold * (1 + self._hard_threshold_pct / 100)
+
+    def _is_over_hard(self, total: float) -> bool:
+        """Verifica il superamento della soglia di emergenza.
+
+        Args:
+            total: Potenza totale in Watt
+
+        Returns:
+            True se la soglia di emergenza è attiva e superata
+        """
+        return self._hard_threshold is not None and total > self._hard_threshold
+
+    @callback
+    def _calculate_total_power(self) -> dict[str, Any]:
+        """Calcola la potenza totale rileggendo tutti i sensori.
+
+        Scansione completa O(N): usata all'avvio e su richiesta esplicita,
+        gli eventi successivi aggiornano il totale in modo incrementale.
+
+        Returns:
+            Dict con total_power, sensor_values, last_update, is_over_threshold
+        """
+        self._sensor_values.clear()
+
+        for entity_id in self._tracked_sensors():
+            state = self.hass.states.get(entity_id)
+
+            if state is None:
+                # Potrebbe non essere ancora pronto all'avvio
+                _LOGGER.debug("Sensore %s non trovato (o non ancora disponibile)", entity_id)
+                continue
+
+            value = parse_power(entity_id, state)
+            self._sensor_values[entity_id] = value
+            if self.circuits is not None:
+                self.circuits.apply_sensor(
+                    entity_id, value, state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+                )
+            if value is not None:
+                _LOGGER.debug("Sensore %s: %.1fW", entity_id, value)
+
+        self._resync_total()
+        data = self._build_data()
+        self._published_over = data["is_over_threshold"]
+        self._published_hard = data["is_over_hard_threshold"]
+        self._published_circuits = data["overloaded_circuits"]
+        self._notified_total = data["total_power"]
+        self._notified_at = self.hass.loop.time()
+        self.history.append(self._notified_at, self._notified_total)
+        return data
+
     async def _async_update_data(self) -> dict[str, Any]:
         """Fetch data - chiamato solo manualmente o al setup iniziale.
 
         Returns:
             Dati di potenza calcolati
         """
-        return await self._calculate_total_power()
+        return self._calculate_total_power()
 
     def update_threshold(self, new_threshold: int) -> None:
         """Aggiorna la soglia massima.
@@ -164,6 +496,7 @@ class PowerCoordinator(DataUpdateCoordinator):
         """
         old_threshold = self._threshold
         self._threshold = new_threshold
+        self._hard_threshold = self._compute_hard_threshold()
         _LOGGER.info(
             "Soglia aggiornata: %dW -> %dW",
             old_threshold,
@@ -171,4 +504,4 @@ class PowerCoordinator(DataUpdateCoordinator):
         )
 
         # Ricalcola per aggiornare is_over_threshold
-        self.hass.async_create_task(self._async_update_power())
+        self._async_publish_power(force=True)
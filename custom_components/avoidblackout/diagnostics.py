@@ -0,0 +1,69 @@
+"""Diagnostica per AvoidBlackout."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import PowerCoordinator
+from .power_manager import PowerManager
+
+# Numero massimo di campioni recenti inclusi nel download
+DIAGNOSTICS_MAX_SAMPLES = 300
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Ritorna la diagnostica della config entry.
+
+    Args:
+        hass: Istanza Home Assistant
+        entry: Config entry di cui generare la diagnostica
+
+    Returns:
+        Dict con configurazione, stato del manager e storico recente della potenza
+    """
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator: PowerCoordinator = data["coordinator"]
+    manager: PowerManager = data["manager"]
+    history = coordinator.history
+    power_data = coordinator.data or {}
+
+    latest = history.latest
+    now = latest[0] if latest else 0.0
+    samples = list(history.samples())[-DIAGNOSTICS_MAX_SAMPLES:]
+
+    return {
+        "config": data["config"],
+        "manager": manager.get_status(),
+        "dispatcher": coordinator.dispatcher.as_dict(),
+        # Percentili in ms degli intervalli del percorso critico (None = disattivata)
+        "latency": coordinator.latency.as_dict() if coordinator.latency else None,
+        "threshold_schedule": data["threshold_scheduler"].as_dict(),
+        "power": {
+            "total_power": power_data.get("total_power"),
+            "is_over_threshold": power_data.get("is_over_threshold"),
+            "sensor_values": dict(power_data.get("sensor_values", {})),
+        },
+        "history": {
+            "capacity": history.capacity,
+            "samples_count": len(history),
+            "windows": {
+                f"{int(span)}s": {
+                    "mean": history.mean(span),
+                    "max": history.max(span),
+                    "energy_wh": history.integral(span) / 3600,
+                }
+                for span in history.windows
+            }
+            if latest
+            else {},
+            # Timestamp relativi all'ultimo campione (secondi, negativi)
+            "recent_samples": [
+                [round(timestamp - now, 3), value] for timestamp, value in samples
+            ],
+        },
+    }
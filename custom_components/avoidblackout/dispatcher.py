@@ -0,0 +1,183 @@
+"""Dispatcher condiviso dei cambi di stato per AvoidBlackout.
+
+Con più config entry (es. un appartamento per entry) gli stessi sensori compaiono
+in più coordinator e manager. Il dispatcher, unico per il dominio, si iscrive una
+sola volta per entità e distribuisce ogni evento a tutti gli interessati tramite
+un indice entity_id → listener. Lo stato viene convertito in Watt al massimo una
+volta per evento, al primo listener che lo chiede, e condiviso con gli altri.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+import logging
+from typing import Any
+
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, State, callback
+from homeassistant.helpers.event import async_track_state_change_event
+
+_LOGGER = logging.getLogger(__name__)
+
+# Valore non ancora convertito (None è un valore valido: sensore non disponibile)
+_UNPARSED = object()
+
+
+def parse_power(entity_id: str, state: State) -> float | None:
+    """Converte lo stato di un sensore di potenza in Watt.
+
+    Args:
+        entity_id: ID del sensore (solo per i log)
+        state: Stato corrente del sensore
+
+    Returns:
+        Valore in Watt, oppure None se lo stato non è utilizzabile
+    """
+    if state.state in ["unknown", "unavailable"]:
+        _LOGGER.debug(
+            "Sensore %s in stato %s, ignorato",
+            entity_id,
+            state.state,
+        )
+        return None
+
+    try:
+        return float(state.state)
+    except (ValueError, TypeError) as err:
+        _LOGGER.warning(
+            "Impossibile convertire valore di %s a float: %s (errore: %s)",
+            entity_id,
+            state.state,
+            err,
+        )
+        return None
+
+
+class StateUpdate:
+    """Cambio di stato di un'entità, condiviso tra tutti i listener."""
+
+    __slots__ = ("entity_id", "old_state", "new_state", "_power")
+
+    def __init__(
+        self, entity_id: str, old_state: State | None, new_state: State | None
+    ) -> None:
+        """Inizializza l'aggiornamento.
+
+        Args:
+            entity_id: Entità cambiata
+            old_state: Stato precedente (None se appena creata)
+            new_state: Nuovo stato (None se rimossa)
+        """
+        self.entity_id = entity_id
+        self.old_state = old_state
+        self.new_state = new_state
+        self._power: Any = _UNPARSED
+
+    @property
+    def power(self) -> float | None:
+        """Nuovo stato in Watt, convertito una sola volta per evento."""
+        if self._power is _UNPARSED:
+            self._power = (
+                parse_power(self.entity_id, self.new_state)
+                if self.new_state is not None
+                else None
+            )
+        return self._power
+
+    @property
+    def unit(self) -> str | None:
+        """Unità di misura del nuovo stato."""
+        if self.new_state is None:
+            return None
+        return self.new_state.attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+
+
+class StateDispatcher:
+    """Iscrizione unica ai cambi di stato, distribuita a più listener."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Inizializza il dispatcher.
+
+        Args:
+            hass: Istanza Home Assistant
+        """
+        self.hass = hass
+        self._listeners: dict[str, list[Callable[[StateUpdate], None]]] = {}
+        self._unsubscribe: dict[str, CALLBACK_TYPE] = {}
+
+    @callback
+    def async_subscribe(
+        self,
+        entity_ids: Iterable[str],
+        listener: Callable[[StateUpdate], None],
+    ) -> CALLBACK_TYPE:
+        """Registra un listener per i cambi di stato di un insieme di entità.
+
+        Il listener viene chiamato nel loop con uno StateUpdate; l'iscrizione
+        a Home Assistant avviene solo per le entità non ancora seguite.
+
+        Args:
+            entity_ids: Entità da seguire
+            listener: Callback chiamata ad ogni cambio di stato
+
+        Returns:
+            Funzione per annullare la registrazione
+        """
+        entity_ids = tuple(dict.fromkeys(entity_ids))
+        new_entities = [
+            entity_id for entity_id in entity_ids if entity_id not in self._listeners
+        ]
+        for entity_id in entity_ids:
+            self._listeners.setdefault(entity_id, []).append(listener)
+        for entity_id in new_entities:
+            self._unsubscribe[entity_id] = self._async_track(entity_id)
+
+        @callback
+        def _remove() -> None:
+            for entity_id in entity_ids:
+                listeners = self._listeners.get(entity_id)
+                if listeners is None or listener not in listeners:
+                    continue
+                listeners.remove(listener)
+                if not listeners:
+                    # Ultimo interessato: annulla l'iscrizione a Home Assistant
+                    del self._listeners[entity_id]
+                    self._unsubscribe.pop(entity_id)()
+
+        return _remove
+
+    @callback
+    def _async_track(self, entity_id: str) -> CALLBACK_TYPE:
+        """Si iscrive ai cambi di stato di un'entità (punto di estensione).
+
+        Args:
+            entity_id: Entità da seguire
+
+        Returns:
+            Funzione per annullare l'iscrizione
+        """
+        return async_track_state_change_event(self.hass, entity_id, self._handle_event)
+
+    @callback
+    def _handle_event(self, event: Event) -> None:
+        """Distribuisce un cambio di stato a tutti i listener dell'entità.
+
+        Args:
+            event: Evento di cambio stato
+        """
+        entity_id = event.data["entity_id"]
+        listeners = self._listeners.get(entity_id)
+        if not listeners:
+            return
+        update = StateUpdate(
+            entity_id, event.data.get("old_state"), event.data.get("new_state")
+        )
+        # Copia: un listener può annullare la propria registrazione durante il giro
+        for listener in tuple(listeners):
+            listener(update)
+
+    def as_dict(self) -> dict[str, int]:
+        """Entità seguite e listener registrati, per la diagnostica."""
+        return {
+            "entities": len(self._listeners),
+            "listeners": sum(len(listeners) for listeners in self._listeners.values()),
+        }
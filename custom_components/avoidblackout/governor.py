@@ -0,0 +1,300 @@
+"""Governatore anti-oscillazione per AvoidBlackout.
+
+Con carichi vicini alla soglia il ciclo distacco → riaccensione → distacco
+consuma i relè e inonda il bus eventi. Il governatore tiene per ogni dispositivo
+gli istanti dell'ultima accensione e dell'ultimo spegnimento e un livello di
+backoff, più un budget globale di azioni al minuto:
+
+- un dispositivo spento resta spento almeno min_off_time secondi, raddoppiati ad
+  ogni distacco ravvicinato (backoff esponenziale);
+- un dispositivo acceso da meno di min_on_time secondi viene spento solo se non
+  ci sono alternative;
+- le riaccensioni rispettano il budget di azioni al minuto;
+- una riaccensione fallita viene ritentata dopo retry_delay secondi, raddoppiati
+  ad ogni errore consecutivo fino alla prima accensione osservata.
+
+I distacchi non vengono mai bloccati: proteggere il contatore ha la precedenza
+sull'usura dei relè.
+"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+from typing import Any
+
+# Finestra del budget di azioni (secondi)
+_BUDGET_WINDOW = 60.0
+
+
+class _DeviceRecord:
+    """Stato compatto di un dispositivo gestito."""
+
+    __slots__ = ("last_on", "last_off", "last_shed", "backoff", "failures", "retry_at")
+
+    def __init__(self) -> None:
+        """Inizializza il record (nessuna commutazione osservata)."""
+        self.last_on: float | None = None
+        self.last_off: float | None = None
+        self.last_shed: float | None = None
+        self.backoff = 0  # Distacchi ravvicinati consecutivi
+        self.failures = 0  # Riaccensioni fallite consecutive
+        self.retry_at: float | None = None
+
+
+class ActionGovernor:
+    """Limita la frequenza di distacchi e riaccensioni.
+
+    Tutti gli istanti sono secondi monotoni (loop.time()).
+    """
+
+    __slots__ = (
+        "_min_off_time",
+        "_min_on_time",
+        "_max_actions",
+        "_backoff_window",
+        "_max_backoff",
+        "_retry_delay",
+        "_devices",
+        "_actions",
+    )
+
+    def __init__(
+        self,
+        min_off_time: float,
+        min_on_time: float,
+        max_actions_per_minute: int,
+        backoff_window: float,
+        max_backoff: int,
+        retry_delay: float,
+    ) -> None:
+        """Inizializza il governatore.
+
+        Args:
+            min_off_time: Secondi minimi di spegnimento prima di una riaccensione
+            min_on_time: Secondi minimi di accensione prima di un distacco
+            max_actions_per_minute: Azioni massime al minuto (0 = nessun limite)
+            backoff_window: Due distacchi entro questa finestra aumentano il backoff
+            max_backoff: Livello massimo di backoff (min_off_time × 2^livello)
+            retry_delay: Secondi prima di ritentare una riaccensione fallita
+        """
+        self._min_off_time = min_off_time
+        self._min_on_time = min_on_time
+        self._max_actions = max_actions_per_minute
+        self._backoff_window = backoff_window
+        self._max_backoff = max_backoff
+        self._retry_delay = retry_delay
+        self._devices: dict[str, _DeviceRecord] = {}
+        self._actions: deque[float] = deque()
+
+    @property
+    def min_on_time(self) -> float:
+        """Secondi minimi di accensione prima di un distacco."""
+        return self._min_on_time
+
+    def _record(self, entity_id: str) -> _DeviceRecord:
+        """Record del dispositivo (creato al primo uso)."""
+        record = self._devices.get(entity_id)
+        if record is None:
+            record = self._devices[entity_id] = _DeviceRecord()
+        return record
+
+    def record_on(self, entity_id: str, now: float) -> None:
+        """Registra un'accensione osservata (automatica o manuale).
+
+        Args:
+            entity_id: Dispositivo acceso
+            now: Istante monotono
+        """
+        record = self._record(entity_id)
+        record.last_on = now
+        record.failures = 0
+        record.retry_at = None
+
+    def record_off(self, entity_id: str, now: float) -> None:
+        """Registra uno spegnimento osservato (automatico o manuale).
+
+        Args:
+            entity_id: Dispositivo spento
+            now: Istante monotono
+        """
+        self._record(entity_id).last_off = now
+
+    def record_shed(self, entity_id: str, now: float) -> None:
+        """Registra un distacco deciso dal manager e aggiorna il backoff.
+
+        Un distacco entro backoff_window dal precedente aumenta il livello,
+        uno più distante lo riduce di uno.
+
+        Args:
+            entity_id: Dispositivo spento
+            now: Istante monotono
+        """
+        record = self._record(entity_id)
+        if record.last_shed is not None and now - record.last_shed < self._backoff_window:
+            record.backoff = min(record.backoff + 1, self._max_backoff)
+        else:
+            record.backoff = max(record.backoff - 1, 0)
+        record.last_shed = now
+        record.last_off = now
+        self.record_action(now)
+
+    def record_restore_failure(self, entity_id: str, now: float) -> None:
+        """Registra una riaccensione fallita e rimanda il prossimo tentativo.
+
+        L'attesa raddoppia ad ogni errore consecutivo (fino a max_backoff
+        raddoppi) e si azzera alla prima accensione osservata.
+
+        Args:
+            entity_id: Dispositivo non riacceso
+            now: Istante monotono
+        """
+        record = self._record(entity_id)
+        record.retry_at = now + self._retry_delay * (2 ** min(record.failures, self._max_backoff))
+        record.failures += 1
+
+    def record_action(self, now: float) -> None:
+        """Conta un'azione nel budget al minuto.
+
+        Args:
+            now: Istante monotono
+        """
+        self._expire_actions(now)
+        self._actions.append(now)
+
+    def off_hold(self, entity_id: str) -> float:
+        """Tempo minimo di spegnimento del dispositivo, backoff incluso.
+
+        Args:
+            entity_id: Dispositivo gestito
+
+        Returns:
+            Secondi
+        """
+        record = self._devices.get(entity_id)
+        backoff = record.backoff if record is not None else 0
+        return self._min_off_time * (2**backoff)
+
+    def restore_delay(self, entity_id: str, now: float) -> float:
+        """Secondi da attendere prima di poter riaccendere il dispositivo.
+
+        Args:
+            entity_id: Dispositivo da riaccendere
+            now: Istante monotono
+
+        Returns:
+            0 se la riaccensione è consentita ora
+        """
+        delay = 0.0
+        record = self._devices.get(entity_id)
+        if record is not None and record.last_off is not None:
+            delay = record.last_off + self.off_hold(entity_id) - now
+        if record is not None and record.retry_at is not None:
+            delay = max(delay, record.retry_at - now)
+
+        if self._max_actions > 0:
+            self._expire_actions(now)
+            if len(self._actions) >= self._max_actions:
+                # Si libera un posto quando l'azione più vecchia esce dalla finestra
+                delay = max(delay, self._actions[0] + _BUDGET_WINDOW - now)
+        return max(delay, 0.0)
+
+    def shed_hold(self, entity_id: str, now: float) -> float:
+        """Secondi al termine del tempo minimo di accensione.
+
+        Args:
+            entity_id: Dispositivo candidato al distacco
+            now: Istante monotono
+
+        Returns:
+            0 se il dispositivo è acceso da almeno min_on_time
+        """
+        record = self._devices.get(entity_id)
+        if record is None or record.last_on is None:
+            return 0.0
+        return max(record.last_on + self._min_on_time - now, 0.0)
+
+    def as_dict(self, now: float) -> dict[str, Any]:
+        """Stato corrente per get_status() e la diagnostica.
+
+        Args:
+            now: Istante monotono
+
+        Returns:
+            Dict con azioni nell'ultimo minuto e stato per dispositivo
+        """
+        self._expire_actions(now)
+        return {
+            "actions_last_minute": len(self._actions),
+            "max_actions_per_minute": self._max_actions,
+            "devices": {
+                entity_id: {
+                    "backoff": record.backoff,
+                    "restore_failures": record.failures,
+                    "off_hold": self.off_hold(entity_id),
+                    "restore_in": round(self.restore_delay(entity_id, now), 1),
+                    "shed_hold": round(self.shed_hold(entity_id, now), 1),
+                }
+                for entity_id, record in self._devices.items()
+            },
+        }
+
+    def snapshot(self, offset: float) -> dict[str, Any]:
+        """Stato da persistere, con istanti convertiti in tempo reale (epoch).
+
+        Args:
+            offset: Differenza tra tempo reale e tempo monotono del loop
+
+        Returns:
+            Dict serializzabile per lo Store
+        """
+
+        def _wall(moment: float | None) -> float | None:
+            return None if moment is None else moment + offset
+
+        return {
+            "devices": {
+                entity_id: {
+                    "last_on": _wall(record.last_on),
+                    "last_off": _wall(record.last_off),
+                    "last_shed": _wall(record.last_shed),
+                    "backoff": record.backoff,
+                    "failures": record.failures,
+                    "retry_at": _wall(record.retry_at),
+                }
+                for entity_id, record in self._devices.items()
+            },
+            "actions": [moment + offset for moment in self._actions],
+        }
+
+    def restore(self, data: dict[str, Any], offset: float, managed: Iterable[str]) -> None:
+        """Ripristina lo stato salvato da snapshot().
+
+        I record dei dispositivi non più gestiti vengono scartati.
+
+        Args:
+            data: Dict salvato
+            offset: Differenza tra tempo reale e tempo monotono del loop corrente
+            managed: Dispositivi gestiti dalla configurazione corrente
+        """
+        managed = set(managed)
+
+        def _monotonic(moment: float | None) -> float | None:
+            return None if moment is None else float(moment) - offset
+
+        for entity_id, saved in data.get("devices", {}).items():
+            if entity_id not in managed:
+                continue
+            record = self._record(entity_id)
+            record.last_on = _monotonic(saved.get("last_on"))
+            record.last_off = _monotonic(saved.get("last_off"))
+            record.last_shed = _monotonic(saved.get("last_shed"))
+            record.backoff = min(int(saved.get("backoff", 0)), self._max_backoff)
+            record.failures = int(saved.get("failures", 0))
+            record.retry_at = _monotonic(saved.get("retry_at"))
+        self._actions = deque(sorted(float(moment) - offset for moment in data.get("actions", [])))
+
+    def _expire_actions(self, now: float) -> None:
+        """Rimuove le azioni uscite dalla finestra del budget."""
+        horizon = now - _BUDGET_WINDOW
+        while self._actions and self._actions[0] <= horizon:
+            self._actions.popleft()
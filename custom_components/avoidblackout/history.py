@@ -0,0 +1,405 @@
+"""Storico in memoria della potenza totale per AvoidBlackout.
+
+Ring buffer a capacità fissa basato su array('d'): nessuna allocazione per campione
+e statistiche su finestre temporali scorrevoli (media, massimo, integrale, pendenza)
+in O(1) ammortizzato, senza interrogare il database del recorder.
+"""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+
+# Durata minima per calcolare una media pesata (evita divisioni per residui float)
+_MIN_DURATION = 1e-6
+# Varianza minima (W²) per considerare la potenza non costante nel calcolo di R²
+_MIN_VARIANCE = 1e-6
+
+
+class _WindowStats:
+    """Statistiche incrementali di una finestra temporale scorrevole.
+
+    Ogni campione i rappresenta un segmento a potenza costante da t_i a t_{i+1}
+    (sample-and-hold). La finestra contiene i campioni con t_i >= t_ultimo - span;
+    energia e durata considerano solo i segmenti già chiusi.
+
+    Per la regressione lineare si mantengono le somme dei minimi quadrati con
+    x = t - origin, dove origin segue l'ultimo campione: le x restano piccole e
+    le somme non perdono precisione anche dopo giorni di funzionamento.
+    """
+
+    __slots__ = (
+        "span",
+        "tail",
+        "energy",
+        "duration",
+        "max_queue",
+        "max_head",
+        "max_size",
+        "origin",
+        "n",
+        "sum_x",
+        "sum_y",
+        "sum_xx",
+        "sum_xy",
+        "sum_yy",
+    )
+
+    def __init__(self, span: float, capacity: int) -> None:
+        """Inizializza la finestra.
+
+        Args:
+            span: Ampiezza della finestra in secondi
+            capacity: Capacità del ring buffer (dimensione della coda dei massimi)
+        """
+        self.span = span
+        self.tail = 0  # Sequenza del campione più vecchio nella finestra
+        self.energy = 0.0  # W·s dei segmenti chiusi nella finestra
+        self.duration = 0.0  # s dei segmenti chiusi nella finestra
+        # Coda monotona (decrescente) di sequenze per il massimo scorrevole
+        self.max_queue = array("q", bytes(8 * capacity))
+        self.max_head = 0
+        self.max_size = 0
+        # Somme per la regressione lineare (x relative a origin)
+        self.origin = 0.0
+        self.n = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+        self.sum_yy = 0.0  # non dipende dall'origine delle x
+
+    def rebase(self, origin: float) -> None:
+        """Sposta l'origine delle x aggiornando le somme in O(1).
+
+        Args:
+            origin: Nuova origine (timestamp)
+        """
+        shift = origin - self.origin
+        if shift:
+            n = self.n
+            self.sum_xx += -2 * shift * self.sum_x + n * shift * shift
+            self.sum_xy -= shift * self.sum_y
+            self.sum_x -= n * shift
+            self.origin = origin
+
+
+class PowerHistory:
+    """Ring buffer di campioni (timestamp monotono, potenza totale).
+
+    Le finestre vengono dichiarate in anticipo (o aggiunte con add_window) e
+    mantenute ad ogni append: le interrogazioni mean/max/integral/slope costano O(1).
+    """
+
+    def __init__(self, capacity: int, windows: tuple[float, ...] = ()) -> None:
+        """Inizializza lo storico.
+
+        Args:
+            capacity: Numero massimo di campioni conservati
+            windows: Ampiezze delle finestre statistiche in secondi
+        """
+        if capacity < 2:
+            raise ValueError("La capacità dello storico deve essere almeno 2")
+
+        self._capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        # Energia del segmento che inizia al campione i (nota all'arrivo di i+1)
+        self._energy = array("d", bytes(8 * capacity))
+        self._count = 0  # Numero totale di campioni ricevuti (sequenza successiva)
+        self._windows: dict[float, _WindowStats] = {}
+
+        for span in windows:
+            self.add_window(span)
+
+    @property
+    def capacity(self) -> int:
+        """Capacità massima del buffer."""
+        return self._capacity
+
+    @property
+    def windows(self) -> tuple[float, ...]:
+        """Ampiezze delle finestre mantenute."""
+        return tuple(self._windows)
+
+    def __len__(self) -> int:
+        """Numero di campioni attualmente conservati."""
+        return min(self._count, self._capacity)
+
+    @property
+    def latest(self) -> tuple[float, float] | None:
+        """Ultimo campione (timestamp, potenza) o None se vuoto."""
+        if not self._count:
+            return None
+        slot = (self._count - 1) % self._capacity
+        return self._timestamps[slot], self._values[slot]
+
+    def add_window(self, span: float) -> None:
+        """Aggiunge una finestra statistica, inizializzandola dai campioni presenti.
+
+        Args:
+            span: Ampiezza della finestra in secondi
+        """
+        if span in self._windows:
+            return
+
+        window = _WindowStats(span, self._capacity)
+        self._windows[span] = window
+        if self._count:
+            self._rebuild_window(window)
+
+    def append(self, timestamp: float, value: float) -> None:
+        """Aggiunge un campione (O(1) ammortizzato, nessuna allocazione).
+
+        Args:
+            timestamp: Istante monotono in secondi (non decrescente)
+            value: Potenza totale in Watt
+        """
+        capacity = self._capacity
+        seq = self._count
+        slot = seq % capacity
+
+        if seq:
+            # Chiude il segmento del campione precedente
+            prev_slot = (seq - 1) % capacity
+            dt = max(timestamp - self._timestamps[prev_slot], 0.0)
+            energy = self._values[prev_slot] * dt
+            self._energy[prev_slot] = energy
+            for window in self._windows.values():
+                window.energy += energy
+                window.duration += dt
+
+        if seq >= capacity:
+            # Il campione più vecchio sta per essere sovrascritto
+            oldest = seq - capacity
+            for window in self._windows.values():
+                if window.tail == oldest:
+                    self._evict(window)
+
+        self._timestamps[slot] = timestamp
+        self._values[slot] = value
+        self._energy[slot] = 0.0
+        self._count = seq + 1
+
+        for window in self._windows.values():
+            # Esclude i campioni usciti dalla finestra temporale
+            horizon = timestamp - window.span
+            while window.tail < seq and self._timestamps[window.tail % capacity] < horizon:
+                self._evict(window)
+
+            # Regressione: il nuovo campione ha x = 0 rispetto alla nuova origine
+            window.rebase(timestamp)
+            window.n += 1
+            window.sum_y += value
+            window.sum_yy += value * value
+
+            # Coda dei massimi: rimuove in coda i valori dominati dal nuovo campione
+            queue = window.max_queue
+            while window.max_size:
+                back = queue[(window.max_head + window.max_size - 1) % capacity]
+                if self._values[back % capacity] > value:
+                    break
+                window.max_size -= 1
+            queue[(window.max_head + window.max_size) % capacity] = seq
+            window.max_size += 1
+
+        if self._count % capacity == 0:
+            # Risincronizzazione periodica delle somme contro la deriva float
+            for window in self._windows.values():
+                self._resync_sums(window)
+
+    def mean(self, span: float) -> float | None:
+        """Media pesata nel tempo sulla finestra.
+
+        Args:
+            span: Ampiezza della finestra (deve essere stata dichiarata)
+
+        Returns:
+            Potenza media in Watt, o None se lo storico è vuoto
+        """
+        window = self._windows[span]
+        if window.duration > _MIN_DURATION:
+            return window.energy / window.duration
+        latest = self.latest
+        return latest[1] if latest else None
+
+    def max(self, span: float) -> float | None:
+        """Potenza massima nella finestra.
+
+        Args:
+            span: Ampiezza della finestra (deve essere stata dichiarata)
+
+        Returns:
+            Potenza massima in Watt, o None se lo storico è vuoto
+        """
+        window = self._windows[span]
+        if not window.max_size:
+            return None
+        return self._values[window.max_queue[window.max_head] % self._capacity]
+
+    def integral(self, span: float) -> float:
+        """Energia nella finestra (segmenti chiusi).
+
+        Args:
+            span: Ampiezza della finestra (deve essere stata dichiarata)
+
+        Returns:
+            Energia in W·s (Joule)
+        """
+        return self._windows[span].energy
+
+    def slope(self, span: float) -> float | None:
+        """Pendenza della retta dei minimi quadrati sui campioni della finestra.
+
+        Args:
+            span: Ampiezza della finestra (deve essere stata dichiarata)
+
+        Returns:
+            Pendenza in W/s, o None se i campioni non bastano per stimarla
+        """
+        window = self._windows[span]
+        n = window.n
+        if n < 2:
+            return None
+        denominator = n * window.sum_xx - window.sum_x * window.sum_x
+        if denominator <= _MIN_DURATION:
+            return None
+        return (n * window.sum_xy - window.sum_x * window.sum_y) / denominator
+
+    def r_squared(self, span: float) -> float | None:
+        """Coefficiente di determinazione della retta dei minimi quadrati.
+
+        Misura quanto i campioni della finestra seguono un andamento lineare:
+        1 per una rampa pulita, vicino a 0 per rumore attorno a un valore stabile.
+
+        Args:
+            span: Ampiezza della finestra (deve essere stata dichiarata)
+
+        Returns:
+            R² tra 0 e 1, o None se i campioni non bastano o la potenza è costante
+        """
+        window = self._windows[span]
+        n = window.n
+        if n < 3:
+            return None
+        var_x = n * window.sum_xx - window.sum_x * window.sum_x
+        var_y = n * window.sum_yy - window.sum_y * window.sum_y
+        if var_x <= _MIN_DURATION or var_y <= _MIN_VARIANCE * n * n:
+            return None
+        cov = n * window.sum_xy - window.sum_x * window.sum_y
+        return min(cov * cov / (var_x * var_y), 1.0)
+
+    def samples(self, since: float | None = None) -> Iterator[tuple[float, float]]:
+        """Itera sui campioni dal più vecchio al più recente.
+
+        Args:
+            since: Se indicato, solo i campioni con timestamp >= since
+
+        Yields:
+            Tuple (timestamp, potenza)
+        """
+        capacity = self._capacity
+        for seq in range(max(0, self._count - capacity), self._count):
+            slot = seq % capacity
+            timestamp = self._timestamps[slot]
+            if since is None or timestamp >= since:
+                yield timestamp, self._values[slot]
+
+    def clear(self) -> None:
+        """Svuota lo storico mantenendo le finestre dichiarate."""
+        self._count = 0
+        for window in self._windows.values():
+            window.tail = 0
+            window.energy = 0.0
+            window.duration = 0.0
+            window.max_head = 0
+            window.max_size = 0
+            window.n = 0
+            window.sum_x = 0.0
+            window.sum_y = 0.0
+            window.sum_xx = 0.0
+            window.sum_xy = 0.0
+            window.sum_yy = 0.0
+
+    def _evict(self, window: _WindowStats) -> None:
+        """Rimuove dalla finestra il suo campione più vecchio (segmento chiuso).
+
+        Args:
+            window: Finestra da aggiornare
+        """
+        capacity = self._capacity
+        seq = window.tail
+        slot = seq % capacity
+        window.energy -= self._energy[slot]
+        window.duration -= self._timestamps[(seq + 1) % capacity] - self._timestamps[slot]
+        window.tail = seq + 1
+
+        x = self._timestamps[slot] - window.origin
+        y = self._values[slot]
+        window.n -= 1
+        window.sum_x -= x
+        window.sum_y -= y
+        window.sum_xx -= x * x
+        window.sum_xy -= x * y
+        window.sum_yy -= y * y
+
+        if window.max_size and window.max_queue[window.max_head] == seq:
+            window.max_head = (window.max_head + 1) % capacity
+            window.max_size -= 1
+
+    def _resync_sums(self, window: _WindowStats) -> None:
+        """Ricalcola le somme della finestra dai campioni conservati.
+
+        Args:
+            window: Finestra da risincronizzare
+        """
+        capacity = self._capacity
+        energy = 0.0
+        duration = 0.0
+        for seq in range(window.tail, self._count - 1):
+            slot = seq % capacity
+            energy += self._energy[slot]
+            duration += self._timestamps[(seq + 1) % capacity] - self._timestamps[slot]
+        window.energy = energy
+        window.duration = duration
+
+        # Somme della regressione, con origine sull'ultimo campione
+        window.origin = self._timestamps[(self._count - 1) % capacity]
+        window.n = 0
+        window.sum_x = window.sum_y = window.sum_xx = window.sum_xy = window.sum_yy = 0.0
+        for seq in range(window.tail, self._count):
+            slot = seq % capacity
+            x = self._timestamps[slot] - window.origin
+            y = self._values[slot]
+            window.n += 1
+            window.sum_x += x
+            window.sum_y += y
+            window.sum_xx += x * x
+            window.sum_xy += x * y
+            window.sum_yy += y * y
+
+    def _rebuild_window(self, window: _WindowStats) -> None:
+        """Inizializza una finestra aggiunta dopo l'arrivo di campioni.
+
+        Args:
+            window: Finestra da costruire
+        """
+        capacity = self._capacity
+        latest_seq = self._count - 1
+        horizon = self._timestamps[latest_seq % capacity] - window.span
+
+        tail = max(0, self._count - capacity)
+        while tail < latest_seq and self._timestamps[tail % capacity] < horizon:
+            tail += 1
+        window.tail = tail
+        self._resync_sums(window)
+
+        window.max_head = 0
+        window.max_size = 0
+        for seq in range(tail, self._count):
+            value = self._values[seq % capacity]
+            while window.max_size and (
+                self._values[window.max_queue[window.max_size - 1] % capacity] <= value
+            ):
+                window.max_size -= 1
+            window.max_queue[window.max_size] = seq
+            window.max_size += 1
@@ -0,0 +1,199 @@
+"""Misura delle latenze del percorso critico per AvoidBlackout.
+
+Istanti monotoni (time.perf_counter) catturati lungo il percorso evento del
+contatore → comando al relè:
+
+- evento: cambio di stato di un sensore ricevuto dal coordinator;
+- aggregazione: totale pubblicato (dopo l'eventuale finestra di coalescenza);
+- notifica: listener del coordinator notificati;
+- dispatch: inizio di PowerManager._handle_power_update;
+- decisione: scadenza del debounce (o distacco immediato);
+- chiamata: inizio e fine della chiamata al servizio del dispositivo.
+
+L'intervallo end-to-end va dall'evento che ha portato il totale oltre la soglia
+alla fine del primo turn_off successivo, e include quindi anche l'attesa del
+debounce (o della curva di intervento).
+
+Gli intervalli tra istanti successivi confluiscono in istogrammi a bucket
+logaritmici: registrare un campione costa O(1) senza allocazioni, i percentili
+vengono calcolati solo alla lettura (sensori diagnostici e diagnostica).
+Con la misura disattivata il tracker non viene creato e i punti di cattura si
+riducono a un confronto con None.
+"""
+from __future__ import annotations
+
+from array import array
+import math
+import time
+from typing import Any
+
+# Intervalli misurati
+STAGE_AGGREGATION = "aggregation"  # evento → totale pubblicato
+STAGE_DISPATCH = "dispatch"  # notifica → PowerManager
+STAGE_REACTION = "reaction"  # decisione di distacco → inizio della chiamata
+STAGE_SERVICE_CALL = "service_call"  # inizio → fine della chiamata al servizio
+STAGE_END_TO_END = "end_to_end"  # evento oltre soglia → fine del primo turn_off
+STAGES = (
+    STAGE_AGGREGATION,
+    STAGE_DISPATCH,
+    STAGE_REACTION,
+    STAGE_SERVICE_CALL,
+    STAGE_END_TO_END,
+)
+
+# Bucket logaritmici da 1µs a 100s, 16 per decade (errore relativo ≤ ~7.5%)
+_MIN_LATENCY = 1e-6
+_DECADES = 8
+_BUCKETS_PER_DECADE = 16
+_LOG_MIN = math.log10(_MIN_LATENCY)
+
+
+class LatencyHistogram:
+    """Istogramma a bucket logaritmici di durate in secondi."""
+
+    __slots__ = ("buckets", "count", "total", "minimum", "maximum")
+
+    def __init__(self) -> None:
+        """Inizializza un istogramma vuoto."""
+        # Bucket 0: sotto _MIN_LATENCY; ultimo bucket: oltre la scala
+        self.buckets = array("Q", bytes(8 * (_DECADES * _BUCKETS_PER_DECADE + 2)))
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Registra una durata in O(1).
+
+        Args:
+            seconds: Durata in secondi
+        """
+        if seconds < _MIN_LATENCY:
+            index = 0
+        else:
+            index = min(
+                int((math.log10(seconds) - _LOG_MIN) * _BUCKETS_PER_DECADE) + 1,
+                len(self.buckets) - 1,
+            )
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.minimum:
+            self.minimum = seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, fraction: float) -> float | None:
+        """Percentile stimato dal centro geometrico del bucket che lo contiene.
+
+        Args:
+            fraction: Quantile tra 0 e 1 (es. 0.95)
+
+        Returns:
+            Durata in secondi (entro minimo e massimo osservati), None se vuoto
+        """
+        if not self.count:
+            return None
+        rank = max(math.ceil(fraction * self.count), 1)
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                break
+        if index == 0:
+            estimate = self.minimum
+        else:
+            estimate = 10 ** (_LOG_MIN + (index - 0.5) / _BUCKETS_PER_DECADE)
+        return min(max(estimate, self.minimum), self.maximum)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Riepilogo in millisecondi (serializzabile)."""
+
+        def _ms(seconds: float | None) -> float | None:
+            return None if seconds is None else round(seconds * 1000, 3)
+
+        return {
+            "count": self.count,
+            "p50": _ms(self.percentile(0.50)),
+            "p95": _ms(self.percentile(0.95)),
+            "p99": _ms(self.percentile(0.99)),
+            "mean": _ms(self.total / self.count) if self.count else None,
+            "max": _ms(self.maximum) if self.count else None,
+        }
+
+
+class LatencyTracker:
+    """Istanti del percorso critico e istogrammi degli intervalli."""
+
+    __slots__ = ("histograms", "_event_at", "_notified_at", "_crossed_at")
+
+    def __init__(self) -> None:
+        """Inizializza il tracker con un istogramma per intervallo."""
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        # Primo evento non ancora pubblicato
+        self._event_at: float | None = None
+        # Ultima notifica dei listener non ancora ricevuta dal manager
+        self._notified_at: float | None = None
+        # Evento che ha superato la soglia, in attesa del primo distacco
+        self._crossed_at: float | None = None
+
+    @staticmethod
+    def now() -> float:
+        """Istante monotono corrente in secondi."""
+        return time.perf_counter()
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Registra la durata di un intervallo.
+
+        Args:
+            stage: Intervallo (STAGE_*)
+            seconds: Durata in secondi
+        """
+        self.histograms[stage].record(seconds)
+
+    def mark_event(self) -> None:
+        """Evento di un sensore: apre l'intervallo di aggregazione se non è già aperto."""
+        if self._event_at is None:
+            self._event_at = time.perf_counter()
+
+    def mark_crossed(self, is_over: bool) -> None:
+        """Totale pubblicato dopo un attraversamento della soglia.
+
+        Da chiamare prima di mark_aggregated, che chiude l'evento in corso.
+
+        Args:
+            is_over: True se il totale è salito oltre la soglia, False se è rientrato
+        """
+        if not is_over:
+            # Rientro senza distacchi: nessun intervallo end-to-end
+            self._crossed_at = None
+        elif self._crossed_at is None:
+            self._crossed_at = (
+                self._event_at if self._event_at is not None else time.perf_counter()
+            )
+
+    def mark_shed_completed(self) -> None:
+        """Chiamata turn_off completata: chiude l'intervallo end-to-end."""
+        if self._crossed_at is not None:
+            self.histograms[STAGE_END_TO_END].record(time.perf_counter() - self._crossed_at)
+            self._crossed_at = None
+
+    def mark_aggregated(self) -> None:
+        """Totale pubblicato: chiude l'intervallo di aggregazione."""
+        if self._event_at is not None:
+            self.histograms[STAGE_AGGREGATION].record(time.perf_counter() - self._event_at)
+            self._event_at = None
+
+    def mark_notified(self) -> None:
+        """Listener del coordinator in notifica: apre l'intervallo di dispatch."""
+        self._notified_at = time.perf_counter()
+
+    def mark_dispatched(self) -> None:
+        """Aggiornamento ricevuto dal manager: chiude l'intervallo di dispatch."""
+        if self._notified_at is not None:
+            self.histograms[STAGE_DISPATCH].record(time.perf_counter() - self._notified_at)
+            self._notified_at = None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Riepilogo di tutti gli intervalli, in millisecondi."""
+        return {stage: histogram.as_dict() for stage, histogram in self.histograms.items()}
@@ -0,0 +1,227 @@
+"""Apprendimento automatico dell'assorbimento dei dispositivi gestiti.
+
+Ad ogni accensione/spegnimento di un dispositivo gestito si confronta la potenza
+totale prima della commutazione con quella dopo LEARNER_WINDOW secondi: il gradino
+è un campione dell'assorbimento del dispositivo. Per ogni entità si conservano gli
+ultimi LEARNER_MAX_SAMPLES campioni (mediana robusta agli altri carichi della casa)
+e si persistono con lo Store di Home Assistant.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+import logging
+import math
+import statistics
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    LEARNER_CONFIDENT_SAMPLES,
+    LEARNER_MAX_SAMPLES,
+    LEARNER_SAVE_DELAY,
+    LEARNER_WINDOW,
+    STORAGE_VERSION,
+)
+from .coordinator import PowerCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _storage_key(entry_id: str) -> str:
+    """Chiave dello Store dell'apprendimento per una config entry."""
+    return f"{DOMAIN}.{entry_id}.device_power"
+
+
+class DevicePowerLearner:
+    """Stima per entità dell'assorbimento (mediana e confidenza)."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: PowerCoordinator,
+        entry_id: str | None = None,
+    ) -> None:
+        """Inizializza il learner.
+
+        Args:
+            hass: Istanza Home Assistant
+            coordinator: PowerCoordinator da cui leggere la potenza totale
+            entry_id: Config entry per la persistenza (None = solo in memoria)
+        """
+        self.hass = hass
+        self.coordinator = coordinator
+        self._store: Store | None = (
+            Store(hass, STORAGE_VERSION, _storage_key(entry_id)) if entry_id else None
+        )
+        self._samples: dict[str, deque[float]] = {}
+        # Commutazione in osservazione: entity_id → (accensione, potenza prima, timer)
+        self._pending: dict[str, tuple[bool, float, asyncio.TimerHandle]] = {}
+        # Fine della finestra dell'ultima commutazione (loop.time()): fino ad
+        # allora la potenza totale contiene gradini di più dispositivi
+        self._contaminated_until = -math.inf
+
+    async def async_load(self, entity_ids: list[str]) -> None:
+        """Carica i campioni salvati per le entità gestite.
+
+        Args:
+            entity_ids: Entità gestite (i campioni di altre entità vengono scartati)
+        """
+        self._samples = {
+            entity_id: deque(maxlen=LEARNER_MAX_SAMPLES) for entity_id in entity_ids
+        }
+        if self._store is None:
+            return
+
+        stored = await self._store.async_load() or {}
+        for entity_id, samples in stored.get("devices", {}).items():
+            if entity_id in self._samples:
+                self._samples[entity_id].extend(float(value) for value in samples)
+        _LOGGER.debug(
+            "Assorbimenti appresi caricati per %d dispositivi",
+            sum(1 for samples in self._samples.values() if samples),
+        )
+
+    async def async_stop(self) -> None:
+        """Annulla le osservazioni in corso e salva i campioni."""
+        self._discard_pending()
+        if self._store is not None:
+            await self._store.async_save(self._data_to_save())
+
+    @staticmethod
+    async def async_remove_store(hass: HomeAssistant, entry_id: str) -> None:
+        """Elimina i dati salvati di una config entry rimossa.
+
+        Args:
+            hass: Istanza Home Assistant
+            entry_id: Config entry rimossa
+        """
+        await Store(hass, STORAGE_VERSION, _storage_key(entry_id)).async_remove()
+
+    @callback
+    def async_record_toggle(self, entity_id: str, turned_on: bool) -> None:
+        """Registra l'accensione o lo spegnimento di un dispositivo gestito.
+
+        Ogni commutazione sporca la potenza totale per LEARNER_WINDOW secondi:
+        una commutazione che cade in una finestra ancora aperta (es. distacco
+        a gruppi) annulla l'osservazione in corso e non ne apre una nuova.
+
+        Args:
+            entity_id: Dispositivo commutato
+            turned_on: True se acceso, False se spento
+        """
+        if entity_id not in self._samples:
+            return
+
+        now = self.hass.loop.time()
+        contaminated = now < self._contaminated_until
+        self._contaminated_until = now + LEARNER_WINDOW
+        if contaminated:
+            _LOGGER.debug(
+                "Commutazioni sovrapposte (%s, %s), gradino non attribuibile",
+                entity_id,
+                ", ".join(self._pending) or "finestra precedente",
+            )
+            self._discard_pending()
+            return
+        if not self.coordinator.data:
+            return
+
+        handle = self.hass.loop.call_later(LEARNER_WINDOW, self._async_evaluate, entity_id)
+        self._pending[entity_id] = (
+            turned_on,
+            self.coordinator.data.get("total_power", 0),
+            handle,
+        )
+
+    @callback
+    def _async_evaluate(self, entity_id: str) -> None:
+        """Misura il gradino di potenza al termine della finestra di osservazione.
+
+        Args:
+            entity_id: Dispositivo osservato
+        """
+        turned_on, power_before, handle = self._pending.pop(entity_id)
+        if handle.when() + LEARNER_WINDOW <= self._contaminated_until:
+            # Un'altra commutazione è arrivata dopo questa: gradino non attribuibile
+            return
+        power_after = self.coordinator.data.get("total_power", 0)
+        draw = power_after - power_before if turned_on else power_before - power_after
+        if draw < 0:
+            # Il resto della casa è cambiato più del dispositivo: campione inutile
+            _LOGGER.debug("Gradino negativo per %s (%.1fW), scartato", entity_id, draw)
+            return
+
+        self._samples[entity_id].append(draw)
+        _LOGGER.debug(
+            "Assorbimento %s: campione %.1fW, stima %.1fW",
+            entity_id,
+            draw,
+            statistics.median(self._samples[entity_id]),
+        )
+        if self._store is not None:
+            self._store.async_delay_save(self._data_to_save, LEARNER_SAVE_DELAY)
+
+    def estimate(self, entity_id: str) -> tuple[float, float] | None:
+        """Stima l'assorbimento di un dispositivo.
+
+        La confidenza cresce con il numero di campioni (piena a
+        LEARNER_CONFIDENT_SAMPLES) e cala con la dispersione relativa (MAD/mediana).
+
+        Args:
+            entity_id: Dispositivo gestito
+
+        Returns:
+            Tupla (assorbimento mediano in Watt, confidenza 0..1), None senza campioni
+        """
+        samples = self._samples.get(entity_id)
+        if not samples:
+            return None
+
+        median = statistics.median(samples)
+        deviation = statistics.median(abs(value - median) for value in samples)
+        if median > 0:
+            spread = min(deviation / median, 1.0)
+        else:
+            spread = 0.0 if deviation == 0 else 1.0
+        confidence = min(len(samples) / LEARNER_CONFIDENT_SAMPLES, 1.0) * (1 - spread)
+        return median, confidence
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Stime correnti per la diagnostica.
+
+        Returns:
+            Dict entity_id → potenza, confidenza e numero di campioni
+        """
+        result = {}
+        for entity_id, samples in self._samples.items():
+            estimate = self.estimate(entity_id)
+            if estimate is None:
+                continue
+            result[entity_id] = {
+                "power": round(estimate[0], 1),
+                "confidence": round(estimate[1], 2),
+                "samples": len(samples),
+            }
+        return result
+
+    @callback
+    def _discard_pending(self) -> None:
+        """Annulla tutte le osservazioni in corso."""
+        for _, _, handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Dati da salvare nello Store."""
+        return {
+            "devices": {
+                entity_id: list(samples)
+                for entity_id, samples in self._samples.items()
+                if samples
+            }
+        }
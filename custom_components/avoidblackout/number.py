@@ -22,8 +22,9 @@ from .const import (
     MIN_THRESHOLD,
     THRESHOLD_STEP,
 )
-from .coordinator import PowerCoordinator
+from .options_writer import OptionsWriter
 from .power_manager import PowerManager
+from .schedule import ThresholdScheduler
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -35,11 +36,12 @@ async def async_setup_entry(
 ) -> None:
     """Configura i number entities per soglia e debounce."""
     data = hass.data[DOMAIN][entry.entry_id]
-    coordinator: PowerCoordinator = data["coordinator"]
     manager: PowerManager = data["manager"]
+    scheduler: ThresholdScheduler = data["threshold_scheduler"]
+    writer: OptionsWriter = data["options_writer"]
 
-    threshold_entity = AvoidBlackoutThresholdNumber(hass, entry, coordinator, manager)
-    debounce_entity = AvoidBlackoutDebounceNumber(hass, entry, manager)
+    threshold_entity = AvoidBlackoutThresholdNumber(hass, entry, scheduler, writer)
+    debounce_entity = AvoidBlackoutDebounceNumber(hass, entry, manager, writer)
 
     async_add_entities([threshold_entity, debounce_entity])
 
@@ -77,7 +79,9 @@ class AvoidBlackoutThresholdNumber(_AvoidBlackoutNumberBase):
     """Number entity per la soglia massima di potenza (W).
 
     Le modifiche vengono applicate in tempo reale senza riavvio dell'integrazione
-    e persistite nelle options della config entry.
+    e persistite nelle options della config entry dopo un periodo di quiete
+    (OptionsWriter), così le modifiche ravvicinate producono una sola scrittura.
+    Con le fasce orarie configurate è la soglia base, in vigore fuori dalle fasce.
     """
 
     _attr_icon = "mdi:lightning-bolt"
@@ -88,14 +92,14 @@ class AvoidBlackoutThresholdNumber(_AvoidBlackoutNumberBase):
         self,
         hass: HomeAssistant,
         entry: ConfigEntry,
-        coordinator: PowerCoordinator,
-        manager: PowerManager,
+        scheduler: ThresholdScheduler,
+        writer: OptionsWriter,
     ) -> None:
         """Inizializza il number entity per la soglia."""
         super().__init__(entry)
         self.hass = hass
-        self._coordinator = coordinator
-        self._manager = manager
+        self._scheduler = scheduler
+        self._writer = writer
 
         self._attr_unique_id = f"{entry.entry_id}_max_threshold"
         self._attr_native_min_value = float(MIN_THRESHOLD)
@@ -107,7 +111,7 @@ class AvoidBlackoutThresholdNumber(_AvoidBlackoutNumberBase):
         self._attr_native_value = float(config.get(CONF_MAX_THRESHOLD, DEFAULT_THRESHOLD))
 
     async def async_set_native_value(self, value: float) -> None:
-        """Applica la nuova soglia immediatamente e la persiste nelle options."""
+        """Applica la nuova soglia immediatamente e ne programma il salvataggio."""
         new_threshold = int(value)
         _LOGGER.info(
             "Soglia massima: %dW → %dW (via entity)",
@@ -115,19 +119,15 @@ class AvoidBlackoutThresholdNumber(_AvoidBlackoutNumberBase):
             new_threshold,
         )
 
-        # Applica subito al coordinator e manager
-        self._coordinator.update_threshold(new_threshold)
-        self._manager.update_threshold(new_threshold)
+        # Applica subito al coordinator e manager (fuori dalle fasce orarie)
+        self._scheduler.async_set_base(new_threshold)
 
         # Aggiorna stato locale
         self._attr_native_value = float(new_threshold)
         self.async_write_ha_state()
 
-        # Persisti nelle options (flag evita reload inutile nel listener)
-        self.hass.data[DOMAIN][self._entry.entry_id]["_updating_threshold"] = True
-        current_options = dict(self._entry.options)
-        current_options[CONF_MAX_THRESHOLD] = new_threshold
-        self.hass.config_entries.async_update_entry(self._entry, options=current_options)
+        # Persisti nelle options dopo il periodo di quiete (scritture coalescenti)
+        self._writer.async_set(CONF_MAX_THRESHOLD, new_threshold)
 
     @callback
     def async_refresh_from_config(self, new_threshold: int) -> None:
@@ -145,7 +145,8 @@ class AvoidBlackoutDebounceNumber(_AvoidBlackoutNumberBase):
     """Number entity per il tempo di debounce (s).
 
     Le modifiche vengono applicate in tempo reale senza riavvio dell'integrazione
-    e persistite nelle options della config entry.
+    e persistite nelle options della config entry dopo un periodo di quiete
+    (OptionsWriter), così le modifiche ravvicinate producono una sola scrittura.
     """
 
     _attr_icon = "mdi:timer-sand"
@@ -157,11 +158,13 @@ class AvoidBlackoutDebounceNumber(_AvoidBlackoutNumberBase):
         hass: HomeAssistant,
         entry: ConfigEntry,
         manager: PowerManager,
+        writer: OptionsWriter,
     ) -> None:
         """Inizializza il number entity per il debounce."""
         super().__init__(entry)
         self.hass = hass
         self._manager = manager
+        self._writer = writer
 
         self._attr_unique_id = f"{entry.entry_id}_debounce_time"
         self._attr_native_min_value = float(MIN_DEBOUNCE)
@@ -173,7 +176,7 @@ class AvoidBlackoutDebounceNumber(_AvoidBlackoutNumberBase):
         self._attr_native_value = float(config.get(CONF_DEBOUNCE_TIME, DEFAULT_DEBOUNCE))
 
     async def async_set_native_value(self, value: float) -> None:
-        """Applica il nuovo debounce immediatamente e lo persiste nelle options."""
+        """Applica il nuovo debounce immediatamente e ne programma il salvataggio."""
         new_debounce = int(value)
         _LOGGER.info(
             "Debounce: %ds → %ds (via entity)",
@@ -188,11 +191,8 @@ class AvoidBlackoutDebounceNumber(_AvoidBlackoutNumberBase):
         self._attr_native_value = float(new_debounce)
         self.async_write_ha_state()
 
-        # Persisti nelle options (flag evita reload inutile nel listener)
-        self.hass.data[DOMAIN][self._entry.entry_id]["_updating_debounce"] = True
-        current_options = dict(self._entry.options)
-        current_options[CONF_DEBOUNCE_TIME] = new_debounce
-        self.hass.config_entries.async_update_entry(self._entry, options=current_options)
+        # Persisti nelle options dopo il periodo di quiete (scritture coalescenti)
+        self._writer.async_set(CONF_DEBOUNCE_TIME, new_debounce)
 
     @callback
     def async_refresh_from_config(self, new_debounce: int) -> None:
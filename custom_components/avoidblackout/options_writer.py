@@ -0,0 +1,124 @@
+"""Scrittura differita e coalescente delle options modificate a runtime.
+
+I number entity (soglia, debounce) applicano subito il nuovo valore in memoria e
+lo affidano a OptionsWriter: le modifiche ravvicinate (slider trascinato,
+automazioni che regolano la soglia ogni minuto) confluiscono in un'unica
+async_update_entry dopo OPTIONS_SAVE_DELAY secondi di quiete, invece di
+riscrivere .storage/core.config_entries e rientrare nel listener delle options
+ad ogni pressione.
+
+Ogni modifica incrementa un contatore di versione; la scrittura registra la
+versione persistita, così "ci sono modifiche da salvare" è un confronto tra
+contatori e non un flag da consumare nel listener.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class OptionsWriter:
+    """Raccoglie le modifiche runtime delle options e le scrive dopo un periodo di quiete.
+
+    Il dizionario di configurazione in memoria (hass.data[DOMAIN][entry_id]["config"])
+    viene aggiornato subito: quando la scrittura differita rientra nel listener delle
+    options non risulta alcuna chiave cambiata e non viene riapplicato nulla.
+    """
+
+    __slots__ = (
+        "version",
+        "persisted_version",
+        "_hass",
+        "_entry",
+        "_config",
+        "_delay",
+        "_pending",
+        "_handle",
+    )
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        config: dict[str, Any],
+        delay: float,
+    ) -> None:
+        """Inizializza il writer.
+
+        Args:
+            hass: Istanza Home Assistant
+            entry: Config entry da aggiornare
+            config: Configurazione in memoria confrontata dal listener delle options
+            delay: Secondi di quiete prima della scrittura
+        """
+        self._hass = hass
+        self._entry = entry
+        self._config = config
+        self._delay = delay
+        self._pending: dict[str, Any] = {}
+        self._handle: asyncio.TimerHandle | None = None
+        # Versione dell'ultima modifica e dell'ultima scrittura nelle options
+        self.version = 0
+        self.persisted_version = 0
+
+    @property
+    def dirty(self) -> bool:
+        """True se ci sono modifiche non ancora scritte."""
+        return self.version != self.persisted_version
+
+    @callback
+    def async_set(self, key: str, value: Any) -> None:
+        """Registra una modifica già applicata in memoria e riavvia il periodo di quiete.
+
+        Args:
+            key: Chiave delle options
+            value: Nuovo valore
+        """
+        self._config[key] = value
+        self._pending[key] = value
+        self.version += 1
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = self._hass.loop.call_later(self._delay, self.async_flush)
+
+    @callback
+    def async_discard(self, key: str) -> None:
+        """Scarta la modifica in attesa di una chiave cambiata dall'options flow.
+
+        La modifica esterna è già nelle options e prevale su quella runtime.
+
+        Args:
+            key: Chiave delle options
+        """
+        if self._pending.pop(key, None) is None:
+            return
+        _LOGGER.debug("Modifica runtime di %s superata dalle options", key)
+        if not self._pending:
+            self._cancel()
+            self.persisted_version = self.version
+
+    @callback
+    def async_flush(self) -> None:
+        """Scrive subito le modifiche in attesa (scadenza del timer, options flow, stop)."""
+        self._cancel()
+        if not self.dirty:
+            return
+        options = {**self._entry.options, **self._pending}
+        _LOGGER.debug(
+            "Options salvate (versione %d): %s", self.version, sorted(self._pending)
+        )
+        self._pending.clear()
+        self.persisted_version = self.version
+        self._hass.config_entries.async_update_entry(self._entry, options=options)
+
+    def _cancel(self) -> None:
+        """Annulla la scrittura programmata."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
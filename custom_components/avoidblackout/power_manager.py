@@ -2,26 +2,187 @@
 import asyncio
 from datetime import datetime
 import logging
+import math
+import time
 from typing import Any
 
+from homeassistant.components.sensor import SensorDeviceClass
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.storage import Store
 
 from .const import (
+    BATCH_SHED_MARGIN,
+    CONF_AUTO_RESTORE,
+    CONF_BATCH_SHEDDING,
     CONF_DEBOUNCE_TIME,
     CONF_MANAGED_ENTITIES,
+    CONF_MAX_ACTIONS_PER_MINUTE,
     CONF_MAX_THRESHOLD,
+    CONF_MIN_OFF_TIME,
+    CONF_MIN_ON_TIME,
+    CONF_PREDICTIVE,
+    CONF_PREDICTIVE_HORIZON,
+    CONF_RESTORE_MARGIN,
+    CONF_RESTORE_SPACING,
+    CONF_SHED_VERIFY_WINDOW,
     CONF_TEST_MODE,
+    CONF_TRIP_CURVE,
+    CONF_TRIP_CURVE_ENABLED,
+    DEFAULT_AUTO_RESTORE,
+    DEFAULT_BATCH_SHEDDING,
+    DEFAULT_MAX_ACTIONS_PER_MINUTE,
+    DEFAULT_MIN_OFF_TIME,
+    DEFAULT_MIN_ON_TIME,
+    DEFAULT_PREDICTIVE,
+    DEFAULT_PREDICTIVE_HORIZON,
+    DEFAULT_RESTORE_MARGIN,
+    DEFAULT_RESTORE_SPACING,
+    DEFAULT_SHED_VERIFY_WINDOW,
+    DEFAULT_TRIP_CURVE,
+    DEFAULT_TRIP_CURVE_ENABLED,
+    DOMAIN,
+    DRAW_ATTRIBUTES,
+    EVENT_LOAD_RESTORED,
     EVENT_LOAD_SHEDDING,
+    GOVERNOR_BACKOFF_WINDOW,
+    GOVERNOR_MAX_BACKOFF,
+    GOVERNOR_RETRY_DELAY,
+    LEARNER_MIN_CONFIDENCE,
+    MANAGER_SAVE_DELAY,
+    POWER_UNIT_OF_MEASUREMENT,
+    PREDICTIVE_MIN_DEBOUNCE,
+    PREDICTIVE_MIN_R2,
+    PREDICTIVE_MIN_SLOPE,
+    PREDICTIVE_TREND_WINDOW,
+    RESTORE_AVERAGE_WINDOW,
     STATE_MONITORING,
     STATE_SHEDDING,
+    SHED_CALL_TIMEOUT,
+    SHED_VERIFY_DROP_RATIO,
+    SHED_VERIFY_MIN_DROP,
     STATE_WAITING,
+    STORAGE_VERSION,
+    TRIP_COOLING_TIME,
+    TRIP_LEVEL_AFTER_SHED,
+    TRIP_MIN_WAIT,
 )
 from .coordinator import PowerCoordinator
-from homeassistant.helpers.event import async_track_state_change_event
+from .dispatcher import StateUpdate
+from .governor import ActionGovernor
+from .latency import STAGE_REACTION, STAGE_SERVICE_CALL
+from .learner import DevicePowerLearner
+from .stats import OverloadStatistics
+from .trip_curve import OverloadAccumulator, TripCurve
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _storage_key(entry_id: str) -> str:
+    """Chiave dello Store dello snapshot della macchina a stati per una config entry."""
+    return f"{DOMAIN}.{entry_id}.manager"
+
+
+def _parse_draw(value: Any) -> float | None:
+    """Converte un valore di assorbimento in Watt.
+
+    Args:
+        value: Valore dello stato o di un attributo
+
+    Returns:
+        Watt (>= 0), o None se il valore non è utilizzabile
+    """
+    try:
+        draw = float(value)
+    except (ValueError, TypeError):
+        return None
+    return draw if draw >= 0 and math.isfinite(draw) else None
+
+
+def project_crossing(
+    total_power: float,
+    slope: float | None,
+    threshold: float,
+    horizon: float,
+) -> float | None:
+    """Proietta il trend lineare della potenza fino alla soglia.
+
+    Args:
+        total_power: Potenza totale corrente in Watt
+        slope: Pendenza del trend in W/s (None se non stimabile)
+        threshold: Soglia in Watt
+        horizon: Orizzonte massimo di previsione in secondi
+
+    Returns:
+        Secondi previsti al superamento, None se non atteso entro l'orizzonte
+    """
+    if total_power > threshold:
+        return 0.0
+    if slope is None or slope <= 0:
+        return None
+    time_to_cross = (threshold - total_power) / slope
+    return time_to_cross if time_to_cross <= horizon else None
+
+
+class _TurnOffCall:
+    """Spegnimento in corso di un dispositivo gestito."""
+
+    __slots__ = ("priority_index", "total_power", "decided_at", "confirmed", "task")
+
+    def __init__(
+        self, priority_index: int, total_power: float, decided_at: float | None = None
+    ) -> None:
+        """Inizializza la chiamata.
+
+        Args:
+            priority_index: Priorità del dispositivo
+            total_power: Potenza totale al momento della decisione
+            decided_at: Istante monotono della decisione (None = latenze non misurate)
+        """
+        self.priority_index = priority_index
+        self.total_power = total_power
+        self.decided_at = decided_at
+        self.confirmed = False  # Esito già registrato
+        self.task: asyncio.Task | None = None
+
+
+class _ShedVerification:
+    """Verifica del calo di potenza dopo un passo di distacco."""
+
+    __slots__ = (
+        "entities",
+        "power_before",
+        "expected_drop",
+        "started",
+        "max_drop",
+        "samples",
+        "handle",
+    )
+
+    def __init__(
+        self,
+        entities: list[str],
+        power_before: float,
+        expected_drop: float,
+        started: float,
+    ) -> None:
+        """Inizializza la verifica.
+
+        Args:
+            entities: Dispositivi spenti nel passo
+            power_before: Potenza totale al momento del distacco
+            expected_drop: Calo minimo di potenza che conferma il distacco
+            started: Istante del distacco (loop.time())
+        """
+        self.entities = entities
+        self.power_before = power_before
+        self.expected_drop = expected_drop
+        self.started = started
+        self.max_drop = 0.0
+        self.samples = 0  # Campioni ricevuti dopo il distacco
+        self.handle: asyncio.TimerHandle | None = None
+
+
 class PowerManager:
     """Gestisce la logica di load shedding con state machine.
 
@@ -31,6 +192,35 @@ class PowerManager:
     WAITING → (attesa debounce_time) →
         ├─ Se ancora sopra soglia: SHEDDING (spegne successivo)
         └─ Se sotto soglia: MONITORING
+    MONITORING/WAITING → (power > soglia di emergenza) → SHEDDING senza attesa
+
+    Con la riaccensione automatica i dispositivi spenti vengono riaccesi in
+    MONITORING, uno alla volta e in ordine inverso di distacco, quando il margine
+    sotto soglia supera il loro assorbimento più restore_margin e sono trascorsi
+    almeno restore_spacing secondi dall'ultimo distacco o riaccensione.
+    Il governatore (ActionGovernor) impone inoltre un tempo minimo di spegnimento
+    per dispositivo, con backoff esponenziale, e un budget di azioni al minuto.
+
+    Con circuiti secondari (coordinator.circuits) il sovraccarico di un circuito
+    avvia l'attesa con il suo debounce e il distacco sceglie prima i dispositivi
+    del suo sottoalbero; se la soglia principale non è superata, solo quelli.
+    Le fasi di una fornitura trifase sono circuiti di primo livello: si spengono
+    solo i carichi della fase in sovraccarico.
+
+    In modalità predittiva il trend recente della potenza viene proiettato fino
+    alla soglia: se il superamento è previsto entro predictive_horizon secondi,
+    al superamento effettivo il debounce si accorcia del preavviso ottenuto.
+    L'attesa parte già sotto soglia solo con un trend deciso e affidabile
+    (pendenza, bontà del fit e superamento entro il debounce).
+
+    Con la curva di intervento attiva l'attesa non è fissa: il sovraccarico viene
+    integrato ad ogni campione (OverloadAccumulator) e il distacco avviene quando
+    un interruttore con quella curva scatterebbe.
+
+    Con una config entry (entry_id) stato, dispositivi spenti, riaccensioni in
+    coda e governatore vengono salvati nello Store con scrittura ritardata
+    (MANAGER_SAVE_DELAY) e ripristinati all'avvio: dopo un riavvio la protezione
+    riprende subito, compresa l'attesa interrotta (per il solo tempo residuo).
     """
 
     def __init__(
@@ -38,6 +228,7 @@ class PowerManager:
         hass: HomeAssistant,
         coordinator: PowerCoordinator,
         config: dict[str, Any],
+        entry_id: str | None = None,
     ) -> None:
         """Inizializza il PowerManager.
 
@@ -45,6 +236,8 @@ class PowerManager:
             hass: Istanza Home Assistant
             coordinator: PowerCoordinator per dati potenza
             config: Configurazione con threshold, debounce, managed_entities, test_mode
+                e parametri della modalità predittiva e della curva di intervento
+            entry_id: Config entry per i dati persistenti (None = solo in memoria)
         """
         self.hass = hass
         self.coordinator = coordinator
@@ -52,14 +245,78 @@ class PowerManager:
         self._debounce_time = config[CONF_DEBOUNCE_TIME]
         self._managed_entities = config[CONF_MANAGED_ENTITIES]
         self._test_mode = config.get(CONF_TEST_MODE, False)
+        self._predictive = config.get(CONF_PREDICTIVE, DEFAULT_PREDICTIVE)
+        self._predictive_horizon = config.get(
+            CONF_PREDICTIVE_HORIZON, DEFAULT_PREDICTIVE_HORIZON
+        )
+        self._overload: OverloadAccumulator | None = None
+        if config.get(CONF_TRIP_CURVE_ENABLED, DEFAULT_TRIP_CURVE_ENABLED):
+            try:
+                curve = TripCurve.parse(config.get(CONF_TRIP_CURVE, DEFAULT_TRIP_CURVE))
+            except ValueError as err:
+                _LOGGER.error(
+                    "Curva di intervento non valida (%s), uso il debounce fisso", err
+                )
+            else:
+                self._overload = OverloadAccumulator(curve, TRIP_COOLING_TIME)
+        self._batch_shedding = config.get(CONF_BATCH_SHEDDING, DEFAULT_BATCH_SHEDDING)
+        # Spegnimenti in corso: entity_id → chiamata
+        self._turn_off_calls: dict[str, _TurnOffCall] = {}
+        self._verify_window = config.get(CONF_SHED_VERIFY_WINDOW, DEFAULT_SHED_VERIFY_WINDOW)
+        self._verification: _ShedVerification | None = None
+        # Dispositivi spenti senza calo di potenza nell'intervento corrente
+        self._ineffective_entities: set[str] = set()
+        # Esiti dei distacchi per dispositivo
+        self._shed_metrics: dict[str, dict[str, float]] = {}
+        # Contatori cumulativi per le statistiche a lungo termine
+        self.statistics = OverloadStatistics()
+        self._learner = DevicePowerLearner(hass, coordinator, entry_id)
+        self._store: Store | None = (
+            Store(hass, STORAGE_VERSION, _storage_key(entry_id)) if entry_id else None
+        )
+        self._auto_restore = config.get(CONF_AUTO_RESTORE, DEFAULT_AUTO_RESTORE)
+        self._restore_margin = config.get(CONF_RESTORE_MARGIN, DEFAULT_RESTORE_MARGIN)
+        self._restore_spacing = config.get(CONF_RESTORE_SPACING, DEFAULT_RESTORE_SPACING)
+        # Dispositivi da riaccendere, in ordine di distacco → assorbimento stimato (W)
+        self._restore_queue: dict[str, float | None] = {}
+        # Assorbimento stimato al momento della decisione, fino alla conferma del distacco
+        self._shed_draws: dict[str, float | None] = {}
+        self._last_load_action: float | None = None  # loop.time() dell'ultimo distacco/riaccensione
+        self._restore_handle: asyncio.TimerHandle | None = None
+        self._restore_task: asyncio.Task | None = None
+        self._governor = ActionGovernor(
+            config.get(CONF_MIN_OFF_TIME, DEFAULT_MIN_OFF_TIME),
+            config.get(CONF_MIN_ON_TIME, DEFAULT_MIN_ON_TIME),
+            config.get(CONF_MAX_ACTIONS_PER_MINUTE, DEFAULT_MAX_ACTIONS_PER_MINUTE),
+            GOVERNOR_BACKOFF_WINDOW,
+            GOVERNOR_MAX_BACKOFF,
+            GOVERNOR_RETRY_DELAY,
+        )
+        # Segnala all'attesa della curva l'arrivo di un nuovo campione
+        self._trip_wakeup = asyncio.Event()
 
         self._state = STATE_MONITORING
         self._debounce_task = None
         self._current_priority_index = 0
         self._shutdown_entities = []  # Lista dispositivi già spenti
         self._listeners = set()
+        # WAITING avviato dalla previsione mentre la potenza è ancora sotto soglia
+        self._predictive_wait = False
+        # Primo campione (loop.time()) con superamento previsto da un trend
+        # affidabile, ancora sotto soglia
+        self._predicted_at: float | None = None
+        # Preavviso della previsione da scalare dal prossimo debounce (secondi)
+        self._predictive_lead: float | None = None
+        # Debounce fisso dell'attesa in corso (None = nessuna o curva di intervento)
+        self._wait_debounce: float | None = None
+        # Istante della decisione di distacco da misurare (coordinator.latency)
+        self._decided_at: float | None = None
+        # Inizio dell'attesa in corso (loop.time()) e attesa residua dopo un riavvio
+        self._wait_started: float | None = None
+        self._resume_wait: float | None = None
 
         self._unsub_coordinator = None
+        self._unsub_samples = None
         self._unsub_entities = None
         
         # ... (omitted)
@@ -80,7 +337,102 @@ class PowerManager:
         """Notifica tutti i listener del cambiamento di stato."""
         for update_callback in self._listeners:
             update_callback()
+        self._schedule_save()
+
+    @callback
+    def _schedule_save(self) -> None:
+        """Programma il salvataggio ritardato dello snapshot."""
+        # Dopo async_stop lo stato è già stato salvato e poi azzerato
+        if self._store is not None and self._unsub_coordinator is not None:
+            self._store.async_delay_save(self._snapshot_data, MANAGER_SAVE_DELAY)
+
+    @callback
+    def _snapshot_data(self) -> dict[str, Any]:
+        """Snapshot della macchina a stati per lo Store (istanti in tempo reale)."""
+        offset = time.time() - self.hass.loop.time()
+        return {
+            "state": self._state,
+            "wait_started": (
+                self._wait_started + offset
+                if self._wait_started is not None and self._state != STATE_MONITORING
+                else None
+            ),
+            "priority_index": self._current_priority_index,
+            "shutdown_entities": list(self._shutdown_entities),
+            "restore_queue": [[entity_id, draw] for entity_id, draw in self._restore_queue.items()],
+            "governor": self._governor.snapshot(offset),
+        }
+
+    async def _async_load_snapshot(self) -> None:
+        """Ripristina lo snapshot salvato prima dell'ultimo arresto.
+
+        I dispositivi non più gestiti o già riaccesi vengono scartati; l'attesa
+        interrotta riprende, al controllo iniziale, per il solo tempo residuo.
+        """
+        if self._store is None:
+            return
+        stored = await self._store.async_load()
+        if not stored:
+            return
+
+        offset = time.time() - self.hass.loop.time()
+
+        def _still_shed(entity_id: str) -> bool:
+            if entity_id not in self._managed_entities:
+                return False
+            state = self.hass.states.get(entity_id)
+            return state is None or state.state != "on"
+
+        self._shutdown_entities = [
+            entity_id for entity_id in stored.get("shutdown_entities", []) if _still_shed(entity_id)
+        ]
+        self._restore_queue = {
+            entity_id: draw
+            for entity_id, draw in stored.get("restore_queue", [])
+            if _still_shed(entity_id)
+        }
+        self._current_priority_index = int(stored.get("priority_index", 0))
+        self._governor.restore(stored.get("governor", {}), offset, self._managed_entities)
+
+        state = stored.get("state", STATE_MONITORING)
+        if state in (STATE_WAITING, STATE_SHEDDING):
+            self._state = state
+            wait_started = stored.get("wait_started")
+            if wait_started is not None:
+                self._resume_wait = max(
+                    self._debounce_time - (time.time() - float(wait_started)), 0.0
+                )
+        _LOGGER.info(
+            "Snapshot ripristinato: stato %s, %d dispositivi spenti, %d in attesa di riaccensione",
+            self._state,
+            len(self._shutdown_entities),
+            len(self._restore_queue),
+        )
+
+    @staticmethod
+    async def async_remove_store(hass: HomeAssistant, entry_id: str) -> None:
+        """Elimina lo snapshot di una config entry rimossa.
+
+        Args:
+            hass: Istanza Home Assistant
+            entry_id: Config entry rimossa
+        """
+        await Store(hass, STORAGE_VERSION, _storage_key(entry_id)).async_remove()
+
+    @property
+    def state(self) -> str:
+        """Stato corrente della state machine."""
+        return self._state
 
+    @property
+    def threshold(self) -> int:
+        """Soglia principale in Watt."""
+        return self._threshold
+
+    @property
+    def shutdown_entities(self) -> tuple[str, ...]:
+        """Dispositivi spenti dal manager, in ordine di distacco."""
+        return tuple(self._shutdown_entities)
 
     def update_threshold(self, new_threshold: int) -> None:
         """Aggiorna la soglia massima in tempo reale senza riavvio.
@@ -112,38 +464,67 @@ class PowerManager:
 
     async def async_start(self) -> None:
         """Avvia il PowerManager registrando listener sul coordinator e sui device."""
+        await self._learner.async_load(self._managed_entities)
+        await self._async_load_snapshot()
+
         # 1. Listener aggiornamenti di potenza
         self._unsub_coordinator = self.coordinator.async_add_listener(self._handle_power_update)
+        # Verifica dei distacchi, previsione e curva richiedono ogni campione,
+        # non solo le notifiche filtrate
+        self._unsub_samples = self.coordinator.async_add_sample_listener(
+            self._handle_power_sample
+        )
         
         # 2. Listener stato dispositivi (per rilevare accensioni manuali durante overload)
-        self._unsub_entities = async_track_state_change_event(
-            self.hass,
-            self._managed_entities,
-            self._handle_entity_state_change
+        self._unsub_entities = self.coordinator.dispatcher.async_subscribe(
+            self._managed_entities, self._handle_entity_state_change
         )
         
         _LOGGER.info("PowerManager avviato, stato iniziale: %s", self._state)
 
-        # 3. Controllo iniziale immediato (con ritardo di sicurezza)
-        # Se il coordinator ha già dati, verifichiamo tra poco per lasciare respirare il loop
+        # 3. Controllo iniziale immediato: il coordinator ha già i valori dei sensori
         if self.coordinator.data:
-            self.hass.async_create_task(self._delayed_initial_check())
+            self._initial_check()
 
-    async def _delayed_initial_check(self) -> None:
-        """Esegue il controllo iniziale dopo un breve ritardo."""
-        await asyncio.sleep(1)
-        if self._state == STATE_MONITORING:  # Verifica che siamo ancora attivi
-            _LOGGER.debug("Eseguendo controllo stato iniziale ritardato")
+    @callback
+    def _initial_check(self) -> None:
+        """Valuta subito la potenza all'avvio, riprendendo l'eventuale attesa ripristinata."""
+        if self._state == STATE_MONITORING:
+            _LOGGER.debug("Controllo stato iniziale")
             self._handle_power_update()
+        elif self.coordinator.data.get("is_over_threshold", False):
+            _LOGGER.info(
+                "Sovraccarico ancora presente dopo il riavvio, riprendo l'attesa (%s)",
+                "nessun residuo noto"
+                if self._resume_wait is None
+                else f"{self._resume_wait:.0f}s residui",
+            )
+            self._start_debounce()
+            if self._resume_wait is not None:
+                # Un nuovo riavvio durante l'attesa riparte dallo stesso residuo
+                self._wait_started -= max(self._debounce_time - self._resume_wait, 0.0)
+        else:
+            self._resume_wait = None
+            self._reset_to_monitoring()
 
     async def async_stop(self) -> None:
         """Ferma il PowerManager e cancella task pendenti."""
+        # 0. Salva lo snapshot prima di azzerare lo stato
+        if self._store is not None:
+            await self._store.async_save(self._snapshot_data())
+
         # 1. Rimuovi listener coordinator
         if self._unsub_coordinator:
             self._unsub_coordinator()
             self._unsub_coordinator = None
             _LOGGER.debug("Listener coordinator rimosso")
 
+        if self._unsub_samples:
+            self._unsub_samples()
+            self._unsub_samples = None
+
+        await self._learner.async_stop()
+
         # 2. Rimuovi listener entità
         if self._unsub_entities:
             self._unsub_entities()
@@ -161,7 +542,25 @@ class PowerManager:
             self._debounce_task = None
             _LOGGER.debug("Task debounce richiesto cancellazione")
 
+        for turn_off in self._turn_off_calls.values():
+            if turn_off.task is not None:
+                turn_off.task.cancel()
+        self._turn_off_calls.clear()
+        self._cancel_verification()
+        self._ineffective_entities.clear()
+
+        if self._restore_handle is not None:
+            self._restore_handle.cancel()
+            self._restore_handle = None
+        if self._restore_task is not None:
+            self._restore_task.cancel()
+            self._restore_task = None
+        self._restore_queue.clear()
+        self._shed_draws.clear()
+
         self._state = STATE_MONITORING
+        self._predictive_wait = False
+        self._predicted_at = None
         self._current_priority_index = 0
         self._shutdown_entities = []
         _LOGGER.info("PowerManager fermato")
@@ -172,6 +571,8 @@ class PowerManager:
 
         Implementa la logica della state machine.
         """
+        if self.coordinator.latency is not None:
+            self.coordinator.latency.mark_dispatched()
         data = self.coordinator.data
         total_power = data.get("total_power", 0)
         is_over = data.get("is_over_threshold", False)
@@ -183,41 +584,226 @@ class PowerManager:
             self._state,
         )
 
+        if (
+            data.get("is_over_hard_threshold", False)
+            and self._state in (STATE_MONITORING, STATE_WAITING)
+            and not self._turn_off_calls
+            and self._verification is None
+            and self._has_candidates()
+        ):
+            # Sovraccarico grave: nessuna attesa, a meno che l'ultimo distacco
+            # non sia ancora in corso o in verifica
+            _LOGGER.warning(
+                "Soglia di emergenza superata (%.1fW), distacco immediato",
+                total_power,
+            )
+            self._shed_immediately()
+            return
+
         if self._state == STATE_MONITORING:
             if is_over:
+                if self._predicted_at is not None:
+                    # Superamento previsto: il preavviso accorcia il debounce
+                    self._predictive_lead = self.hass.loop.time() - self._predicted_at
+                    self._predicted_at = None
                 # Potenza sopra soglia: avvia debounce
-                _LOGGER.info(
-                    "Soglia superata (%.1fW > %dW), avvio debounce di %ds",
-                    total_power,
-                    self._threshold,
-                    self._debounce_time,
-                )
-                self.hass.async_create_task(self._start_debounce())
+                if self._overload is not None:
+                    _LOGGER.info(
+                        "Soglia superata (%.1fW > %dW), intervento secondo curva tra %.0fs",
+                        total_power,
+                        self._threshold,
+                        self._overload.curve.trip_time(total_power / self._threshold),
+                    )
+                elif data.get("overloaded_circuits"):
+                    _LOGGER.info(
+                        "Circuiti sopra soglia (%s), avvio debounce di %ds",
+                        ", ".join(data["overloaded_circuits"]),
+                        self._fixed_debounce(),
+                    )
+                else:
+                    _LOGGER.info(
+                        "Soglia superata (%.1fW > %dW), avvio debounce di %ds",
+                        total_power,
+                        self._threshold,
+                        self._debounce_time,
+                    )
+                self._start_debounce()
             else:
                 # Tutto OK, continua monitoring
                 pass
 
         elif self._state == STATE_WAITING:
-            if not is_over:
+            if is_over:
+                # Soglia effettivamente superata: l'attesa prosegue come un debounce normale
+                self._predictive_wait = False
+                if (
+                    self._wait_debounce is not None
+                    and self._fixed_debounce() < self._wait_debounce
+                ):
+                    # Un circuito con debounce più breve è andato in sovraccarico
+                    _LOGGER.info(
+                        "Circuiti sopra soglia (%s), riavvio l'attesa con debounce di %ds",
+                        ", ".join(data.get("overloaded_circuits", ())),
+                        self._fixed_debounce(),
+                    )
+                    self._start_debounce()
+            elif self._predictive_wait and self._time_to_crossing() is not None:
+                # Attesa anticipata dalla previsione: la rampa è ancora in corso
+                pass
+            else:
                 # La potenza è rientrata durante l'attesa!
                 _LOGGER.info("Carico rientrato sotto soglia durante attesa, annullo intervento")
-                if self._debounce_task and not self._debounce_task.done():
-                    self._debounce_task.cancel()
-                # Passiamo subito allo stato monitoring per aggiornare la UI istantaneamente
-                self._reset_to_monitoring()
+                self._abort_waiting()
+
+    @callback
+    def _handle_power_sample(self) -> None:
+        """Elabora ogni campione di potenza: verifica distacco, curva, previsione e riaccensione."""
+        self._update_verification()
+        now = self.hass.loop.time()
+        total_power = self.coordinator.data.get("total_power", 0)
+        self.statistics.add_sample(now, total_power, self._threshold)
+
+        if self._overload is not None:
+            self._overload.update(now, total_power / self._threshold)
+            self._trip_wakeup.set()
+
+        if self._predictive:
+            self._evaluate_trend()
+
+        if self._restore_queue:
+            self._evaluate_restore()
+
+    @callback
+    def _evaluate_trend(self) -> None:
+        """Valuta il trend della potenza (modalità predittiva).
+
+        In MONITORING registra il primo campione di un trend affidabile che
+        prevede il superamento entro l'orizzonte (il preavviso accorcerà il
+        debounce, al più della metà) e avvia l'attesa in anticipo se il
+        superamento è previsto entro il debounce; durante un'attesa anticipata
+        la annulla se il trend non prevede più il superamento.
+        """
+        data = self.coordinator.data
+        if data.get("is_over_threshold", False):
+            # Superamento reale: gestito da _handle_power_update
+            return
+
+        if self._state == STATE_MONITORING:
+            time_to_cross = self._time_to_crossing()
+            if time_to_cross is None or not self._is_reliable_trend():
+                # Una rampa lenta o rumorosa non dà preavviso
+                self._predicted_at = None
+                return
+            if self._predicted_at is None:
+                self._predicted_at = self.hass.loop.time()
+                _LOGGER.debug(
+                    "Trend in salita: soglia prevista tra %.1fs (%.1fW, soglia %dW)",
+                    time_to_cross,
+                    data.get("total_power", 0),
+                    self._threshold,
+                )
+            if time_to_cross > self._debounce_time:
+                return
+            _LOGGER.info(
+                "Trend in salita deciso: soglia prevista tra %.1fs (%.1fW, soglia %dW), "
+                "avvio debounce anticipato di %ds",
+                time_to_cross,
+                data.get("total_power", 0),
+                self._threshold,
+                self._debounce_time,
+            )
+            self._predicted_at = None
+            self._predictive_wait = True
+            self._start_debounce()
+
+        elif (
+            self._state == STATE_WAITING
+            and self._predictive_wait
+            and self._time_to_crossing() is None
+        ):
+            _LOGGER.info("Trend rientrato prima del superamento, annullo debounce anticipato")
+            self._abort_waiting()
+
+    def _time_to_crossing(self) -> float | None:
+        """Stima il tempo al superamento della soglia dal trend recente.
+
+        Returns:
+            Secondi previsti al superamento, None se non atteso entro l'orizzonte
+        """
+        return project_crossing(
+            self.coordinator.data.get("total_power", 0),
+            self.coordinator.history.slope(PREDICTIVE_TREND_WINDOW),
+            self._threshold,
+            self._predictive_horizon,
+        )
+
+    def _is_reliable_trend(self) -> bool:
+        """Verifica se il trend recente è abbastanza deciso da anticipare il distacco.
+
+        Una rampa che si assesta appena sotto soglia proietta comunque un
+        superamento: preavviso e attesa anticipata richiedono una pendenza
+        minima e un fit lineare affidabile.
+
+        Returns:
+            True se la previsione è affidabile
+        """
+        history = self.coordinator.history
+        slope = history.slope(PREDICTIVE_TREND_WINDOW)
+        if slope is None or slope < PREDICTIVE_MIN_SLOPE:
+            return False
+        r_squared = history.r_squared(PREDICTIVE_TREND_WINDOW)
+        return r_squared is not None and r_squared >= PREDICTIVE_MIN_R2
+
+    @callback
+    def _abort_waiting(self) -> None:
+        """Annulla l'attesa in corso e torna subito a MONITORING."""
+        if self._debounce_task and not self._debounce_task.done():
+            self._debounce_task.cancel()
+        # Passiamo subito allo stato monitoring per aggiornare la UI istantaneamente
+        self._reset_to_monitoring()
 
     @callback
-    def _handle_entity_state_change(self, event) -> None:
+    def _handle_entity_state_change(self, update: StateUpdate) -> None:
         """Chiamato quando uno dei dispositivi gestiti cambia stato.
 
+        Ogni commutazione on/off alimenta l'apprendimento dell'assorbimento.
         Se un dispositivo viene ACCESO mentre siamo in MONITORING e c'è overload,
         dobbiamo attivare subito la logica, perché il consumo potrebbe essere costante (simulato)
         e non triggerare il coordinator.
         """
+        entity_id = update.entity_id
+        old_state = update.old_state
+        new_state = update.new_state
+        if (
+            old_state is not None
+            and new_state is not None
+            and {old_state.state, new_state.state} == {"on", "off"}
+        ):
+            self._learner.async_record_toggle(entity_id, new_state.state == "on")
+            if new_state.state == "on":
+                self._governor.record_on(entity_id, self.hass.loop.time())
+            else:
+                self._governor.record_off(entity_id, self.hass.loop.time())
+            self._schedule_save()
+
+        if new_state is not None and new_state.state == "off":
+            # Conferma di uno spegnimento in corso, anche prima della risposta del servizio
+            self._confirm_turn_off(entity_id)
+        elif (
+            new_state is not None
+            and new_state.state == "on"
+            and entity_id in self._restore_queue
+        ):
+            del self._restore_queue[entity_id]
+            _LOGGER.debug(
+                "%s riacceso manualmente, rimosso dalle riaccensioni automatiche",
+                entity_id,
+            )
+            self._notify_listeners()
+
         if self._state != STATE_MONITORING:
             return
 
-        new_state = event.data.get("new_state")
         if new_state is None or new_state.state != "on":
             return
 
@@ -231,25 +817,32 @@ class PowerManager:
         if is_over:
             _LOGGER.info(
                 "Rilevata accensione manuale di %s durante overload (%.1fW > %dW), riavvio gestione",
-                event.data.get("entity_id"),
+                entity_id,
                 data.get("total_power", 0),
                 self._threshold,
             )
             # Simula un update di potenza per far ripartire la macchina a stati
             self._handle_power_update()
 
-    async def _start_debounce(self) -> None:
+    @callback
+    def _start_debounce(self) -> None:
         """Avvia il timer di debounce.
 
-        Cambia stato in WAITING e aspetta per debounce_time secondi.
+        Cambia stato in WAITING (in modo sincrono, così eventi ravvicinati non
+        avviano due attese) e aspetta per debounce_time secondi.
         Se la potenza rientra prima della scadenza, il task viene cancellato.
         """
-        # Cancella eventuale task precedente
-        if self._debounce_task and not self._debounce_task.done():
+        # Cancella eventuale task precedente (non se è quello che sta eseguendo)
+        if (
+            self._debounce_task
+            and not self._debounce_task.done()
+            and self._debounce_task is not asyncio.current_task()
+        ):
             self._debounce_task.cancel()
             _LOGGER.debug("Task debounce precedente cancellato")
 
         self._state = STATE_WAITING
+        self._wait_started = self.hass.loop.time()
         self._notify_listeners()
         self._debounce_task = self.hass.async_create_task(self._wait_and_check())
 
@@ -259,8 +852,9 @@ class PowerManager:
         Se durante l'attesa la potenza rientra, questo task viene cancellato.
         """
         try:
-            _LOGGER.debug("Inizio attesa debounce: %ds", self._debounce_time)
-            await asyncio.sleep(self._debounce_time)
+            await self._async_wait_overload()
+            if self.coordinator.latency is not None:
+                self._decided_at = self.coordinator.latency.now()
 
             # Dopo l'attesa, controlla ancora lo stato
             data = self.coordinator.data
@@ -286,24 +880,96 @@ class PowerManager:
         except asyncio.CancelledError:
             # Timer cancellato perché potenza rientrata
             _LOGGER.info("Debounce cancellato, potenza rientrata prima della scadenza")
-            self._reset_to_monitoring()
+            # Se un nuovo debounce ha già preso il posto di questo, non toccare lo stato
+            if self._debounce_task is asyncio.current_task():
+                self._reset_to_monitoring()
+
+    async def _async_wait_overload(self) -> None:
+        """Attende il debounce fisso o, se configurata, la curva di intervento.
+
+        Con la curva, il tempo residuo viene ricalcolato ad ogni nuovo campione:
+        un sovraccarico che cresce accorcia l'attesa, uno che cala la allunga.
+        La curva descrive l'interruttore principale: con un circuito secondario
+        in sovraccarico si usa il debounce fisso.
+        """
+        # Attesa interrotta da un riavvio: resta solo il tempo residuo
+        resume_wait, self._resume_wait = self._resume_wait, None
+        # Preavviso della modalità predittiva: il superamento era già atteso
+        lead, self._predictive_lead = self._predictive_lead, None
+        if self._overload is None or self.coordinator.data.get("overloaded_circuits"):
+            debounce = self._fixed_debounce()
+            if lead:
+                # Il preavviso non dimezza mai più del debounce configurato
+                debounce = max(PREDICTIVE_MIN_DEBOUNCE, debounce - min(lead, debounce / 2))
+            _LOGGER.debug("Inizio attesa debounce: %.1fs", debounce)
+            self._wait_debounce = debounce
+            try:
+                await asyncio.sleep(
+                    debounce if resume_wait is None else min(debounce, resume_wait)
+                )
+            finally:
+                if self._debounce_task is asyncio.current_task():
+                    self._wait_debounce = None
+            return
+
+        # Lascia ai sensori il tempo di riflettere l'ultimo distacco
+        await asyncio.sleep(TRIP_MIN_WAIT)
+        while (remaining := self._overload.time_to_trip(self.hass.loop.time())) > 0:
+            _LOGGER.debug(
+                "Curva di intervento: calore %.2f, intervento tra %.1fs",
+                self._overload.level,
+                remaining,
+            )
+            self._trip_wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._trip_wakeup.wait(),
+                    None if math.isinf(remaining) else remaining,
+                )
+            except asyncio.TimeoutError:
+                pass
 
     async def _shed_next_load(self) -> None:
         """Spegne il prossimo dispositivo disponibile nella lista priorità.
 
         Scorre la lista dei dispositivi gestiti in ordine di priorità.
-        Il primo dispositivo trovato ACCESO viene spento.
+        Il primo dispositivo trovato ACCESO viene spento; in modalità batch viene
+        spento insieme il gruppo minimo di dispositivi, in ordine di priorità, il cui
+        assorbimento stimato riporta la potenza sotto soglia.
         """
-        target_entity_id = None
-        priority_index = -1
-
-        # Cerca il primo dispositivo acceso
-        for index, entity_id in enumerate(self._managed_entities):
+        candidates: list[tuple[int, str]] = []
+        # Accesi da meno del tempo minimo: spenti solo in mancanza di alternative
+        held: list[tuple[int, str]] = []
+        now = self.hass.loop.time()
+        decided_at, self._decided_at = self._decided_at, None
+
+        # Cerca i dispositivi accesi
+        for index, entity_id in self._shed_order():
             state = self.hass.states.get(entity_id)
-            if state and state.state == "on":
-                target_entity_id = entity_id
-                priority_index = index
-                break
+            if entity_id in self._turn_off_calls:
+                _LOGGER.debug(
+                    "Spegnimento di %s (priorità %d) ancora in corso, passo al prossimo",
+                    entity_id,
+                    index,
+                )
+            elif entity_id in self._ineffective_entities:
+                _LOGGER.debug(
+                    "Spegnimento di %s (priorità %d) senza calo di potenza, passo al prossimo",
+                    entity_id,
+                    index,
+                )
+            elif state and state.state == "on":
+                if self._governor.shed_hold(entity_id, now) > 0:
+                    _LOGGER.debug(
+                        "Dispositivo %s (priorità %d) acceso da poco, passo al prossimo",
+                        entity_id,
+                        index,
+                    )
+                    held.append((index, entity_id))
+                    continue
+                candidates.append((index, entity_id))
+                if not self._batch_shedding:
+                    break
             else:
                 _LOGGER.debug(
                     "Dispositivo %s (priorità %d) già spento o non disponibile (stato: %s), passo al prossimo",
@@ -312,8 +978,25 @@ class PowerManager:
                     state.state if state else "None",
                 )
 
+        if not candidates and held:
+            # Proteggere il contatore ha la precedenza sul tempo minimo di accensione
+            _LOGGER.info(
+                "Restano solo dispositivi accesi da meno di %ds, spengo comunque",
+                self._governor.min_on_time,
+            )
+            candidates = held if self._batch_shedding else held[:1]
+
+        if not candidates and self._turn_off_calls:
+            # Restano solo spegnimenti in corso: se ne attende l'esito
+            _LOGGER.info(
+                "Nessun altro dispositivo da spegnere, attendo %d spegnimenti in corso",
+                len(self._turn_off_calls),
+            )
+            self._start_debounce()
+            return
+
         # Se non abbiamo trovato nessun dispositivo da spegnere
-        if target_entity_id is None:
+        if not candidates:
             _LOGGER.error(
                 "Nessun dispositivo da spegnere trovato! Tutti i dispositivi gestiti risultano già spenti. "
                 "Potenza attuale: %.1fW > %dW. Torno a monitoring.",
@@ -323,72 +1006,504 @@ class PowerManager:
             self._reset_to_monitoring()
             return
 
-        # Abbiamo un bersaglio
+        # Abbiamo i bersagli
         total_power = self.coordinator.data.get("total_power", 0)
-        self._current_priority_index = priority_index  # Aggiorniamo l'indice per coerenza nei log
-
-        if self._test_mode:
-            # Modalità test: non spegne realmente
-            _LOGGER.info(
-                "TEST MODE: Simulazione spegnimento di %s (priorità %d)",
-                target_entity_id,
-                priority_index,
-            )
-            # In test mode, dobbiamo simulare che sia stato "gestito" per non loopare sempre sullo stesso
-            # Ma dato che la richiesta è di basarsi sullo stato reale, in test mode questo creerà un loop
-            # a meno che l'utente non lo spenga davvero.
-            # Per evitare spam in test mode, potremmo dover gestire diversamente, ma per ora seguiamo la logica reale.
-        else:
-            # Spegni realmente il dispositivo
-            _LOGGER.warning(
-                "Spegnimento dispositivo %s (priorità %d) per load shedding",
-                target_entity_id,
-                priority_index,
-            )
-            try:
-                await self._turn_off_entity(target_entity_id)
-            except Exception as err:
-                _LOGGER.error(
-                    "Errore durante spegnimento di %s: %s",
+        targets = self._select_batch(candidates, total_power)
+        self._current_priority_index = targets[-1][0]  # Aggiorniamo l'indice per coerenza nei log
+
+        for priority_index, target_entity_id in targets:
+            if self._auto_restore:
+                # Da spento il dispositivo non riporta più il suo assorbimento
+                self._shed_draws[target_entity_id] = self._estimate_draw(target_entity_id)
+            self._governor.record_shed(target_entity_id, now)
+            if self._test_mode:
+                # Modalità test: non spegne realmente
+                _LOGGER.info(
+                    "TEST MODE: Simulazione spegnimento di %s (priorità %d)",
                     target_entity_id,
-                    err,
+                    priority_index,
                 )
-                # Genera evento con flag di errore
-                self._fire_load_shedding_event(
+                # In test mode, dobbiamo simulare che sia stato "gestito" per non loopare sempre sullo stesso
+                # Ma dato che la richiesta è di basarsi sullo stato reale, in test mode questo creerà un loop
+                # a meno che l'utente non lo spenga davvero.
+                # Per evitare spam in test mode, potremmo dover gestire diversamente, ma per ora seguiamo la logica reale.
+                self._record_shed(target_entity_id, priority_index, total_power)
+            else:
+                # Spegni realmente il dispositivo, senza attendere la risposta
+                _LOGGER.warning(
+                    "Spegnimento dispositivo %s (priorità %d) per load shedding",
                     target_entity_id,
-                    total_power,
-                    error=str(err),
+                    priority_index,
+                )
+                self._dispatch_turn_off(
+                    target_entity_id, priority_index, total_power, decided_at
                 )
-                # Se fallisce lo spegnimento, purtroppo al prossimo giro lo ritroveremo "on" e riproveremo.
-                # Questo è corretto per sicurezza. Per evitare loop infiniti su errori, servirebbe logica più complessa,
-                # ma per ora riproviamo dopo il debounce.
-                await self._start_debounce()
-                return
 
-        # Registra spegnimento
-        if target_entity_id not in self._shutdown_entities:
-            self._shutdown_entities.append(target_entity_id)
-            self._notify_listeners()
+        if not self._test_mode:
+            self._start_verification([entity_id for _, entity_id in targets], total_power)
+        self._last_load_action = now
 
-        # Genera evento per notifiche
-        self._fire_load_shedding_event(target_entity_id, total_power)
+        # Il distacco riduce il sovraccarico: il calore accumulato viene in parte scaricato
+        if self._overload is not None:
+            self._overload.discharge(TRIP_LEVEL_AFTER_SHED)
 
         # Entra in stato WAITING per prossimo debounce
         _LOGGER.debug("Entro in WAITING dopo spegnimento, avvio nuovo debounce")
-        await self._start_debounce()
+        self._start_debounce()
+
+    @callback
+    def _dispatch_turn_off(
+        self,
+        entity_id: str,
+        priority_index: int,
+        total_power: float,
+        decided_at: float | None = None,
+    ) -> None:
+        """Avvia lo spegnimento di un dispositivo in un task dedicato.
 
-    async def _turn_off_entity(self, entity_id: str) -> None:
-        """Spegne un'entità chiamando il servizio appropriato.
+        Il task ha un timeout (SHED_CALL_TIMEOUT); l'esito viene registrato alla
+        conferma tramite cambio di stato dell'entità o al termine della chiamata,
+        così un dispositivo lento non ritarda il distacco dei successivi.
 
         Args:
-            entity_id: ID dell'entità da spegnere (es. switch.device_1)
+            entity_id: Dispositivo da spegnere
+            priority_index: Priorità del dispositivo
+            total_power: Potenza totale al momento della decisione
+            decided_at: Istante monotono della decisione (misura delle latenze)
+        """
+        turn_off = _TurnOffCall(priority_index, total_power, decided_at)
+        self._turn_off_calls[entity_id] = turn_off
+        turn_off.task = self.hass.async_create_task(
+            self._async_turn_off(entity_id, turn_off)
+        )
+
+    async def _async_turn_off(self, entity_id: str, turn_off: _TurnOffCall) -> None:
+        """Esegue la chiamata di spegnimento con timeout e ne registra l'esito.
+
+        Args:
+            entity_id: Dispositivo da spegnere
+            turn_off: Chiamata in corso
+        """
+        error = None
+        try:
+            await asyncio.wait_for(
+                self._call_entity_service(entity_id, "turn_off", turn_off.decided_at),
+                SHED_CALL_TIMEOUT,
+            )
+        except asyncio.TimeoutError:
+            error = f"Nessuna risposta entro {SHED_CALL_TIMEOUT}s"
+        except Exception as err:  # noqa: BLE001 - qualsiasi errore del servizio va notificato
+            error = str(err)
+        finally:
+            if self._turn_off_calls.get(entity_id) is turn_off:
+                del self._turn_off_calls[entity_id]
+
+        if turn_off.confirmed:
+            # Già registrato alla conferma dello stato
+            return
+        if error is None:
+            turn_off.confirmed = True
+        self._record_shed(entity_id, turn_off.priority_index, turn_off.total_power, error)
+
+    @callback
+    def _confirm_turn_off(self, entity_id: str) -> None:
+        """Registra lo spegnimento confermato dallo stato dell'entità.
+
+        Args:
+            entity_id: Dispositivo risultato spento
+        """
+        turn_off = self._turn_off_calls.get(entity_id)
+        if turn_off is None or turn_off.confirmed:
+            return
+        turn_off.confirmed = True
+        self._record_shed(entity_id, turn_off.priority_index, turn_off.total_power)
+
+    @callback
+    def _record_shed(
+        self,
+        entity_id: str,
+        priority_index: int,
+        total_power: float,
+        error: str | None = None,
+    ) -> None:
+        """Registra l'esito di uno spegnimento e genera l'evento.
+
+        Args:
+            entity_id: Dispositivo spento
+            priority_index: Priorità del dispositivo
+            total_power: Potenza totale al momento della decisione
+            error: Messaggio di errore se lo spegnimento è fallito
+        """
+        self._current_priority_index = priority_index
+        if error is not None:
+            _LOGGER.error(
+                "Errore durante spegnimento di %s: %s",
+                entity_id,
+                error,
+            )
+            # Genera evento con flag di errore
+            self._fire_load_shedding_event(entity_id, total_power, error=error)
+            self._shed_metric(entity_id)["errors"] += 1
+            self._shed_draws.pop(entity_id, None)
+            # Il dispositivo non viene ritentato in questo intervento: se era l'unico
+            # del passo in verifica, si passa subito al successivo.
+            self._ineffective_entities.add(entity_id)
+            verification = self._verification
+            if verification is not None and entity_id in verification.entities:
+                verification.entities.remove(entity_id)
+                if not verification.entities:
+                    self._finish_verification(verified=False)
+            return
+
+        _LOGGER.info("Dispositivo %s spento con successo", entity_id)
+        self.statistics.record_shed(entity_id)
+        if self._auto_restore:
+            # In coda per ultimo: sarà il primo a essere riacceso
+            self._restore_queue.pop(entity_id, None)
+            self._restore_queue[entity_id] = self._shed_draws.pop(entity_id, None)
+            self._schedule_restore_check(self._restore_spacing)
+        # Registra spegnimento
+        if entity_id not in self._shutdown_entities:
+            self._shutdown_entities.append(entity_id)
+        # Anche un distacco ripetuto aggiorna i contatori esposti
+        self._notify_listeners()
+
+        # Genera evento per notifiche
+        self._fire_load_shedding_event(entity_id, total_power)
+
+    @callback
+    def _start_verification(self, entity_ids: list[str], total_power: float) -> None:
+        """Avvia la verifica del calo di potenza dopo un passo di distacco.
+
+        Il calo atteso è una quota dell'assorbimento stimato (almeno
+        SHED_VERIFY_MIN_DROP): se non si presenta entro la finestra di verifica,
+        si passa subito al dispositivo successivo senza attendere il debounce.
+        Un contatore lento che non ha ancora riportato alcun campione dopo il
+        distacco non equivale a un mancato calo: l'esito attende il primo campione.
+
+        Args:
+            entity_ids: Dispositivi spenti in questo passo
+            total_power: Potenza totale al momento della decisione
+        """
+        # Un nuovo passo chiude la verifica precedente con quanto misurato finora
+        if self._verification is not None:
+            self._finish_verification(verified=False, shed_next=False)
+
+        for entity_id in entity_ids:
+            self._shed_metric(entity_id)["sheds"] += 1
+
+        if self._verify_window <= 0:
+            return
+
+        estimated = sum(self._estimate_draw(entity_id) or 0.0 for entity_id in entity_ids)
+        verification = _ShedVerification(
+            entity_ids,
+            total_power,
+            max(estimated * SHED_VERIFY_DROP_RATIO, SHED_VERIFY_MIN_DROP),
+            self.hass.loop.time(),
+        )
+        verification.handle = self.hass.loop.call_later(
+            self._verify_window, self._verification_expired
+        )
+        self._verification = verification
+        _LOGGER.debug(
+            "Verifica distacco di %s: calo atteso %.1fW entro %ds",
+            ", ".join(entity_ids),
+            verification.expected_drop,
+            self._verify_window,
+        )
+
+    @callback
+    def _update_verification(self) -> None:
+        """Confronta la potenza corrente con il calo atteso dalla verifica in corso."""
+        verification = self._verification
+        if verification is None:
+            return
+        if self.hass.loop.time() > verification.started:
+            verification.samples += 1
+        drop = verification.power_before - self.coordinator.data.get("total_power", 0)
+        verification.max_drop = max(verification.max_drop, drop)
+        if drop >= verification.expected_drop:
+            self._finish_verification(verified=True)
+        elif verification.handle is None and verification.samples:
+            # Finestra scaduta in attesa del primo campione dopo il distacco
+            self._finish_verification(verified=False)
+
+    @callback
+    def _verification_expired(self) -> None:
+        """Chiude la finestra di verifica, o attende il primo campione se non è arrivato."""
+        verification = self._verification
+        if verification is None:
+            return
+        verification.handle = None
+        if verification.samples:
+            self._finish_verification(verified=False)
+            return
+        _LOGGER.debug(
+            "Nessun campione di potenza dopo il distacco di %s, attendo il primo",
+            ", ".join(verification.entities),
+        )
+
+    @callback
+    def _finish_verification(self, verified: bool, shed_next: bool = True) -> None:
+        """Chiude la verifica in corso e ne registra l'esito.
+
+        Args:
+            verified: True se il calo atteso è stato misurato
+            shed_next: Se passare subito al dispositivo successivo in caso di esito negativo
+        """
+        verification = self._verification
+        if verification is None:
+            return
+        self._cancel_verification()
+
+        for entity_id in verification.entities:
+            metric = self._shed_metric(entity_id)
+            metric["verified" if verified else "no_drop"] += 1
+            metric["last_drop"] = round(verification.max_drop, 1)
+            if not verified:
+                self._ineffective_entities.add(entity_id)
+
+        if verified:
+            _LOGGER.debug(
+                "Distacco di %s verificato: calo %.1fW",
+                ", ".join(verification.entities),
+                verification.max_drop,
+            )
+            return
+
+        _LOGGER.warning(
+            "Distacco di %s senza calo di potenza atteso (%.1fW su %.1fW)",
+            ", ".join(verification.entities) or "nessun dispositivo",
+            verification.max_drop,
+            verification.expected_drop,
+        )
+        if (
+            shed_next
+            and self._state == STATE_WAITING
+            and self.coordinator.data.get("is_over_threshold", False)
+        ):
+            self._shed_immediately()
+
+    def _shed_order(self) -> list[tuple[int, str]]:
+        """Dispositivi gestiti nell'ordine in cui considerarli per il distacco.
+
+        Con circuiti secondari in sovraccarico vengono prima i dispositivi del
+        sottoalbero più profondo in sovraccarico, poi quelli degli altri circuiti
+        in sovraccarico (es. più fasi); gli altri seguono solo se è superata anche
+        la soglia principale, perché spegnerli non scarica alcun circuito.
+
+        Returns:
+            Coppie (priorità, entity_id)
+        """
+        entities = list(enumerate(self._managed_entities))
+        tree = self.coordinator.circuits
+        overloaded = self.coordinator.data.get("overloaded_circuits")
+        if tree is None or not overloaded:
+            return entities
+
+        order: list[tuple[int, str]] = []
+        for name in overloaded:
+            node = tree.node(name)
+            order.extend(
+                item
+                for item in entities
+                if item not in order and tree.contains(node, item[1])
+            )
+        if self.coordinator.data.get("total_power", 0) <= self._threshold:
+            return order
+        return order + [item for item in entities if item not in order]
+
+    def _fixed_debounce(self) -> int:
+        """Debounce dell'attesa: il minore tra quelli delle soglie superate.
+
+        Returns:
+            Secondi
+        """
+        data = self.coordinator.data
+        debounces = [
+            self.coordinator.circuits.node(name).debounce
+            for name in data.get("overloaded_circuits", ())
+        ]
+        if not debounces or data.get("total_power", 0) > self._threshold:
+            debounces.append(self._debounce_time)
+        return min(debounces)
+
+    def _has_candidates(self) -> bool:
+        """Verifica se esiste un dispositivo gestito che si può ancora spegnere."""
+        for entity_id in self._managed_entities:
+            if entity_id in self._turn_off_calls or entity_id in self._ineffective_entities:
+                continue
+            state = self.hass.states.get(entity_id)
+            if state and state.state == "on":
+                return True
+        return False
+
+    @callback
+    def _shed_immediately(self) -> None:
+        """Sostituisce l'attesa in corso con un distacco immediato (stato SHEDDING)."""
+        waiting_task = self._debounce_task
+        if self.coordinator.latency is not None:
+            self._decided_at = self.coordinator.latency.now()
+        self._state = STATE_SHEDDING
+        self._predictive_wait = False
+        self._predicted_at = None
+        self._notify_listeners()
+        self._debounce_task = self.hass.async_create_task(self._shed_next_load())
+        # Il task sostituito non è più quello corrente: la sua cancellazione non resetta lo stato
+        if waiting_task and not waiting_task.done():
+            waiting_task.cancel()
+
+    @callback
+    def _cancel_verification(self) -> None:
+        """Annulla la verifica in corso senza registrarne l'esito."""
+        if self._verification is not None:
+            if self._verification.handle is not None:
+                self._verification.handle.cancel()
+            self._verification = None
+
+    def _shed_metric(self, entity_id: str) -> dict[str, float]:
+        """Contatori dei distacchi di un dispositivo (creati al primo uso).
+
+        Args:
+            entity_id: Dispositivo gestito
+
+        Returns:
+            Dict dei contatori, modificabile
+        """
+        metric = self._shed_metrics.get(entity_id)
+        if metric is None:
+            metric = self._shed_metrics[entity_id] = {
+                "sheds": 0,
+                "verified": 0,
+                "no_drop": 0,
+                "errors": 0,
+                "last_drop": 0.0,
+            }
+        return metric
+
+    def _select_batch(
+        self, candidates: list[tuple[int, str]], total_power: float
+    ) -> list[tuple[int, str]]:
+        """Seleziona il prefisso minimo dei candidati che copre l'eccesso di potenza.
+
+        Il gruppo rispetta le priorità: un dispositivo viene incluso solo insieme
+        a tutti i candidati che lo precedono. Un dispositivo di assorbimento ignoto
+        chiude il gruppo, perché il suo effetto va prima misurato.
+
+        Args:
+            candidates: Coppie (priorità, entity_id) dei dispositivi accesi, in ordine
+            total_power: Potenza totale corrente in Watt
+
+        Returns:
+            Coppie (priorità, entity_id) da spegnere
+        """
+        if not self._batch_shedding:
+            return candidates[:1]
+
+        excess = total_power - self._threshold
+        tree = self.coordinator.circuits
+        # Eccesso di un circuito: un carico trifase lo scarica solo per la sua quota
+        circuit_excess = False
+        for name in self.coordinator.data.get("overloaded_circuits", ()):
+            node = tree.node(name)
+            if node.power - node.threshold > excess:
+                excess = node.power - node.threshold
+                circuit_excess = True
+        batch: list[tuple[int, str]] = []
+        reduction = 0.0
+        for candidate in candidates:
+            batch.append(candidate)
+            draw = self._estimate_draw(candidate[1])
+            if draw is None:
+                break
+            if circuit_excess:
+                draw *= tree.share(candidate[1])
+            reduction += draw * (1 - BATCH_SHED_MARGIN)
+            if reduction >= excess:
+                break
+
+        _LOGGER.info(
+            "Distacco multiplo: %d dispositivi, riduzione stimata %.1fW su eccesso %.1fW",
+            len(batch),
+            reduction,
+            excess,
+        )
+        return batch
+
+    def _estimate_draw(self, entity_id: str) -> float | None:
+        """Stima l'assorbimento corrente di un dispositivo gestito.
+
+        Usa gli attributi di potenza dell'entità, un sensore di potenza dello
+        stesso device nel registry o, in mancanza, l'assorbimento appreso.
+
+        Args:
+            entity_id: ID del dispositivo gestito
+
+        Returns:
+            Assorbimento in Watt, o None se non stimabile
+        """
+        state = self.hass.states.get(entity_id)
+        if state is None:
+            return None
+
+        for attribute in DRAW_ATTRIBUTES:
+            draw = _parse_draw(state.attributes.get(attribute))
+            if draw is not None:
+                return draw
+
+        registry = er.async_get(self.hass)
+        entry = registry.async_get(entity_id)
+        if entry is None or entry.device_id is None:
+            return self._learned_draw(entity_id)
+        for sibling in er.async_entries_for_device(registry, entry.device_id):
+            if sibling.domain != "sensor":
+                continue
+            sibling_state = self.hass.states.get(sibling.entity_id)
+            if (
+                sibling_state is not None
+                and sibling_state.attributes.get("device_class") == SensorDeviceClass.POWER
+                and sibling_state.attributes.get("unit_of_measurement")
+                == POWER_UNIT_OF_MEASUREMENT
+            ):
+                draw = _parse_draw(sibling_state.state)
+                if draw is not None:
+                    return draw
+        return self._learned_draw(entity_id)
+
+    def _learned_draw(self, entity_id: str) -> float | None:
+        """Assorbimento appreso, se la stima è abbastanza affidabile.
+
+        Args:
+            entity_id: ID del dispositivo gestito
+
+        Returns:
+            Assorbimento in Watt, o None se non appreso o poco affidabile
+        """
+        estimate = self._learner.estimate(entity_id)
+        if estimate is None or estimate[1] < LEARNER_MIN_CONFIDENCE:
+            return None
+        return estimate[0]
+
+    async def _call_entity_service(
+        self, entity_id: str, service: str, decided_at: float | None = None
+    ) -> None:
+        """Spegne o riaccende un'entità chiamando il servizio del suo dominio.
+
+        Con la misura delle latenze attiva registra il tempo dalla decisione
+        all'inizio della chiamata e la durata della chiamata.
+
+        Args:
+            entity_id: ID dell'entità (es. switch.device_1)
+            service: Servizio da chiamare ("turn_off" o "turn_on")
+            decided_at: Istante monotono della decisione di distacco
 
         Raises:
             Exception: Se il servizio fallisce
         """
         domain = entity_id.split(".")[0]
 
-        _LOGGER.info("Tentativo spegnimento %s: chiamata servizio %s.turn_off", entity_id, domain)
+        _LOGGER.info("Chiamata servizio %s.%s per %s", domain, service, entity_id)
 
         # Verifica che l'entità esista
         state = self.hass.states.get(entity_id)
@@ -398,14 +1513,23 @@ class PowerManager:
 
         _LOGGER.debug("Stato attuale di %s: %s", entity_id, state.state)
 
-        await self.hass.services.async_call(
-            domain,
-            "turn_off",
-            {"entity_id": entity_id},
-            blocking=True,
-        )
-
-        _LOGGER.info("Dispositivo %s spento con successo", entity_id)
+        latency = self.coordinator.latency
+        if latency is not None:
+            started = latency.now()
+            if decided_at is not None:
+                latency.record(STAGE_REACTION, started - decided_at)
+        try:
+            await self.hass.services.async_call(
+                domain,
+                service,
+                {"entity_id": entity_id},
+                blocking=True,
+            )
+        finally:
+            if latency is not None:
+                latency.record(STAGE_SERVICE_CALL, latency.now() - started)
+                if service == "turn_off":
+                    latency.mark_shed_completed()
 
     def _fire_load_shedding_event(
         self,
@@ -442,20 +1566,185 @@ class PowerManager:
             self._current_priority_index,
         )
 
+    @callback
+    def _schedule_restore_check(self, delay: float) -> None:
+        """Programma una valutazione della riaccensione tra delay secondi.
+
+        Garantisce la valutazione anche se la potenza resta stabile e il
+        coordinator non pubblica nuovi campioni.
+
+        Args:
+            delay: Secondi di attesa
+        """
+        if self._restore_handle is not None:
+            self._restore_handle.cancel()
+        self._restore_handle = self.hass.loop.call_later(delay, self._restore_check_due)
+
+    @callback
+    def _restore_check_due(self) -> None:
+        """Scadenza del timer di riaccensione."""
+        self._restore_handle = None
+        self._evaluate_restore()
+
+    @callback
+    def _evaluate_restore(self) -> None:
+        """Riaccende l'ultimo dispositivo spento se il margine disponibile lo consente.
+
+        Il margine è la soglia meno il maggiore tra la potenza corrente e la media
+        dell'ultimo minuto: un picco recente rimanda la riaccensione.
+        """
+        if (
+            self._state != STATE_MONITORING
+            or self._restore_task is not None
+            or not self._restore_queue
+        ):
+            return
+
+        now = self.hass.loop.time()
+        if self._last_load_action is not None:
+            remaining = self._last_load_action + self._restore_spacing - now
+            if remaining > 0:
+                if self._restore_handle is None:
+                    self._schedule_restore_check(remaining)
+                return
+
+        entity_id = next(reversed(self._restore_queue))
+        delay = self._governor.restore_delay(entity_id, now)
+        if delay > 0:
+            # Tempo minimo spento (con backoff) o budget di azioni esaurito
+            if self._restore_handle is None:
+                self._schedule_restore_check(delay)
+            return
+
+        draw = self._restore_queue[entity_id]
+        if draw is None:
+            draw = self._learned_draw(entity_id)
+        if draw is None:
+            # Senza stima la riaccensione potrebbe riportare sopra soglia
+            _LOGGER.info(
+                "Assorbimento di %s sconosciuto, riaccensione automatica non possibile",
+                entity_id,
+            )
+            del self._restore_queue[entity_id]
+            self._notify_listeners()
+            self._evaluate_restore()
+            return
+
+        total_power = self.coordinator.data.get("total_power", 0)
+        average = self.coordinator.history.mean(RESTORE_AVERAGE_WINDOW)
+        headroom = self._threshold - max(total_power, average or 0.0)
+        if headroom < draw + self._restore_margin:
+            _LOGGER.debug(
+                "Riaccensione di %s rimandata: margine %.1fW < %.1fW + %dW",
+                entity_id,
+                headroom,
+                draw,
+                self._restore_margin,
+            )
+            return
+
+        tree = self.coordinator.circuits
+        if tree is not None:
+            share = draw * tree.share(entity_id)
+            for circuit in tree.circuits_of(entity_id):
+                for node in tree.path(circuit):
+                    if node.power + share + self._restore_margin > node.threshold:
+                        _LOGGER.debug(
+                            "Riaccensione di %s rimandata: circuito %s a %.1fW su %.0fW",
+                            entity_id,
+                            node.name,
+                            node.power,
+                            node.threshold,
+                        )
+                        return
+
+        del self._restore_queue[entity_id]
+        self._last_load_action = now
+        self._governor.record_action(now)
+        self._restore_task = self.hass.async_create_task(
+            self._async_restore(entity_id, draw, total_power)
+        )
+
+    async def _async_restore(
+        self, entity_id: str, draw: float, total_power: float
+    ) -> None:
+        """Riaccende un dispositivo e genera l'evento di riaccensione.
+
+        Args:
+            entity_id: Dispositivo da riaccendere
+            draw: Assorbimento stimato in Watt
+            total_power: Potenza totale al momento della decisione
+        """
+        error = None
+        try:
+            if self._test_mode:
+                _LOGGER.info("TEST MODE: Simulazione riaccensione di %s", entity_id)
+            else:
+                _LOGGER.info(
+                    "Riaccensione di %s (assorbimento stimato %.1fW, potenza %.1fW)",
+                    entity_id,
+                    draw,
+                    total_power,
+                )
+                await asyncio.wait_for(
+                    self._call_entity_service(entity_id, "turn_on"), SHED_CALL_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            error = f"Nessuna risposta entro {SHED_CALL_TIMEOUT}s"
+        except Exception as err:  # noqa: BLE001 - qualsiasi errore del servizio va notificato
+            error = str(err)
+        finally:
+            self._restore_task = None
+
+        if error is not None:
+            _LOGGER.error("Errore durante riaccensione di %s: %s", entity_id, error)
+            state = self.hass.states.get(entity_id)
+            if (
+                entity_id in self._managed_entities
+                and entity_id not in self._restore_queue
+                and (state is None or state.state != "on")
+            ):
+                # Di nuovo in coda come prossimo da riaccendere, dopo il backoff
+                self._governor.record_restore_failure(entity_id, self.hass.loop.time())
+                self._restore_queue[entity_id] = draw
+
+        event_data = {
+            "entity_id": entity_id,
+            "estimated_power": round(draw, 1),
+            "total_power": total_power,
+            "threshold": self._threshold,
+            "timestamp": datetime.now().isoformat(),
+            "test_mode": self._test_mode,
+        }
+        if error:
+            event_data["error"] = error
+        self.hass.bus.async_fire(EVENT_LOAD_RESTORED, event_data)
+        self._notify_listeners()
+
+        if self._restore_queue:
+            self._schedule_restore_check(self._restore_spacing)
+
     def _reset_to_monitoring(self) -> None:
         """Resetta lo stato a MONITORING.
 
         NON resetta current_priority_index e shutdown_entities per mantenere
-        traccia di cosa è stato spento (utente deve riaccendere manualmente).
+        traccia di cosa è stato spento (utente deve riaccendere manualmente,
+        salvo riaccensione automatica attiva).
         """
         old_state = self._state
         self._state = STATE_MONITORING
+        self._predictive_wait = False
+        self._predicted_at = None
 
         if old_state != STATE_MONITORING:
             # Resetta sempre lo storico quando si torna sotto soglia
             # Così al prossimo evento si ricontrolla tutto dall'inizio
             self._current_priority_index = 0
             self._shutdown_entities = []
+            self._ineffective_entities.clear()
+            # Il calo che ha riportato sotto soglia conferma il distacco in verifica
+            self._update_verification()
+            self._cancel_verification()
             
             _LOGGER.info(
                 "Transizione stato: %s -> %s (Reset priorità e storico spegnimenti)",
@@ -463,6 +1752,8 @@ class PowerManager:
                 STATE_MONITORING,
             )
             self._notify_listeners()
+            # Le riaccensioni sospese durante l'intervento possono ripartire
+            self._evaluate_restore()
 
     async def simulate_overload(self) -> None:
         """Simula un superamento della soglia per testing.
@@ -488,10 +1779,11 @@ class PowerManager:
         """Resetta lo storico degli spegnimenti.
 
         Utile se l'utente ha riacceso manualmente i dispositivi e vuole
-        ricominciare dalla priorità 0.
+        ricominciare dalla priorità 0. Svuota anche le riaccensioni automatiche.
         """
         old_count = len(self._shutdown_entities)
         self._shutdown_entities = []
+        self._restore_queue.clear()
         self._current_priority_index = 0
         self._notify_listeners()
 
@@ -514,4 +1806,21 @@ class PowerManager:
             "threshold": self._threshold,
             "debounce_time": self._debounce_time,
             "managed_entities_count": len(self._managed_entities),
+            "predictive_shedding": self._predictive,
+            "batch_shedding": self._batch_shedding,
+            "learned_power": self._learner.as_dict(),
+            "shed_verify_window": self._verify_window,
+            "auto_restore": self._auto_restore,
+            # L'ultimo della lista è il prossimo a essere riacceso
+            "restore_queue": list(self._restore_queue),
+            "governor": self._governor.as_dict(self.hass.loop.time()),
+            "circuits": (
+                self.coordinator.circuits.as_dict() if self.coordinator.circuits else {}
+            ),
+            "shed_metrics": {
+                entity_id: dict(metric) for entity_id, metric in self._shed_metrics.items()
+            },
+            "trip_curve": str(self._overload.curve) if self._overload else None,
+            "overload_level": round(self._overload.level, 3) if self._overload else None,
+            "statistics": self.statistics.as_dict(),
         }
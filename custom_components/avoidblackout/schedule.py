@@ -0,0 +1,328 @@
+"""Soglia per fasce orarie (time-of-use) per AvoidBlackout.
+
+Le fasce della configurazione (giorni della settimana, ora di inizio e di fine,
+soglia) vengono compilate una sola volta in una tabella ordinata di transizioni
+sulla settimana: secondi da lunedì 00:00 → soglia in vigore da quell'istante
+(None = soglia base della config entry, fuori da ogni fascia).
+
+ThresholdScheduler applica la soglia della fascia corrente a coordinator e
+manager e tiene un solo timer (async_track_point_in_time) per la prossima
+transizione: nessun polling e nessuna scrittura delle options, a differenza di
+un'automazione esterna che modifica il number entity della soglia.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Callable
+from datetime import datetime, time, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_point_in_time
+from homeassistant.util import dt as dt_util
+
+from .const import MAX_THRESHOLD, MIN_THRESHOLD
+from .coordinator import PowerCoordinator
+from .power_manager import PowerManager
+
+_LOGGER = logging.getLogger(__name__)
+
+# Giorni della settimana accettati nelle fasce (indice = datetime.weekday())
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+
+def _parse_time(value: Any, name: str) -> int:
+    """Converte un orario "HH:MM" o "HH:MM:SS" in secondi dalla mezzanotte.
+
+    Raises:
+        ValueError: Se l'orario non è valido
+    """
+    try:
+        parsed = time.fromisoformat(str(value))
+    except ValueError as err:
+        raise ValueError(f"Orario non valido per {name}: {value!r}") from err
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+class ThresholdSchedule:
+    """Tabella ordinata delle transizioni settimanali della soglia."""
+
+    __slots__ = ("_offsets", "_thresholds")
+
+    def __init__(self, offsets: tuple[int, ...], thresholds: tuple[int | None, ...]) -> None:
+        """Inizializza la tabella (vedi from_config).
+
+        Args:
+            offsets: Istanti delle transizioni in secondi da lunedì 00:00, crescenti, il primo 0
+            thresholds: Soglia in vigore da ogni istante (None = soglia base)
+        """
+        self._offsets = offsets
+        self._thresholds = thresholds
+
+    @classmethod
+    def from_config(cls, ranges: list[dict[str, Any]]) -> ThresholdSchedule:
+        """Compila e valida le fasce della configurazione.
+
+        Ogni fascia è un dict con start, end ("HH:MM"), max_threshold (W) e,
+        opzionale, days (es. ["sat", "sun"], default tutti i giorni). Una fascia
+        con end non successivo a start prosegue nel giorno seguente; start uguale
+        a end copre l'intera giornata.
+
+        Args:
+            ranges: Fasce orarie
+
+        Returns:
+            Tabella delle transizioni
+
+        Raises:
+            ValueError: Se le fasce non sono valide o si sovrappongono
+        """
+        if not isinstance(ranges, list):
+            raise ValueError("Le fasce orarie devono essere una lista")
+
+        intervals: list[tuple[int, int, int]] = []
+        for spec in ranges:
+            if not isinstance(spec, dict):
+                raise ValueError(f"Fascia oraria non valida: {spec!r}")
+            start = _parse_time(spec.get("start"), "start")
+            end = _parse_time(spec.get("end"), "end")
+            duration = (end - start) % DAY_SECONDS or DAY_SECONDS
+            try:
+                threshold = int(spec["max_threshold"])
+            except (KeyError, TypeError, ValueError) as err:
+                raise ValueError(f"Soglia non valida nella fascia {spec!r}") from err
+            if not MIN_THRESHOLD <= threshold <= MAX_THRESHOLD:
+                raise ValueError(f"Soglia fuori intervallo nella fascia {spec!r}")
+            days = spec.get("days") or WEEKDAYS
+            if isinstance(days, str):
+                days = [days]
+            for day in days:
+                day = str(day).lower()[:3]
+                if day not in WEEKDAYS:
+                    raise ValueError(f"Giorno non valido: {day!r}")
+                begin = WEEKDAYS.index(day) * DAY_SECONDS + start
+                finish = begin + duration
+                # La fascia di domenica sera prosegue il lunedì: spezza sul fine settimana
+                if finish > WEEK_SECONDS:
+                    intervals.append((begin, WEEK_SECONDS, threshold))
+                    intervals.append((0, finish - WEEK_SECONDS, threshold))
+                else:
+                    intervals.append((begin, finish, threshold))
+
+        intervals.sort()
+        offsets: list[int] = []
+        thresholds: list[int | None] = []
+
+        def _add(offset: int, threshold: int | None) -> None:
+            # Transizioni consecutive alla stessa soglia si fondono
+            if thresholds and thresholds[-1] == threshold:
+                return
+            offsets.append(offset)
+            thresholds.append(threshold)
+
+        cursor = 0
+        for begin, finish, threshold in intervals:
+            if begin < cursor:
+                raise ValueError(
+                    f"Fasce orarie sovrapposte il {WEEKDAYS[begin // DAY_SECONDS]}"
+                )
+            if begin > cursor:
+                _add(cursor, None)
+            _add(begin, threshold)
+            cursor = finish
+        if cursor < WEEK_SECONDS:
+            _add(cursor, None)
+        return cls(tuple(offsets), tuple(thresholds))
+
+    def __len__(self) -> int:
+        """Numero di transizioni nella settimana."""
+        return len(self._offsets)
+
+    def threshold_at(self, offset: int) -> int | None:
+        """Soglia in vigore in un istante della settimana.
+
+        Args:
+            offset: Secondi da lunedì 00:00
+
+        Returns:
+            Soglia della fascia, None fuori da ogni fascia (soglia base)
+        """
+        return self._thresholds[bisect_right(self._offsets, offset) - 1]
+
+    def next_transition(self, offset: int) -> tuple[int, int | None] | None:
+        """Prima transizione successiva che cambia la soglia.
+
+        Args:
+            offset: Secondi da lunedì 00:00
+
+        Returns:
+            Istante (secondi da lunedì 00:00 della settimana corrente, oltre
+            WEEK_SECONDS se cade nella settimana successiva) e nuova soglia,
+            None se la soglia non cambia mai
+        """
+        index = bisect_right(self._offsets, offset) - 1
+        current = self._thresholds[index]
+        count = len(self._offsets)
+        for step in range(1, count + 1):
+            week, position = divmod(index + step, count)
+            if self._thresholds[position] != current:
+                return week * WEEK_SECONDS + self._offsets[position], self._thresholds[position]
+        return None
+
+    def as_list(self) -> list[dict[str, Any]]:
+        """Transizioni in forma leggibile (diagnostica)."""
+        return [
+            {
+                "day": WEEKDAYS[offset // DAY_SECONDS],
+                "time": str(timedelta(seconds=offset % DAY_SECONDS)),
+                "threshold": threshold,
+            }
+            for offset, threshold in zip(self._offsets, self._thresholds)
+        ]
+
+
+class ThresholdScheduler:
+    """Applica la soglia della fascia oraria corrente a coordinator e manager.
+
+    Senza fasce configurate inoltra soltanto la soglia base: number entity e
+    options flow passano sempre da qui, così la fascia attiva non viene
+    sovrascritta da una modifica della soglia base.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: PowerCoordinator,
+        manager: PowerManager,
+        base_threshold: int,
+        schedule: ThresholdSchedule | None = None,
+    ) -> None:
+        """Inizializza lo scheduler.
+
+        Args:
+            hass: Istanza Home Assistant
+            coordinator: Coordinator da aggiornare
+            manager: PowerManager da aggiornare
+            base_threshold: Soglia della config entry, fuori da ogni fascia
+            schedule: Fasce orarie compilate (None = soglia fissa)
+        """
+        self.hass = hass
+        self.coordinator = coordinator
+        self.manager = manager
+        self.schedule = schedule
+        self.base_threshold = base_threshold
+        # Soglia applicata (coordinator e manager partono dalla soglia base)
+        self.threshold = base_threshold
+        self.next_change: datetime | None = None
+        self._unsub_timer: Callable[[], None] | None = None
+
+    @callback
+    def async_start(self) -> None:
+        """Applica la fascia corrente e programma la prossima transizione."""
+        if self.schedule is not None:
+            self._async_update(dt_util.utcnow())
+
+    @callback
+    def async_stop(self) -> None:
+        """Annulla il timer della prossima transizione."""
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        self.next_change = None
+
+    @callback
+    def async_set_base(self, threshold: int) -> None:
+        """Aggiorna la soglia base (number entity o options flow).
+
+        Args:
+            threshold: Nuova soglia base in Watt
+        """
+        self.base_threshold = threshold
+        scheduled = None
+        if self.schedule is not None:
+            scheduled = self.schedule.threshold_at(_week_offset(dt_util.now()))
+        if scheduled is not None:
+            _LOGGER.info(
+                "Soglia base %dW: resta in vigore la fascia oraria a %dW",
+                threshold,
+                scheduled,
+            )
+            return
+        self._async_apply(threshold)
+
+    @callback
+    def _async_handle_transition(self, now: datetime) -> None:
+        """Scadenza del timer: applica la nuova fascia e programma la successiva."""
+        self._unsub_timer = None
+        self._async_update(now)
+
+    @callback
+    def _async_update(self, now: datetime) -> None:
+        """Applica la soglia in vigore e programma la prossima transizione.
+
+        Args:
+            now: Istante corrente (UTC)
+        """
+        assert self.schedule is not None
+        local = dt_util.as_local(now)
+        offset = _week_offset(local)
+        scheduled = self.schedule.threshold_at(offset)
+        self._async_apply(self.base_threshold if scheduled is None else scheduled)
+
+        transition = self.schedule.next_transition(offset)
+        if transition is None:
+            self.next_change = None
+            return
+        week_start = local.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(
+            days=local.weekday()
+        )
+        # Aritmetica sull'ora locale: la transizione segue l'orologio anche col cambio d'ora
+        when = week_start + timedelta(seconds=transition[0])
+        if dt_util.as_utc(when) <= now:
+            # Orario ripetuto al ritorno all'ora solare: vale la seconda occorrenza
+            when = when.replace(fold=1)
+        self.next_change = when
+        self._unsub_timer = async_track_point_in_time(
+            self.hass, self._async_handle_transition, when
+        )
+        _LOGGER.debug(
+            "Prossima transizione della soglia: %s → %s",
+            when.isoformat(),
+            "base" if transition[1] is None else f"{transition[1]}W",
+        )
+
+    @callback
+    def _async_apply(self, threshold: int) -> None:
+        """Aggiorna manager e coordinator se la soglia cambia.
+
+        Il manager viene aggiornato per primo: la pubblicazione forzata del
+        coordinator lo rivaluta già con la nuova soglia.
+        """
+        if threshold == self.threshold:
+            return
+        self.threshold = threshold
+        self.manager.update_threshold(threshold)
+        self.coordinator.update_threshold(threshold)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Stato dello scheduler (diagnostica)."""
+        return {
+            "base_threshold": self.base_threshold,
+            "threshold": self.threshold,
+            "next_change": self.next_change.isoformat() if self.next_change else None,
+            "transitions": self.schedule.as_list() if self.schedule else [],
+        }
+
+
+def _week_offset(local: datetime) -> int:
+    """Secondi trascorsi da lunedì 00:00 (ora locale)."""
+    return (
+        local.weekday() * DAY_SECONDS
+        + local.hour * 3600
+        + local.minute * 60
+        + local.second
+    )
@@ -1,21 +1,34 @@
-"""Sensore di stato per AvoidBlackout."""
+"""Sensori di stato, potenza e latenza per AvoidBlackout."""
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import timedelta
 import logging
 from typing import Any
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
+    SensorDeviceClass,
     SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import EntityCategory, UnitOfEnergy, UnitOfPower, UnitOfTime
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, STATE_MONITORING
+from .const import CONF_MANAGED_ENTITIES, DOMAIN, LATENCY_SCAN_INTERVAL, STATE_MONITORING
+from .latency import STAGES, LatencyHistogram
+from .stats import OverloadStatistics
 
 _LOGGER = logging.getLogger(__name__)
 
+# Solo i sensori delle latenze vengono interrogati (gli altri sono a eventi)
+SCAN_INTERVAL = timedelta(seconds=LATENCY_SCAN_INTERVAL)
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -27,31 +40,86 @@ async def async_setup_entry(
     coordinator = data["coordinator"]
     manager = data["manager"]
 
-    async_add_entities([AvoidBlackoutStatusSensor(coordinator, manager, entry)])
+    power_sensor = AvoidBlackoutPowerSensor(coordinator, entry)
+    entities: list[SensorEntity] = [
+        power_sensor,
+        AvoidBlackoutStatusSensor(coordinator, manager, entry, power_sensor),
+    ]
+    entities.extend(
+        AvoidBlackoutStatisticSensor(coordinator, manager, entry, description)
+        for description in STATISTIC_SENSORS
+    )
+    entities.extend(
+        AvoidBlackoutStatisticSensor(
+            coordinator,
+            manager,
+            entry,
+            _device_shed_description(hass, entity_id),
+            device=entity_id,
+        )
+        for entity_id in data["config"][CONF_MANAGED_ENTITIES]
+    )
+    if coordinator.latency is not None:
+        # Sensori diagnostici creati solo con la misura delle latenze attiva
+        entities.extend(
+            AvoidBlackoutLatencySensor(entry, stage, coordinator.latency.histograms[stage])
+            for stage in STAGES
+        )
+    async_add_entities(entities)
 
 
 class AvoidBlackoutStatusSensor(CoordinatorEntity, SensorEntity):
-    """Sensore che rappresenta lo stato del PowerManager."""
+    """Sensore che rappresenta lo stato del PowerManager.
+
+    Lo stato viene scritto solo quando cambia qualcosa di esposto (stato della
+    state machine, dispositivi spenti, soglia o suo superamento): la potenza
+    totale ha il suo sensore (AvoidBlackoutPowerSensor), così il recorder non
+    salva una riga con tutti gli attributi ad ogni aggiornamento della potenza.
+    """
 
     _attr_has_entity_name = True
     _attr_translation_key = "avoidblackout_status"
     _attr_icon = "mdi:shield-flash"
+    # Attributi statici o voluminosi: restano nello stato ma non nel database
+    _unrecorded_attributes = frozenset(
+        {"shutdown_entities", "managed_entities_count", "test_mode", "power_entity"}
+    )
+
+    def __init__(
+        self,
+        coordinator,
+        manager,
+        entry: ConfigEntry,
+        power_sensor: AvoidBlackoutPowerSensor,
+    ) -> None:
+        """Inizializza il sensore.
 
-    def __init__(self, coordinator, manager, entry: ConfigEntry) -> None:
-        """Inizializza il sensore."""
+        Args:
+            coordinator: PowerCoordinator della entry
+            manager: PowerManager della entry
+            entry: Config entry
+            power_sensor: Sensore della potenza totale, indicato negli attributi
+        """
         super().__init__(coordinator)
         self.manager = manager
         self._entry = entry
+        self._power_sensor = power_sensor
         self._attr_unique_id = f"{entry.entry_id}_avoidblackout_status"
         self._attr_name = "AvoidBlackout Status"
         self._unsub_manager = None
+        # Valori statici (una loro modifica ricarica la entry)
+        status = manager.get_status()
+        self._managed_entities_count = status.get("managed_entities_count", 0)
+        self._test_mode = status.get("test_mode", False)
+        # Valori dell'ultimo stato scritto
+        self._written: tuple | None = None
 
     async def async_added_to_hass(self) -> None:
         """Chiamato quando l'entità viene aggiunta a HA."""
         await super().async_added_to_hass()
         # Listener per aggiornamenti dal manager
         self._unsub_manager = self.manager.async_add_listener(
-            self.async_write_ha_state
+            self._async_write_if_changed
         )
 
     async def async_will_remove_from_hass(self) -> None:
@@ -63,24 +131,280 @@ class AvoidBlackoutStatusSensor(CoordinatorEntity, SensorEntity):
     @property
     def state(self) -> str:
         """Ritorna lo stato del manager."""
-        return self.manager._state
+        return self.manager.state
 
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Ritorna gli attributi del sensore."""
-        status = self.manager.get_status()
-        data = self.coordinator.data or {}
-        
+        _, shutdown_entities, threshold, is_over_threshold, power_entity = (
+            self._written or self._snapshot()
+        )
         return {
-            "total_power": data.get("total_power", 0),
-            "threshold": status.get("threshold"),
-            "is_over_threshold": data.get("is_over_threshold", False),
-            "shutdown_entities": status.get("shutdown_entities", []),
-            "managed_entities_count": status.get("managed_entities_count", 0),
-            "test_mode": status.get("test_mode", False),
+            "threshold": threshold,
+            "is_over_threshold": is_over_threshold,
+            "shutdown_entities": list(shutdown_entities),
+            "managed_entities_count": self._managed_entities_count,
+            "test_mode": self._test_mode,
+            "power_entity": power_entity,
         }
 
+    def _snapshot(self) -> tuple:
+        """Valori esposti dal sensore, confrontabili con l'ultimo stato scritto."""
+        data = self.coordinator.data or {}
+        return (
+            self.manager.state,
+            self.manager.shutdown_entities,
+            self.manager.threshold,
+            data.get("is_over_threshold", False),
+            self._power_sensor.entity_id,
+        )
+
+    @callback
+    def _async_write_if_changed(self) -> None:
+        """Scrive lo stato solo se i valori esposti sono cambiati."""
+        snapshot = self._snapshot()
+        if snapshot == self._written:
+            return
+        self._written = snapshot
+        self.async_write_ha_state()
+
     @callback
     def _handle_coordinator_update(self) -> None:
         """Gestisce l'aggiornamento quando il coordinator cambia dati."""
+        self._async_write_if_changed()
+
+
+class AvoidBlackoutPowerSensor(CoordinatorEntity, SensorEntity):
+    """Potenza totale dei sensori della soglia principale.
+
+    Aggiornato alle notifiche del coordinator, già filtrate da deadband e
+    notify_max_silence. Senza attributi: ogni riga del recorder contiene solo il
+    valore, e le statistiche a lungo termine vengono calcolate da HA.
+    """
+
+    _attr_has_entity_name = True
+    _attr_translation_key = "total_power"
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfPower.WATT
+    _attr_suggested_display_precision = 0
+    _attr_icon = "mdi:flash"
+
+    def __init__(self, coordinator, entry: ConfigEntry) -> None:
+        """Inizializza il sensore.
+
+        Args:
+            coordinator: PowerCoordinator della entry
+            entry: Config entry
+        """
+        super().__init__(coordinator)
+        self._attr_unique_id = f"{entry.entry_id}_total_power"
+
+    @property
+    def native_value(self) -> float | None:
+        """Potenza totale in Watt."""
+        data = self.coordinator.data
+        if not data:
+            return None
+        return round(data["total_power"], 1)
+
+
+@dataclass(frozen=True, kw_only=True)
+class AvoidBlackoutStatisticDescription(SensorEntityDescription):
+    """Descrizione di un sensore cumulativo letto da manager.statistics."""
+
+    # Valore corrente del contatore
+    value_fn: Callable[[OverloadStatistics], float]
+    # Somma al contatore il valore salvato prima del riavvio
+    restore_fn: Callable[[OverloadStatistics, float], None]
+
+
+def _add_shed_count(statistics: OverloadStatistics, value: float) -> None:
+    """Riprende il numero di distacchi."""
+    statistics.shed_count += int(value)
+
+
+def _add_seconds_over(statistics: OverloadStatistics, value: float) -> None:
+    """Riprende i secondi sopra soglia."""
+    statistics.seconds_over += value
+
+
+def _add_energy_over(statistics: OverloadStatistics, value: float) -> None:
+    """Riprende l'energia oltre soglia."""
+    statistics.energy_over_wh += value
+
+
+STATISTIC_SENSORS: tuple[AvoidBlackoutStatisticDescription, ...] = (
+    AvoidBlackoutStatisticDescription(
+        key="shed_count",
+        translation_key="shed_count",
+        icon="mdi:power-plug-off",
+        value_fn=lambda statistics: statistics.shed_count,
+        restore_fn=_add_shed_count,
+    ),
+    AvoidBlackoutStatisticDescription(
+        key="time_over_threshold",
+        translation_key="time_over_threshold",
+        icon="mdi:timer-alert-outline",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=0,
+        value_fn=lambda statistics: round(statistics.seconds_over),
+        restore_fn=_add_seconds_over,
+    ),
+    AvoidBlackoutStatisticDescription(
+        key="energy_over_threshold",
+        translation_key="energy_over_threshold",
+        icon="mdi:lightning-bolt-outline",
+        device_class=SensorDeviceClass.ENERGY,
+        native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
+        suggested_display_precision=1,
+        value_fn=lambda statistics: round(statistics.energy_over_wh, 2),
+        restore_fn=_add_energy_over,
+    ),
+)
+
+
+def _device_shed_description(
+    hass: HomeAssistant, entity_id: str
+) -> AvoidBlackoutStatisticDescription:
+    """Descrizione del contatore dei distacchi di un dispositivo gestito.
+
+    Args:
+        hass: Istanza Home Assistant (per il nome del dispositivo)
+        entity_id: Dispositivo gestito
+
+    Returns:
+        Descrizione del sensore
+    """
+
+    def _restore(statistics: OverloadStatistics, value: float) -> None:
+        device_sheds = statistics.device_sheds
+        device_sheds[entity_id] = device_sheds.get(entity_id, 0) + int(value)
+
+    state = hass.states.get(entity_id)
+    return AvoidBlackoutStatisticDescription(
+        key=f"sheds_{entity_id}",
+        name=f"AvoidBlackout Sheds {state.name if state else entity_id}",
+        icon="mdi:power-plug-off-outline",
+        value_fn=lambda statistics: statistics.device_sheds.get(entity_id, 0),
+        restore_fn=_restore,
+    )
+
+
+class AvoidBlackoutStatisticSensor(CoordinatorEntity, RestoreSensor):
+    """Sensore cumulativo per le statistiche a lungo termine.
+
+    Il valore viene letto dai contatori di manager.statistics (aggiornati in O(1)
+    ad ogni campione) alle notifiche di coordinator e manager, e scritto solo se
+    cambiato. Con state_class total_increasing HA calcola le statistiche orarie
+    direttamente dagli stati; al riavvio il contatore riparte dall'ultimo valore.
+    """
+
+    entity_description: AvoidBlackoutStatisticDescription
+    _attr_has_entity_name = True
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _unrecorded_attributes = frozenset({"device"})
+
+    def __init__(
+        self,
+        coordinator,
+        manager,
+        entry: ConfigEntry,
+        description: AvoidBlackoutStatisticDescription,
+        device: str | None = None,
+    ) -> None:
+        """Inizializza il sensore.
+
+        Args:
+            coordinator: PowerCoordinator della entry
+            manager: PowerManager della entry (contatori in manager.statistics)
+            entry: Config entry
+            description: Contatore da esporre (key = suffisso dello unique_id)
+            device: Dispositivo gestito a cui si riferisce il contatore, se presente
+        """
+        super().__init__(coordinator)
+        self.entity_description = description
+        self.manager = manager
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        if device is not None:
+            self._attr_extra_state_attributes = {"device": device}
+        self._unsub_manager = None
+        self._written: float | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Riprende il conteggio dall'ultimo valore e si registra sul manager."""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            try:
+                value = float(last.native_value)
+            except (TypeError, ValueError):
+                _LOGGER.debug("Valore precedente di %s non numerico, riparto da zero", self.entity_id)
+            else:
+                self.entity_description.restore_fn(self.manager.statistics, value)
+        self._unsub_manager = self.manager.async_add_listener(
+            self._async_write_if_changed
+        )
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Chiamato quando l'entità viene rimossa da HA."""
+        if self._unsub_manager:
+            self._unsub_manager()
+        await super().async_will_remove_from_hass()
+
+    @property
+    def native_value(self) -> float:
+        """Valore corrente del contatore."""
+        return self.entity_description.value_fn(self.manager.statistics)
+
+    @callback
+    def _async_write_if_changed(self) -> None:
+        """Scrive lo stato solo se il valore è cambiato."""
+        value = self.native_value
+        if value == self._written:
+            return
+        self._written = value
         self.async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Gestisce l'aggiornamento quando il coordinator cambia dati."""
+        self._async_write_if_changed()
+
+
+class AvoidBlackoutLatencySensor(SensorEntity):
+    """Sensore diagnostico con il 95° percentile di un intervallo del percorso critico.
+
+    Lo stato è letto dall'istogramma ogni SCAN_INTERVAL: il percorso critico non
+    scrive mai stati. p50, p99, media, massimo e numero di campioni sono attributi.
+    """
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:timer-outline"
+    _attr_should_poll = True
+
+    def __init__(
+        self, entry: ConfigEntry, stage: str, histogram: LatencyHistogram
+    ) -> None:
+        """Inizializza il sensore.
+
+        Args:
+            entry: Config entry
+            stage: Intervallo misurato (latency.STAGES)
+            histogram: Istogramma dell'intervallo
+        """
+        self._histogram = histogram
+        self._attr_translation_key = f"latency_{stage}"
+        self._attr_unique_id = f"{entry.entry_id}_latency_{stage}"
+
+    async def async_update(self) -> None:
+        """Legge i percentili dall'istogramma (nel loop, senza executor)."""
+        summary = self._histogram.as_dict()
+        self._attr_native_value = summary.pop("p95")
+        self._attr_extra_state_attributes = summary
@@ -0,0 +1,71 @@
+"""Contatori cumulativi per le statistiche a lungo termine di AvoidBlackout.
+
+Distacchi (totali e per dispositivo), secondi sopra soglia ed energia assorbita
+oltre la soglia, aggiornati in O(1) ad ogni campione pubblicato dal coordinator:
+i sensori che li espongono (state_class total_increasing) alimentano direttamente
+le statistiche a lungo termine di Home Assistant, senza query al recorder.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+
+class OverloadStatistics:
+    """Contatori monotoni di distacchi e sovraccarico.
+
+    Ogni campione rappresenta un segmento a potenza costante fino al campione
+    successivo (sample-and-hold, come PowerHistory): alla chiusura del segmento
+    si integrano la sua durata e l'eccesso sulla soglia valida in quel momento.
+    """
+
+    __slots__ = (
+        "shed_count",
+        "seconds_over",
+        "energy_over_wh",
+        "device_sheds",
+        "_last_timestamp",
+        "_last_excess",
+    )
+
+    def __init__(self) -> None:
+        """Inizializza i contatori a zero."""
+        self.shed_count = 0
+        self.seconds_over = 0.0
+        self.energy_over_wh = 0.0
+        self.device_sheds: dict[str, int] = {}
+        self._last_timestamp: float | None = None
+        self._last_excess = 0.0  # W oltre la soglia del segmento aperto
+
+    def add_sample(self, timestamp: float, power: float, threshold: float) -> None:
+        """Chiude il segmento precedente e ne apre uno nuovo.
+
+        Args:
+            timestamp: Istante del campione (tempo monotono del loop)
+            power: Potenza totale in Watt
+            threshold: Soglia principale in Watt
+        """
+        if self._last_timestamp is not None and self._last_excess > 0:
+            duration = timestamp - self._last_timestamp
+            if duration > 0:
+                self.seconds_over += duration
+                self.energy_over_wh += self._last_excess * duration / 3600
+        self._last_timestamp = timestamp
+        self._last_excess = max(power - threshold, 0.0)
+
+    def record_shed(self, entity_id: str) -> None:
+        """Conta un distacco riuscito.
+
+        Args:
+            entity_id: Dispositivo spento
+        """
+        self.shed_count += 1
+        self.device_sheds[entity_id] = self.device_sheds.get(entity_id, 0) + 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Contatori in forma serializzabile."""
+        return {
+            "shed_count": self.shed_count,
+            "seconds_over": round(self.seconds_over, 1),
+            "energy_over_wh": round(self.energy_over_wh, 3),
+            "device_sheds": dict(self.device_sheds),
+        }
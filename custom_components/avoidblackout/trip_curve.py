@@ -0,0 +1,189 @@
+"""Modello a curva di intervento (I²t) per AvoidBlackout.
+
+Un interruttore reale tollera un sovraccarico per un tempo che dipende da quanto
+si supera il limite: la curva associa al rapporto potenza/soglia il tempo di
+intervento. Il sovraccarico viene integrato come frazione di "calore" accumulato
+(regola di Miner): ogni secondo a rapporto r aggiunge 1/T(r), l'intervento avviene
+a 1.0 e sotto soglia il calore si dissipa esponenzialmente.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+import math
+
+# Calore a cui si considera raggiunto l'intervento (evita attese sotto la risoluzione del clock)
+_TRIP_LEVEL = 1 - 1e-6
+
+
+class TripCurve:
+    """Curva di intervento interpolata in scala log-log.
+
+    I punti sono precompilati in tabelle (log rapporto, log tempo, pendenza del
+    segmento): una valutazione costa una ricerca binaria e un'esponenziale.
+    Fuori dall'intervallo dei punti il tempo resta quello dell'estremo più vicino.
+    """
+
+    __slots__ = ("_points", "_log_ratios", "_log_times", "_slopes")
+
+    def __init__(self, points: list[tuple[float, float]]) -> None:
+        """Inizializza la curva.
+
+        Args:
+            points: Coppie (rapporto potenza/soglia, tempo di intervento in secondi)
+
+        Raises:
+            ValueError: Se i punti non descrivono una curva valida
+        """
+        if not points:
+            raise ValueError("La curva di intervento deve avere almeno un punto")
+
+        points = sorted(points)
+        for ratio, trip_time in points:
+            if ratio < 1 or trip_time <= 0:
+                raise ValueError(
+                    f"Punto non valido {ratio}:{trip_time} (rapporto >= 1, tempo > 0)"
+                )
+        for (ratio_a, time_a), (ratio_b, time_b) in zip(points, points[1:]):
+            if ratio_a == ratio_b or time_b > time_a:
+                raise ValueError(
+                    "I tempi di intervento devono decrescere al crescere del rapporto"
+                )
+
+        self._points = tuple(points)
+        self._log_ratios = tuple(math.log(ratio) for ratio, _ in points)
+        self._log_times = tuple(math.log(trip_time) for _, trip_time in points)
+        self._slopes = tuple(
+            (self._log_times[i + 1] - self._log_times[i])
+            / (self._log_ratios[i + 1] - self._log_ratios[i])
+            for i in range(len(points) - 1)
+        )
+
+    @classmethod
+    def parse(cls, text: str) -> TripCurve:
+        """Crea la curva da una stringa "rapporto:secondi,rapporto:secondi,...".
+
+        Args:
+            text: Curva testuale, es. "1.1:10800,1.27:600,1.6:120,2.0:5"
+
+        Returns:
+            Curva di intervento
+
+        Raises:
+            ValueError: Se la stringa non è valida
+        """
+        points = []
+        for item in text.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            ratio, separator, trip_time = item.partition(":")
+            if not separator:
+                raise ValueError(f"Punto non valido: {item!r}")
+            points.append((float(ratio), float(trip_time)))
+        return cls(points)
+
+    @property
+    def points(self) -> tuple[tuple[float, float], ...]:
+        """Punti della curva ordinati per rapporto."""
+        return self._points
+
+    def __str__(self) -> str:
+        """Rappresentazione testuale compatibile con parse()."""
+        return ",".join(f"{ratio:g}:{trip_time:g}" for ratio, trip_time in self._points)
+
+    def trip_time(self, ratio: float) -> float:
+        """Tempo di intervento a sovraccarico costante.
+
+        Args:
+            ratio: Rapporto potenza/soglia
+
+        Returns:
+            Secondi prima dell'intervento (inf se non si è sopra soglia)
+        """
+        if ratio <= 1:
+            return math.inf
+        log_ratio = math.log(ratio)
+        index = bisect_right(self._log_ratios, log_ratio) - 1
+        if index < 0:
+            return self._points[0][1]
+        if index >= len(self._slopes):
+            return self._points[-1][1]
+        return math.exp(
+            self._log_times[index]
+            + self._slopes[index] * (log_ratio - self._log_ratios[index])
+        )
+
+
+class OverloadAccumulator:
+    """Integratore del sovraccarico secondo una curva di intervento.
+
+    Il rapporto è trattato come costante tra due aggiornamenti (sample-and-hold),
+    come per lo storico della potenza.
+    """
+
+    __slots__ = ("_curve", "_cooling_time", "_level", "_ratio", "_updated_at")
+
+    def __init__(self, curve: TripCurve, cooling_time: float) -> None:
+        """Inizializza l'accumulatore.
+
+        Args:
+            curve: Curva di intervento
+            cooling_time: Costante di tempo della dissipazione sotto soglia (s)
+        """
+        self._curve = curve
+        self._cooling_time = cooling_time
+        self._level = 0.0
+        self._ratio = 0.0
+        self._updated_at: float | None = None
+
+    @property
+    def curve(self) -> TripCurve:
+        """Curva di intervento usata."""
+        return self._curve
+
+    @property
+    def level(self) -> float:
+        """Calore accumulato all'ultimo aggiornamento (1.0 = intervento)."""
+        return self._level
+
+    def update(self, now: float, ratio: float) -> float:
+        """Integra fino a now con il rapporto precedente e registra il nuovo.
+
+        Args:
+            now: Istante monotono in secondi
+            ratio: Nuovo rapporto potenza/soglia
+
+        Returns:
+            Calore accumulato
+        """
+        if self._updated_at is not None:
+            elapsed = max(now - self._updated_at, 0.0)
+            if self._ratio > 1:
+                self._level += elapsed / self._curve.trip_time(self._ratio)
+            elif self._level:
+                self._level *= math.exp(-elapsed / self._cooling_time)
+        self._updated_at = now
+        self._ratio = ratio
+        return self._level
+
+    def time_to_trip(self, now: float) -> float:
+        """Secondi all'intervento se il rapporto corrente resta costante.
+
+        Args:
+            now: Istante monotono in secondi
+
+        Returns:
+            Secondi rimanenti (0 se già scattato, inf se sotto soglia)
+        """
+        level = self.update(now, self._ratio)
+        if level >= _TRIP_LEVEL:
+            return 0.0
+        return (1 - level) * self._curve.trip_time(self._ratio)
+
+    def discharge(self, level: float) -> None:
+        """Limita il calore accumulato (es. dopo un distacco).
+
+        Args:
+            level: Livello massimo da mantenere
+        """
+        self._level = min(self._level, level)
@@ -77,7 +77,11 @@ class AvoidBlackoutCard extends HTMLElement {
 
     const state = stateObj.state;
     const attr = stateObj.attributes;
-    const power = attr.total_power || 0;
+    // Potenza dal sensore dedicato (power_entity); total_power per le versioni precedenti
+    const powerEntity = this.config.power_entity || attr.power_entity;
+    const power = powerEntity
+      ? Math.round(Number(hass.states[powerEntity]?.state) || 0)
+      : attr.total_power || 0;
     const threshold = attr.threshold || 1;
     const pct = Math.min((power / threshold) * 100, 100);
     const entities = attr.shutdown_entities || [];
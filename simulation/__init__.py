@@ -0,0 +1,24 @@
+"""Simulazione offline di AvoidBlackout su tracce di potenza registrate.
+
+PowerCoordinator e PowerManager reali girano su un sostituto minimo di Home
+Assistant (stati, bus, servizi) e su un event loop a tempo virtuale: una
+giornata di campioni a 1 Hz viene riprodotta in pochi secondi.
+
+Uso (dalla root del repository):
+
+    python -m simulation traccia.csv --threshold 3000 --device switch.forno=2000
+"""
+from .clock import VirtualTimeLoop
+from .engine import SimulationEngine, SimulationReport, run_simulation
+from .hass import SimHomeAssistant
+from .trace import PowerTrace, load_trace
+
+__all__ = [
+    "PowerTrace",
+    "SimHomeAssistant",
+    "SimulationEngine",
+    "SimulationReport",
+    "VirtualTimeLoop",
+    "load_trace",
+    "run_simulation",
+]
@@ -0,0 +1,115 @@
+"""Riga di comando della simulazione.
+
+Esempi (dalla root del repository):
+
+    python -m simulation giornata.csv --threshold 3000 --debounce 30 \\
+        --device switch.forno=2000 --device switch.lavatrice=1800
+
+    python -m simulation giornata.parquet --column sensor.contatore \\
+        --device switch.wallbox=3500 --option auto_restore=true --json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from typing import Any
+
+from .engine import run_simulation
+from .trace import load_trace
+
+
+def _parse_pair(text: str) -> tuple[str, str]:
+    """Divide un argomento chiave=valore."""
+    key, separator, value = text.partition("=")
+    if not separator or not key:
+        raise argparse.ArgumentTypeError(f"Atteso chiave=valore, ricevuto {text!r}")
+    return key, value
+
+
+def _option_value(raw: str) -> Any:
+    """Interpreta il valore di un'opzione come JSON (numeri, booleani, liste)."""
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Entry point della simulazione.
+
+    Args:
+        argv: Argomenti (default: sys.argv)
+
+    Returns:
+        Codice di uscita
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m simulation", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("trace", help="Traccia di potenza (.csv o .parquet)")
+    parser.add_argument("--column", help="Colonna di potenza della traccia")
+    parser.add_argument("--threshold", type=float, default=3000.0)
+    parser.add_argument("--debounce", type=int, default=30)
+    parser.add_argument(
+        "--device",
+        type=_parse_pair,
+        action="append",
+        default=[],
+        metavar="ENTITY_ID=WATT",
+        help="Dispositivo gestito e assorbimento, in ordine di priorità",
+    )
+    parser.add_argument(
+        "--option",
+        type=_parse_pair,
+        action="append",
+        default=[],
+        metavar="CHIAVE=VALORE",
+        help="Opzione dell'integrazione (valore JSON, es. auto_restore=true)",
+    )
+    parser.add_argument("--json", action="store_true", help="Report completo in JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log dell'integrazione")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    try:
+        trace = load_trace(args.trace, args.column)
+        devices = {entity_id: float(watt) for entity_id, watt in args.device}
+    except (ImportError, OSError, ValueError) as err:
+        print(f"Errore: {err}", file=sys.stderr)
+        return 2
+
+    config = {
+        "max_threshold": args.threshold,
+        "debounce_time": args.debounce,
+        **{key: _option_value(value) for key, value in args.option},
+    }
+    report = run_simulation(trace, config, devices).as_dict()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(
+        f"{report['samples']} campioni, {report['duration'] / 3600:.2f}h simulate "
+        f"in {report['wall_time']:.2f}s (soglia {report['threshold']:.0f}W)"
+    )
+    print(
+        f"distacchi: {report['shed_count']}  riaccensioni: {report['restore_count']}  "
+        f"tempo oltre soglia: {report['time_over_limit']:.0f}s"
+    )
+    if report["shed_delay_mean"] is not None:
+        print(
+            f"ritardo del distacco: medio {report['shed_delay_mean']:.1f}s, "
+            f"massimo {report['shed_delay_max']:.1f}s"
+        )
+    for shed in report["sheds"]:
+        delay = "-" if shed["delay"] is None else f"{shed['delay']:.1f}s"
+        print(f"  {shed['time']:>9.1f}s  {shed['entity_id']}  ritardo {delay}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Event loop a tempo virtuale per la simulazione.
+
+Il clock avanza solo quando il loop è inattivo, direttamente fino al prossimo
+timer: asyncio.sleep, call_later e call_at (debounce, coalescenza, riaccensioni)
+scadono istantaneamente e una giornata di campioni viene eseguita in secondi.
+"""
+from __future__ import annotations
+
+import asyncio
+import selectors
+
+
+class _VirtualSelector:
+    """Selector che, invece di bloccare, fa avanzare il clock virtuale."""
+
+    def __init__(self, loop: VirtualTimeLoop, selector: selectors.BaseSelector) -> None:
+        self._loop = loop
+        self._selector = selector
+
+    def select(self, timeout: float | None = None):
+        if self._loop.executor_jobs:
+            # Il loop non è inattivo: un job dell'executor (es. lettura dello Store)
+            # lo risveglierà al termine, prima di far scadere i timer successivi
+            return self._selector.select(timeout)
+        events = self._selector.select(0)
+        if not events and timeout:
+            self._loop.advance(timeout)
+        elif not events and timeout is None:
+            # Nessun timer pendente: attende I/O reale (es. thread dell'executor)
+            events = self._selector.select(None)
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """Event loop in cui time() è virtuale e avanza solo quando il loop è inattivo."""
+
+    def __init__(self) -> None:
+        super().__init__(_VirtualSelector(self, selectors.DefaultSelector()))
+        self._virtual_now = 0.0
+        # Job dell'executor in corso: finché ci sono, il clock non avanza
+        self.executor_jobs = 0
+
+    def time(self) -> float:
+        return self._virtual_now
+
+    def advance(self, seconds: float) -> None:
+        self._virtual_now += seconds
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.executor_jobs += 1
+        future.add_done_callback(self._executor_job_done)
+        return future
+
+    def _executor_job_done(self, future: asyncio.Future) -> None:
+        self.executor_jobs -= 1
@@ -0,0 +1,225 @@
+"""Motore di simulazione: replay di una traccia attraverso coordinator e manager.
+
+La traccia è la potenza misurata senza interventi. Ogni campione viene scritto
+sul sensore simulato al suo istante, sul loop a tempo virtuale; un dispositivo
+spento dal manager sottrae il suo assorbimento nominale dai campioni successivi
+finché non viene riacceso.
+
+Il report contiene i distacchi (con il ritardo dall'inizio del sovraccarico),
+le riaccensioni e il tempo trascorso sopra la soglia.
+"""
+from __future__ import annotations
+
+import asyncio
+import statistics
+import time
+from typing import Any
+
+from custom_components.avoidblackout.const import (
+    CONF_DEBOUNCE_TIME,
+    CONF_MANAGED_ENTITIES,
+    CONF_MAX_THRESHOLD,
+    CONF_POWER_SENSORS,
+    DEFAULT_DEBOUNCE,
+    DEFAULT_THRESHOLD,
+)
+from custom_components.avoidblackout.coordinator import PowerCoordinator
+from custom_components.avoidblackout.power_manager import PowerManager
+
+from .clock import VirtualTimeLoop
+from .hass import SimDispatcher, SimHomeAssistant, SimServiceCall
+from .trace import PowerTrace
+
+# Sensore di potenza simulato (se la configurazione non ne indica uno)
+SIM_SENSOR = "sensor.simulated_power"
+
+
+class SimulationReport:
+    """Risultati di un replay."""
+
+    __slots__ = (
+        "samples",
+        "duration",
+        "threshold",
+        "sheds",
+        "restores",
+        "time_over_limit",
+        "wall_time",
+    )
+
+    def __init__(self, samples: int, duration: float, threshold: float) -> None:
+        """Inizializza un report vuoto.
+
+        Args:
+            samples: Campioni della traccia
+            duration: Durata simulata in secondi
+            threshold: Soglia principale in Watt
+        """
+        self.samples = samples
+        self.duration = duration
+        self.threshold = threshold
+        # (istante, entity_id, secondi dall'inizio del sovraccarico o None)
+        self.sheds: list[tuple[float, str, float | None]] = []
+        self.restores: list[tuple[float, str]] = []
+        self.time_over_limit = 0.0
+        self.wall_time = 0.0
+
+    @property
+    def shed_delays(self) -> list[float]:
+        """Ritardi dei distacchi avvenuti durante un sovraccarico."""
+        return [delay for _, _, delay in self.sheds if delay is not None]
+
+    def as_dict(self) -> dict[str, Any]:
+        """Report in forma serializzabile (JSON)."""
+        delays = self.shed_delays
+        return {
+            "samples": self.samples,
+            "duration": self.duration,
+            "threshold": self.threshold,
+            "shed_count": len(self.sheds),
+            "restore_count": len(self.restores),
+            "time_over_limit": round(self.time_over_limit, 1),
+            "shed_delay_mean": round(statistics.fmean(delays), 1) if delays else None,
+            "shed_delay_max": round(max(delays), 1) if delays else None,
+            "sheds": [
+                {
+                    "time": round(moment, 1),
+                    "entity_id": entity_id,
+                    "delay": None if delay is None else round(delay, 1),
+                }
+                for moment, entity_id, delay in self.sheds
+            ],
+            "restores": [
+                {"time": round(moment, 1), "entity_id": entity_id}
+                for moment, entity_id in self.restores
+            ],
+            "wall_time": round(self.wall_time, 3),
+        }
+
+
+class SimulationEngine:
+    """Esegue PowerCoordinator e PowerManager su una traccia registrata."""
+
+    def __init__(
+        self,
+        trace: PowerTrace,
+        config: dict[str, Any],
+        devices: dict[str, float],
+    ) -> None:
+        """Inizializza il motore.
+
+        Args:
+            trace: Potenza misurata senza interventi
+            config: Configurazione dell'integrazione (data + options); sensori e
+                dispositivi gestiti, se assenti, vengono presi dalla simulazione
+            devices: Dispositivi gestiti → assorbimento nominale in Watt, in
+                ordine di priorità
+        """
+        self._trace = trace
+        self._devices = devices
+        self._config = {
+            CONF_MAX_THRESHOLD: DEFAULT_THRESHOLD,
+            CONF_DEBOUNCE_TIME: DEFAULT_DEBOUNCE,
+            **config,
+        }
+        self._config.setdefault(CONF_POWER_SENSORS, [SIM_SENSOR])
+        self._config.setdefault(CONF_MANAGED_ENTITIES, list(devices))
+        self._sensor = self._config[CONF_POWER_SENSORS][0]
+
+    async def async_run(self) -> SimulationReport:
+        """Esegue il replay sul loop corrente (normalmente a tempo virtuale).
+
+        Returns:
+            Report della simulazione
+        """
+        loop = asyncio.get_running_loop()
+        threshold = float(self._config[CONF_MAX_THRESHOLD])
+        report = SimulationReport(len(self._trace), self._trace.duration, threshold)
+        hass = SimHomeAssistant(loop)
+        # Dispositivi spenti dal manager → assorbimento sottratto alla traccia
+        shed: dict[str, float] = {}
+        start = loop.time()
+        overload_since: float | None = None
+
+        def _turn_off(call: SimServiceCall) -> None:
+            entity_id = call.data["entity_id"]
+            now = loop.time() - start
+            delay = None if overload_since is None else now - overload_since
+            report.sheds.append((now, entity_id, delay))
+            shed[entity_id] = self._devices.get(entity_id, 0.0)
+            hass.states.async_set(entity_id, "off", self._attributes(entity_id))
+
+        def _turn_on(call: SimServiceCall) -> None:
+            entity_id = call.data["entity_id"]
+            report.restores.append((loop.time() - start, entity_id))
+            shed.pop(entity_id, None)
+            hass.states.async_set(entity_id, "on", self._attributes(entity_id))
+
+        for domain in {entity_id.split(".")[0] for entity_id in self._devices}:
+            hass.services.async_register(domain, "turn_off", _turn_off)
+            hass.services.async_register(domain, "turn_on", _turn_on)
+        for entity_id in self._devices:
+            hass.states.async_set(entity_id, "on", self._attributes(entity_id))
+        self._write_sample(hass, self._trace.values[0])
+
+        coordinator = PowerCoordinator(hass, self._config, SimDispatcher(hass))
+        await coordinator.async_start()
+        manager = PowerManager(hass, coordinator, self._config)
+        await manager.async_start()
+
+        started = time.perf_counter()
+        previous: tuple[float, float] | None = None
+        for moment, value in self._trace:
+            delay = start + moment - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Sample-and-hold: il campione precedente vale fino a questo istante
+            if previous is not None and previous[1] > threshold:
+                report.time_over_limit += moment - previous[0]
+            power = max(value - sum(shed.values()), 0.0)
+            if power > threshold:
+                if overload_since is None:
+                    overload_since = moment
+            else:
+                overload_since = None
+            self._write_sample(hass, power)
+            previous = (moment, power)
+
+        await manager.async_stop()
+        await coordinator.async_stop()
+        report.wall_time = time.perf_counter() - started
+        return report
+
+    def _write_sample(self, hass: SimHomeAssistant, power: float) -> None:
+        """Scrive un campione sul sensore simulato."""
+        hass.states.async_set(
+            self._sensor, f"{power:.1f}", {"unit_of_measurement": "W"}
+        )
+
+    def _attributes(self, entity_id: str) -> dict[str, Any]:
+        """Attributi del dispositivo: l'assorbimento nominale come current_power_w."""
+        return {"current_power_w": self._devices.get(entity_id, 0.0)}
+
+
+def run_simulation(
+    trace: PowerTrace,
+    config: dict[str, Any],
+    devices: dict[str, float],
+) -> SimulationReport:
+    """Esegue un replay completo su un nuovo loop a tempo virtuale.
+
+    Args:
+        trace: Potenza misurata senza interventi
+        config: Configurazione dell'integrazione
+        devices: Dispositivi gestiti → assorbimento nominale in Watt
+
+    Returns:
+        Report della simulazione
+    """
+    loop = VirtualTimeLoop()
+    try:
+        return loop.run_until_complete(
+            SimulationEngine(trace, config, devices).async_run()
+        )
+    finally:
+        loop.close()
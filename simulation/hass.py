@@ -0,0 +1,240 @@
+"""Sostituto minimo di Home Assistant per la simulazione.
+
+Fornisce solo ciò che PowerCoordinator e PowerManager usano: stati, bus eventi,
+servizi, hass.data e la creazione di task sul loop. Non carica il core, i
+registry né lo storage: nessun I/O, nessun thread, nessuna configurazione.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine
+from types import MappingProxyType
+from typing import Any
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import CALLBACK_TYPE, State
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.avoidblackout.dispatcher import StateDispatcher
+
+
+class SimEvent:
+    """Evento del bus simulato."""
+
+    __slots__ = ("event_type", "data", "time_fired")
+
+    def __init__(self, event_type: str, data: dict[str, Any], time_fired: float) -> None:
+        """Inizializza l'evento.
+
+        Args:
+            event_type: Tipo di evento
+            data: Dati dell'evento
+            time_fired: Istante del loop
+        """
+        self.event_type = event_type
+        self.data = data
+        self.time_fired = time_fired
+
+
+class SimServiceCall:
+    """Chiamata a un servizio simulato."""
+
+    __slots__ = ("domain", "service", "data")
+
+    def __init__(self, domain: str, service: str, data: dict[str, Any]) -> None:
+        """Inizializza la chiamata.
+
+        Args:
+            domain: Dominio del servizio
+            service: Nome del servizio
+            data: Dati della chiamata
+        """
+        self.domain = domain
+        self.service = service
+        self.data = data
+
+
+class SimBus:
+    """Bus eventi: listener per tipo di evento e per entità (state_changed)."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Inizializza il bus.
+
+        Args:
+            loop: Loop da cui leggere l'istante degli eventi
+        """
+        self._loop = loop
+        self._listeners: dict[str, list[Callable[[SimEvent], None]]] = {}
+        self._state_listeners: dict[str, list[Callable[[SimEvent], None]]] = {}
+        # Eventi generati dall'integrazione (state_changed esclusi)
+        self.fired: list[SimEvent] = []
+
+    def async_listen(
+        self, event_type: str, listener: Callable[[SimEvent], None]
+    ) -> CALLBACK_TYPE:
+        """Registra un listener per un tipo di evento.
+
+        Returns:
+            Funzione per annullare la registrazione
+        """
+        return _add(self._listeners.setdefault(event_type, []), listener)
+
+    def async_listen_state(
+        self, entity_id: str, listener: Callable[[SimEvent], None]
+    ) -> CALLBACK_TYPE:
+        """Registra un listener per i cambi di stato di una sola entità.
+
+        Returns:
+            Funzione per annullare la registrazione
+        """
+        return _add(self._state_listeners.setdefault(entity_id, []), listener)
+
+    def async_fire(
+        self, event_type: str, event_data: dict[str, Any] | None = None, **kwargs: Any
+    ) -> None:
+        """Genera un evento e chiama subito i listener.
+
+        Args:
+            event_type: Tipo di evento
+            event_data: Dati dell'evento
+        """
+        event = SimEvent(event_type, event_data or {}, self._loop.time())
+        if event_type == EVENT_STATE_CHANGED:
+            listeners = self._state_listeners.get(event.data["entity_id"], ())
+        else:
+            self.fired.append(event)
+            listeners = self._listeners.get(event_type, ())
+        for listener in tuple(listeners):
+            listener(event)
+
+
+class SimStates:
+    """Macchina a stati: genera state_changed solo se stato o attributi cambiano."""
+
+    def __init__(self, bus: SimBus) -> None:
+        """Inizializza la macchina a stati.
+
+        Args:
+            bus: Bus su cui pubblicare i cambi di stato
+        """
+        self._bus = bus
+        self._states: dict[str, State] = {}
+
+    def get(self, entity_id: str) -> State | None:
+        """Stato corrente di un'entità."""
+        return self._states.get(entity_id)
+
+    def async_set(
+        self,
+        entity_id: str,
+        new_state: str,
+        attributes: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Imposta lo stato di un'entità.
+
+        Args:
+            entity_id: Entità
+            new_state: Nuovo stato
+            attributes: Attributi (None = nessuno)
+        """
+        old_state = self._states.get(entity_id)
+        attributes = attributes or {}
+        if (
+            old_state is not None
+            and old_state.state == new_state
+            and old_state.attributes == attributes
+        ):
+            return
+        state = State(entity_id, new_state, MappingProxyType(dict(attributes)))
+        self._states[entity_id] = state
+        self._bus.async_fire(
+            EVENT_STATE_CHANGED,
+            {"entity_id": entity_id, "old_state": old_state, "new_state": state},
+        )
+
+
+class SimServices:
+    """Registro dei servizi."""
+
+    def __init__(self) -> None:
+        """Inizializza il registro."""
+        self._handlers: dict[tuple[str, str], Callable[[SimServiceCall], Any]] = {}
+
+    def async_register(
+        self, domain: str, service: str, handler: Callable[[SimServiceCall], Any]
+    ) -> None:
+        """Registra un servizio (handler sincrono o coroutine)."""
+        self._handlers[(domain, service)] = handler
+
+    def has_service(self, domain: str, service: str) -> bool:
+        """Verifica se un servizio è registrato."""
+        return (domain, service) in self._handlers
+
+    async def async_call(
+        self,
+        domain: str,
+        service: str,
+        service_data: dict[str, Any] | None = None,
+        blocking: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        """Chiama un servizio registrato.
+
+        Raises:
+            KeyError: Se il servizio non è registrato
+        """
+        result = self._handlers[(domain, service)](
+            SimServiceCall(domain, service, service_data or {})
+        )
+        if asyncio.iscoroutine(result):
+            await result
+
+
+class _EmptyEntityRegistry:
+    """Entity registry senza voci: gli assorbimenti vengono da attributi o learner."""
+
+    def async_get(self, entity_id: str) -> None:
+        """Nessuna voce di registry."""
+        return None
+
+
+class SimHomeAssistant:
+    """Istanza Home Assistant simulata."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Inizializza l'istanza.
+
+        Args:
+            loop: Event loop (normalmente a tempo virtuale)
+        """
+        self.loop = loop
+        self.bus = SimBus(loop)
+        self.states = SimStates(self.bus)
+        self.services = SimServices()
+        self.data: dict[Any, Any] = {er.DATA_REGISTRY: _EmptyEntityRegistry()}
+
+    def async_create_task(
+        self, target: Coroutine[Any, Any, Any], name: str | None = None, **kwargs: Any
+    ) -> asyncio.Task:
+        """Crea un task sul loop."""
+        return self.loop.create_task(target, name=name)
+
+
+class SimDispatcher(StateDispatcher):
+    """Dispatcher collegato direttamente al bus simulato."""
+
+    def _async_track(self, entity_id: str) -> CALLBACK_TYPE:
+        """Si iscrive ai cambi di stato dell'entità sul bus simulato."""
+        return self.hass.bus.async_listen_state(entity_id, self._handle_event)
+
+
+def _add(listeners: list, listener: Callable) -> CALLBACK_TYPE:
+    """Aggiunge un listener e restituisce la funzione per rimuoverlo."""
+    listeners.append(listener)
+
+    def _remove() -> None:
+        if listener in listeners:
+            listeners.remove(listener)
+
+    return _remove
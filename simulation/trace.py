@@ -0,0 +1,160 @@
+"""Caricamento di tracce di potenza registrate (CSV o Parquet).
+
+Una traccia è una serie di campioni (istante, potenza in Watt). La prima colonna
+è l'istante, in secondi o come data ISO 8601 (es. un export della cronologia di
+Home Assistant); la potenza è la colonna indicata, la colonna "power" o, in
+mancanza, la seconda. Gli istanti diventano secondi relativi al primo campione.
+"""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+import csv
+from datetime import datetime
+import math
+import os
+from typing import Any
+
+# Nome di default della colonna di potenza
+POWER_COLUMN = "power"
+
+
+class PowerTrace:
+    """Serie temporale di potenza ordinata per istante."""
+
+    __slots__ = ("timestamps", "values")
+
+    def __init__(self, timestamps: array, values: array) -> None:
+        """Inizializza la traccia.
+
+        Args:
+            timestamps: Secondi dal primo campione, crescenti
+            values: Potenze in Watt
+        """
+        self.timestamps = timestamps
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self) -> Iterator[tuple[float, float]]:
+        return zip(self.timestamps, self.values)
+
+    @property
+    def duration(self) -> float:
+        """Secondi tra il primo e l'ultimo campione."""
+        return self.timestamps[-1] if self.timestamps else 0.0
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple[Any, Any]]) -> PowerTrace:
+        """Costruisce la traccia da coppie (istante, potenza).
+
+        Campioni non numerici (es. "unavailable") vengono scartati; quelli con
+        istante uguale o precedente all'ultimo accettato anche.
+
+        Args:
+            rows: Coppie (istante in secondi o ISO 8601, potenza)
+
+        Returns:
+            Traccia con istanti relativi al primo campione
+
+        Raises:
+            ValueError: Se non resta alcun campione valido
+        """
+        timestamps = array("d")
+        values = array("d")
+        origin: float | None = None
+        for raw_time, raw_value in rows:
+            try:
+                value = float(raw_value)
+                moment = _parse_time(raw_time)
+            except (TypeError, ValueError):
+                continue
+            if math.isnan(value):
+                continue
+            if origin is None:
+                origin = moment
+            moment -= origin
+            if timestamps and moment <= timestamps[-1]:
+                continue
+            timestamps.append(moment)
+            values.append(value)
+        if not values:
+            raise ValueError("La traccia non contiene campioni validi")
+        return cls(timestamps, values)
+
+
+def load_trace(path: str, column: str | None = None) -> PowerTrace:
+    """Carica una traccia da file CSV o Parquet.
+
+    Args:
+        path: File .csv o .parquet
+        column: Colonna di potenza (default: "power" o la seconda colonna)
+
+    Returns:
+        Traccia caricata
+
+    Raises:
+        ValueError: Se il formato o le colonne non sono validi
+        ImportError: Per il Parquet senza pyarrow installato
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                raise ValueError(f"{path} è vuoto")
+            index = _value_column(header, column)
+            return PowerTrace.from_rows(
+                [(row[0], row[index]) for row in reader if len(row) > index]
+            )
+
+    if extension == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as err:
+            raise ImportError(
+                "Per leggere tracce Parquet serve pyarrow (pip install pyarrow)"
+            ) from err
+        table = pq.read_table(path)
+        index = _value_column(table.column_names, column)
+        return PowerTrace.from_rows(
+            list(zip(table.column(0).to_pylist(), table.column(index).to_pylist()))
+        )
+
+    raise ValueError(f"Formato di traccia non supportato: {extension or path}")
+
+
+def _value_column(header: list[str], column: str | None) -> int:
+    """Indice della colonna di potenza.
+
+    Raises:
+        ValueError: Se la colonna richiesta non esiste
+    """
+    if column is not None:
+        if column not in header:
+            raise ValueError(f"Colonna {column} non trovata ({', '.join(header)})")
+        return header.index(column)
+    if POWER_COLUMN in header:
+        return header.index(POWER_COLUMN)
+    if len(header) < 2:
+        raise ValueError("La traccia richiede una colonna istante e una di potenza")
+    return 1
+
+
+def _parse_time(raw: Any) -> float:
+    """Converte un istante (secondi, datetime o ISO 8601) in secondi.
+
+    Raises:
+        ValueError: Se l'istante non è interpretabile
+    """
+    if isinstance(raw, datetime):
+        return raw.timestamp()
+    if isinstance(raw, (int, float)):
+        return float(raw)
+    text = str(raw).strip()
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
@@ -0,0 +1 @@
+"""Test di comportamento dell'integrazione AvoidBlackout."""
@@ -0,0 +1,208 @@
+"""Fixture comuni dei test di comportamento.
+
+I test asincroni girano sull'event loop a tempo virtuale (fixture loop del
+conftest.py nella root, condivisa con i benchmark). La fixture home monta coordinator e manager reali sul sostituto di Home
+Assistant, con un contatore che somma carico di base e dispositivi accesi.
+"""
+from __future__ import annotations
+
+from collections.abc import Coroutine
+from typing import Any
+
+import pytest
+
+from homeassistant.core import CoreState, HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import dt as dt_util
+
+from custom_components.avoidblackout.coordinator import PowerCoordinator
+from custom_components.avoidblackout.power_manager import PowerManager
+from simulation.clock import VirtualTimeLoop
+from simulation.hass import SimDispatcher, SimHomeAssistant, SimServiceCall
+
+SENSOR = "sensor.home_power"
+
+
+@pytest.fixture
+def run(loop: VirtualTimeLoop):
+    """Esegue una coroutine sul loop a tempo virtuale e ne restituisce il risultato."""
+
+    def _run(coro: Coroutine[Any, Any, Any]) -> Any:
+        return loop.run_until_complete(coro)
+
+    return _run
+
+
+@pytest.fixture
+def local_time_zone():
+    """Imposta il fuso orario locale di Home Assistant e lo ripristina a fine test."""
+    previous = dt_util.DEFAULT_TIME_ZONE
+
+    def _set(name: str) -> None:
+        dt_util.set_default_time_zone(dt_util.get_time_zone(name))
+
+    yield _set
+    dt_util.set_default_time_zone(previous)
+
+
+@pytest.fixture
+def hass(run, tmp_path):
+    """Istanza Home Assistant reale in esecuzione, con lo Store in una directory temporanea."""
+
+    async def _start() -> HomeAssistant:
+        # HomeAssistant va creato con il loop in esecuzione
+        instance = HomeAssistant(str(tmp_path))
+        instance.set_state(CoreState.running)
+        # Il manager consulta il registro delle entità per stimare gli assorbimenti
+        await er.async_load(instance)
+        return instance
+
+    instance = run(_start())
+    yield instance
+    run(instance.async_stop(force=True))
+
+
+class SimHome:
+    """Casa simulata: contatore, dispositivi gestiti e servizi switch registrati.
+
+    Il contatore legge il carico di base più l'assorbimento dei dispositivi
+    accesi; con meter_delay riporta una commutazione solo dopo quel ritardo,
+    come un contatore lento.
+    """
+
+    def __init__(self, loop: VirtualTimeLoop) -> None:
+        """Inizializza la casa, senza dispositivi e con carico di base nullo."""
+        self.loop = loop
+        self.hass = SimHomeAssistant(loop)
+        self.base = 0.0
+        self.devices: dict[str, float] = {}
+        self.meter_delay = 0.0
+        # Entità il cui servizio fallisce con un'eccezione
+        self.failing: set[str] = set()
+        # Chiamate ricevute: (secondi dall'avvio, servizio, entità)
+        self.calls: list[tuple[float, str, str]] = []
+        self.coordinator: PowerCoordinator | None = None
+        self.manager: PowerManager | None = None
+        self._started = loop.time()
+        self._report_power: dict[str, bool] = {}
+        self._reading = 0
+        for service in ("turn_off", "turn_on"):
+            self.hass.services.async_register("switch", service, self._handle_service)
+
+    @property
+    def elapsed(self) -> float:
+        """Secondi trascorsi dall'avvio del manager."""
+        return self.loop.time() - self._started
+
+    @property
+    def turned_off(self) -> list[tuple[float, str]]:
+        """Spegnimenti ricevuti: (secondi dall'avvio, entità)."""
+        return [(at, entity_id) for at, service, entity_id in self.calls if service == "turn_off"]
+
+    @property
+    def turned_on(self) -> list[tuple[float, str]]:
+        """Accensioni ricevute: (secondi dall'avvio, entità)."""
+        return [(at, entity_id) for at, service, entity_id in self.calls if service == "turn_on"]
+
+    def is_on(self, entity_id: str) -> bool:
+        """Stato corrente di un dispositivo."""
+        state = self.hass.states.get(entity_id)
+        return state is not None and state.state == "on"
+
+    def add_device(
+        self, entity_id: str, draw: float, on: bool = True, report_power: bool = True
+    ) -> None:
+        """Aggiunge un dispositivo gestito (in ordine di priorità).
+
+        Args:
+            entity_id: Entità switch
+            draw: Assorbimento da acceso in Watt
+            on: Stato iniziale
+            report_power: Se esporre l'assorbimento nell'attributo current_power_w
+        """
+        self.devices[entity_id] = draw
+        self._report_power[entity_id] = report_power
+        self._set_device(entity_id, on)
+
+    def set_base(self, power: float) -> None:
+        """Cambia il carico non gestito e aggiorna subito il contatore."""
+        self.base = power
+        self.meter()
+
+    def toggle(self, entity_id: str, on: bool) -> None:
+        """Commutazione manuale di un dispositivo (il contatore segue dopo meter_delay)."""
+        self._set_device(entity_id, on)
+        self._schedule_meter()
+
+    def meter(self) -> None:
+        """Scrive sul sensore la potenza reale corrente."""
+        power = self.base + sum(
+            draw for entity_id, draw in self.devices.items() if self.is_on(entity_id)
+        )
+        self.hass.states.async_set(
+            SENSOR,
+            f"{power:.1f}",
+            {"unit_of_measurement": "W", "reading": self._reading},
+        )
+
+    def report_every(self, period: float) -> None:
+        """Riporta la potenza ogni period secondi anche se non cambia, come un contatore reale."""
+        self._reading += 1
+        self.meter()
+        self.loop.call_later(period, self.report_every, period)
+
+    async def async_start(self, **options: Any) -> SimHome:
+        """Avvia coordinator e manager con la configurazione di prova.
+
+        Args:
+            **options: Opzioni che sostituiscono i default (soglia 3000W, debounce 10s)
+
+        Returns:
+            La casa stessa
+        """
+        config = {
+            "power_sensors": [SENSOR],
+            "max_threshold": 3000,
+            "debounce_time": 10,
+            "managed_entities": list(self.devices),
+            **options,
+        }
+        self.meter()
+        self.coordinator = PowerCoordinator(self.hass, config, SimDispatcher(self.hass))
+        await self.coordinator.async_start()
+        self.manager = PowerManager(self.hass, self.coordinator, config)
+        await self.manager.async_start()
+        self._started = self.loop.time()
+        return self
+
+    async def async_stop(self) -> None:
+        """Ferma manager e coordinator."""
+        await self.manager.async_stop()
+        await self.coordinator.async_stop()
+
+    def _set_device(self, entity_id: str, on: bool) -> None:
+        attributes = (
+            {"current_power_w": self.devices[entity_id]}
+            if self._report_power[entity_id]
+            else {}
+        )
+        self.hass.states.async_set(entity_id, "on" if on else "off", attributes)
+
+    def _schedule_meter(self) -> None:
+        if self.meter_delay > 0:
+            self.loop.call_later(self.meter_delay, self.meter)
+        else:
+            self.meter()
+
+    def _handle_service(self, call: SimServiceCall) -> None:
+        entity_id = call.data["entity_id"]
+        self.calls.append((self.elapsed, call.service, entity_id))
+        if entity_id in self.failing:
+            raise RuntimeError(f"{entity_id} non risponde")
+        self.toggle(entity_id, call.service == "turn_on")
+
+
+@pytest.fixture
+def home(loop: VirtualTimeLoop) -> SimHome:
+    """Casa simulata sul loop a tempo virtuale (avviare con home.async_start)."""
+    return SimHome(loop)
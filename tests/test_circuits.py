@@ -0,0 +1,224 @@
+"""Test dell'albero dei circuiti: propagazione degli aggiornamenti e fasi condivise."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from custom_components.avoidblackout.circuits import DEFAULT_VOLTAGE, CircuitTree
+
+MANAGED = ["switch.oven", "switch.dishwasher", "switch.ev", "switch.heat_pump"]
+
+
+def _tree() -> CircuitTree:
+    """Cucina con sensore proprio (forno come figlio) e garage senza sensori."""
+    return CircuitTree.from_config(
+        [
+            {
+                "name": "kitchen",
+                "power_sensors": ["sensor.kitchen"],
+                "max_threshold": 3500,
+                "managed_entities": ["switch.dishwasher"],
+            },
+            {
+                "name": "oven",
+                "parent": "kitchen",
+                "power_sensors": ["sensor.oven"],
+                "max_threshold": 2000,
+                "debounce_time": 5,
+                "managed_entities": ["switch.oven"],
+            },
+            {"name": "garage", "max_current": 16},
+            {
+                "name": "ev",
+                "parent": "garage",
+                "power_sensors": ["sensor.ev"],
+                "max_threshold": 3000,
+                "managed_entities": ["switch.ev"],
+            },
+            {
+                "name": "tools",
+                "parent": "garage",
+                "power_sensors": ["sensor.tools"],
+                "max_threshold": 2000,
+            },
+        ],
+        MANAGED,
+        30,
+    )
+
+
+def _powers(tree: CircuitTree) -> dict[str, float]:
+    """Potenza di ogni circuito."""
+    return {name: circuit["power"] for name, circuit in tree.as_dict().items()}
+
+
+def test_update_propagates_through_circuits_without_sensors() -> None:
+    """Un circuito senza sensori somma i figli; uno con sensori propri non li somma."""
+    tree = _tree()
+
+    assert tree.apply_sensor("sensor.ev", 2000) is False
+    assert tree.apply_sensor("sensor.tools", 1500) is False
+    assert _powers(tree) == {
+        "kitchen": 0.0,
+        "oven": 0.0,
+        "garage": 3500.0,
+        "ev": 2000.0,
+        "tools": 1500.0,
+    }
+
+    # Il garage (16 A → 3680 W) va in sovraccarico senza che lo siano i figli
+    assert tree.apply_sensor("sensor.ev", 2500) is True
+    assert tree.node("garage").threshold == 16 * DEFAULT_VOLTAGE
+    assert [node.name for node in tree.overloaded] == ["garage"]
+
+    # Il forno è già misurato dal sensore della cucina: la cucina non cambia
+    assert tree.apply_sensor("sensor.oven", 2200) is True
+    assert _powers(tree)["kitchen"] == 0.0
+    assert tree.node("kitchen").debounce == 30
+    assert tree.node("oven").debounce == 5
+    # Dal più profondo, a pari profondità per nome
+    assert [node.name for node in tree.overloaded] == ["oven", "garage"]
+
+
+def test_update_applies_delta_and_unavailable_sensor() -> None:
+    """Gli aggiornamenti applicano la differenza; un sensore non disponibile vale zero."""
+    tree = _tree()
+    tree.apply_sensor("sensor.ev", 3200)
+    tree.apply_sensor("sensor.tools", 800)
+    assert [node.name for node in tree.overloaded] == ["ev", "garage"]
+
+    assert tree.apply_sensor("sensor.ev", None) is True
+    assert _powers(tree)["garage"] == 800.0
+    assert tree.overloaded == ()
+
+    # Sensore in Ampere convertito con la tensione del circuito
+    assert tree.apply_sensor("sensor.ev", 10, "A") is False
+    assert _powers(tree)["ev"] == 10 * DEFAULT_VOLTAGE
+    assert _powers(tree)["garage"] == 800.0 + 10 * DEFAULT_VOLTAGE
+
+    # Sensori sconosciuti ignorati
+    assert tree.apply_sensor("sensor.unknown", 5000) is False
+
+
+def test_incremental_updates_match_resync() -> None:
+    """Dopo molti aggiornamenti la potenza incrementale coincide con il ricalcolo."""
+    tree = _tree()
+    rng = random.Random(1)
+    sensors = ["sensor.kitchen", "sensor.oven", "sensor.ev", "sensor.tools"]
+    for _ in range(500):
+        value = rng.choice([None, round(rng.uniform(0, 4000), 1)])
+        tree.apply_sensor(rng.choice(sensors), value)
+
+    incremental = _powers(tree)
+    overloaded = tree.overloaded
+    tree.resync()
+    assert _powers(tree) == pytest.approx(incremental)
+    assert tree.overloaded == overloaded
+
+
+def _phases_tree() -> CircuitTree:
+    """Fornitura trifase con pompa di calore sulle tre fasi e forno su L1."""
+    return CircuitTree.from_config(
+        [
+            {
+                "name": "kitchen",
+                "parent": "L1",
+                "power_sensors": ["sensor.kitchen"],
+                "max_threshold": 3500,
+                "managed_entities": ["switch.oven"],
+            },
+        ],
+        MANAGED,
+        30,
+        {
+            phase: {
+                "power_sensors": [f"sensor.{phase.lower()}_current"],
+                "max_current": 25,
+                "managed_entities": ["switch.heat_pump"],
+            }
+            for phase in ("L1", "L2", "L3")
+        },
+    )
+
+
+def test_three_phase_device_is_shared_between_phases() -> None:
+    """Un carico trifase pesa 1/3 su ogni fase; gli altri solo sul proprio circuito."""
+    tree = _phases_tree()
+
+    phases = sorted(node.name for node in tree.circuits_of("switch.heat_pump"))
+    assert phases == ["L1", "L2", "L3"]
+    assert tree.share("switch.heat_pump") == pytest.approx(1 / 3)
+    assert [node.name for node in tree.circuits_of("switch.oven")] == ["kitchen"]
+    assert tree.share("switch.oven") == 1.0
+    # Dispositivi collegati solo al contratto principale
+    assert tree.circuits_of("switch.ev") == ()
+    assert tree.share("switch.ev") == 1.0
+
+    l1, l2 = tree.node("L1"), tree.node("L2")
+    assert l1.phase and not tree.node("kitchen").phase
+    assert tree.contains(l1, "switch.oven")
+    assert not tree.contains(l2, "switch.oven")
+    assert tree.contains(l2, "switch.heat_pump")
+
+
+def test_phase_overload_in_amperes() -> None:
+    """Le fasi misurate in corrente vanno in sovraccarico oltre 25 A × tensione."""
+    tree = _phases_tree()
+    assert tree.node("L1").threshold == 25 * DEFAULT_VOLTAGE
+
+    assert tree.apply_sensor("sensor.l1_current", 20, "A") is False
+    assert tree.apply_sensor("sensor.l2_current", 26, "A") is True
+    assert [node.name for node in tree.overloaded] == ["L2"]
+    # Il circuito della cucina ha un sensore proprio: non somma nella fase
+    assert tree.apply_sensor("sensor.kitchen", 3000) is False
+    assert _powers(tree)["L1"] == 20 * DEFAULT_VOLTAGE
+
+
+def _circuit(name: str, sensor: str, **extra) -> dict:
+    """Circuito minimo con un sensore e soglia 1000 W."""
+    return {"name": name, "power_sensors": [sensor], "max_threshold": 1000, **extra}
+
+
+@pytest.mark.parametrize(
+    ("circuits", "phases"),
+    [
+        # Un dispositivo non trifase non può stare su due circuiti
+        (
+            [
+                _circuit("a", "sensor.a", managed_entities=["switch.oven"]),
+                _circuit("b", "sensor.b", managed_entities=["switch.oven"]),
+            ],
+            None,
+        ),
+        # Un dispositivo di una fase non può stare anche su un circuito
+        (
+            [_circuit("a", "sensor.a", managed_entities=["switch.heat_pump"])],
+            {
+                "L1": {
+                    "power_sensors": ["sensor.l1"],
+                    "max_current": 25,
+                    "managed_entities": ["switch.heat_pump"],
+                }
+            },
+        ),
+        # Sensore condiviso tra due circuiti
+        ([_circuit("a", "sensor.a"), _circuit("b", "sensor.a")], None),
+        # Ciclo tra padri
+        (
+            [
+                _circuit("a", "sensor.a", parent="b"),
+                _circuit("b", "sensor.b", parent="a"),
+            ],
+            None,
+        ),
+        # Circuito senza sensori né figli
+        ([{"name": "a", "max_threshold": 1000}], None),
+        # Nome riservato al contratto principale
+        ([_circuit("main", "sensor.a")], None),
+    ],
+)
+def test_invalid_tree_is_rejected(circuits, phases) -> None:
+    """Configurazioni che non descrivono un albero valido."""
+    with pytest.raises(ValueError):
+        CircuitTree.from_config(circuits, MANAGED, 30, phases)
@@ -0,0 +1,123 @@
+"""Test della pubblicazione del PowerCoordinator: coalescenza e deadband delle notifiche."""
+from __future__ import annotations
+
+import asyncio
+
+from custom_components.avoidblackout.const import STATE_MONITORING, STATE_WAITING
+
+from .conftest import SENSOR
+
+
+def _count_notifications(home) -> list[float]:
+    """Registra l'istante di ogni notifica ai listener del coordinator."""
+    notified: list[float] = []
+    home.coordinator.async_add_listener(lambda: notified.append(home.elapsed))
+    return notified
+
+
+def test_deadband_filters_only_below_threshold(run, home) -> None:
+    """Sotto soglia piccole variazioni attendono max_silence; sopra soglia si notifica sempre."""
+
+    async def _scenario() -> None:
+        home.base = 2000
+        await home.async_start(coalesce_window=0, notify_deadband=20, notify_max_silence=60)
+        notified = _count_notifications(home)
+
+        for power in (2005, 2010, 2015):
+            await asyncio.sleep(1)
+            home.set_base(power)
+        await asyncio.sleep(1)
+        assert notified == []
+
+        home.set_base(2100)
+        await asyncio.sleep(1)
+        assert notified == [4.0]
+
+        # Variazione trattenuta: notificata allo scadere del silenzio massimo
+        home.set_base(2105)
+        await asyncio.sleep(70)
+        assert notified == [4.0, 64.0]
+
+        # Sopra soglia ogni aggiornamento raggiunge la macchina a stati
+        home.set_base(3500)
+        for power in (3505, 3510, 3512):
+            await asyncio.sleep(1)
+            home.set_base(power)
+        await asyncio.sleep(0.1)
+        assert len(notified) == 6
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_flat_overload_rearms_debounce_after_no_candidates(run, home) -> None:
+    """Tornato in MONITORING ancora sopra soglia, il primo aggiornamento riavvia l'attesa."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.heater", 1000, on=False)
+        home.base = 3600
+        await home.async_start(debounce_time=10, notify_max_silence=60)
+        assert home.manager.state == STATE_WAITING
+
+        # Nessun dispositivo acceso da spegnere: il manager torna a monitorare
+        await asyncio.sleep(11)
+        assert home.manager.state == STATE_MONITORING
+        assert home.turned_off == []
+
+        # Sovraccarico piatto: una variazione di 5W (sotto la deadband) riarma il debounce
+        home.set_base(3605)
+        await asyncio.sleep(0.1)
+        assert home.manager.state == STATE_WAITING
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_burst_is_coalesced_but_crossing_is_immediate(run, home) -> None:
+    """Eventi entro la finestra confluiscono in un campione; un attraversamento no."""
+
+    async def _scenario() -> None:
+        home.base = 1000
+        await home.async_start(coalesce_window=50)
+        samples: list[float] = []
+        home.coordinator.async_add_sample_listener(lambda: samples.append(home.elapsed))
+
+        for power in (1100, 1200, 1300, 1400):
+            home.set_base(power)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        assert len(samples) == 1
+        assert home.coordinator.data["total_power"] == 1400
+
+        crossed_at = home.elapsed
+        home.set_base(3200)
+        assert home.coordinator.data["is_over_threshold"]
+        assert samples[-1] == crossed_at
+        assert home.hass.states.get(SENSOR).state == "3200.0"
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_sensor_event_notifies_inline_without_tasks(run, home) -> None:
+    """Senza coalescenza ogni evento del sensore raggiunge i listener nella stessa chiamata."""
+
+    async def _scenario() -> None:
+        home.base = 1000
+        await home.async_start(coalesce_window=0, notify_deadband=0)
+        notified = _count_notifications(home)
+        created: list[object] = []
+        create_task = home.hass.async_create_task
+
+        def _counting_create_task(*args, **kwargs):
+            created.append(args[0])
+            return create_task(*args, **kwargs)
+
+        home.hass.async_create_task = _counting_create_task
+        for index in range(1, 51):
+            home.set_base(1000 + index)
+            assert len(notified) == index
+        assert created == []
+        await home.async_stop()
+
+    run(_scenario())
@@ -0,0 +1,139 @@
+"""Test dello storico della potenza: statistiche delle finestre dopo il giro del buffer."""
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from custom_components.avoidblackout.history import PowerHistory
+
+CAPACITY = 16
+# Finestre più corte del buffer e una limitata dalla capacità
+WINDOWS = (3.0, 10.0, 1000.0)
+
+
+def _window_samples(
+    samples: list[tuple[float, float]], span: float
+) -> list[tuple[float, float]]:
+    """Campioni conservati che cadono nella finestra (l'ultimo sempre incluso)."""
+    kept = samples[-CAPACITY:]
+    horizon = kept[-1][0] - span
+    return [sample for sample in kept[:-1] if sample[0] >= horizon] + [kept[-1]]
+
+
+def _expected(samples: list[tuple[float, float]], span: float) -> dict[str, float | None]:
+    """Statistiche della finestra calcolate per forza bruta."""
+    window = _window_samples(samples, span)
+    energy = sum(value * (nxt[0] - ts) for (ts, value), nxt in zip(window, window[1:]))
+    duration = window[-1][0] - window[0][0]
+    n = len(window)
+    mean_x = sum(ts for ts, _ in window) / n
+    mean_y = sum(value for _, value in window) / n
+    sxx = sum((ts - mean_x) ** 2 for ts, _ in window)
+    syy = sum((value - mean_y) ** 2 for _, value in window)
+    sxy = sum((ts - mean_x) * (value - mean_y) for ts, value in window)
+    return {
+        "mean": energy / duration if duration > 1e-6 else window[-1][1],
+        "max": max(value for _, value in window),
+        "integral": energy,
+        "slope": sxy / sxx if n >= 2 and sxx > 1e-9 else None,
+        "r_squared": sxy * sxy / (sxx * syy) if n >= 3 and sxx > 1e-9 and syy > 1e-6 else None,
+    }
+
+
+def _assert_matches(history: PowerHistory, samples: list[tuple[float, float]]) -> None:
+    """Confronta le statistiche incrementali di ogni finestra con la forza bruta."""
+    for span in WINDOWS:
+        expected = _expected(samples, span)
+        assert history.mean(span) == pytest.approx(expected["mean"], rel=1e-9, abs=1e-6)
+        assert history.max(span) == expected["max"]
+        assert history.integral(span) == pytest.approx(expected["integral"], rel=1e-9, abs=1e-6)
+        for name in ("slope", "r_squared"):
+            value = getattr(history, name)(span)
+            if expected[name] is None:
+                assert value is None
+            else:
+                assert value == pytest.approx(expected[name], rel=1e-6, abs=1e-6)
+
+
+def _random_samples(seed: int, count: int) -> list[tuple[float, float]]:
+    """Campioni a intervalli irregolari (anche ripetuti) con potenze casuali."""
+    rng = random.Random(seed)
+    timestamp = 1000.0
+    samples = []
+    for _ in range(count):
+        timestamp += rng.choice((0.0, 0.25, 0.5, 1.0, 1.7, 4.0))
+        samples.append((timestamp, round(rng.uniform(0, 5000), 1)))
+    return samples
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_statistics_match_brute_force_after_wraparound(seed: int) -> None:
+    """Media, massimo, integrale, pendenza e R² restano esatti per più giri del buffer."""
+    history = PowerHistory(CAPACITY, WINDOWS)
+    samples = _random_samples(seed, CAPACITY * 5 + 3)
+
+    for index, (timestamp, value) in enumerate(samples):
+        history.append(timestamp, value)
+        assert len(history) == min(index + 1, CAPACITY)
+        _assert_matches(history, samples[: index + 1])
+
+    assert list(history.samples()) == samples[-CAPACITY:]
+
+
+def test_window_added_after_wraparound_is_rebuilt() -> None:
+    """Una finestra aggiunta a buffer pieno parte dai soli campioni conservati."""
+    samples = _random_samples(4, CAPACITY * 2 + 5)
+    history = PowerHistory(CAPACITY, WINDOWS[:1])
+    for timestamp, value in samples:
+        history.append(timestamp, value)
+
+    for span in WINDOWS[1:]:
+        history.add_window(span)
+    _assert_matches(history, samples)
+
+    extra = _random_samples(5, CAPACITY)
+    offset = samples[-1][0] - extra[0][0] + 1.0
+    for timestamp, value in extra:
+        samples.append((timestamp + offset, value))
+        history.append(timestamp + offset, value)
+        _assert_matches(history, samples)
+
+
+def test_clear_resets_statistics() -> None:
+    """Dopo clear le finestre ripartono da zero anche a metà giro del buffer."""
+    history = PowerHistory(CAPACITY, WINDOWS)
+    for timestamp, value in _random_samples(6, CAPACITY + 7):
+        history.append(timestamp, value)
+
+    history.clear()
+    assert len(history) == 0
+    assert history.latest is None
+    assert history.mean(WINDOWS[0]) is None
+    assert history.max(WINDOWS[0]) is None
+    assert history.slope(WINDOWS[0]) is None
+
+    samples = _random_samples(7, CAPACITY + 3)
+    for index, (timestamp, value) in enumerate(samples):
+        history.append(timestamp, value)
+        _assert_matches(history, samples[: index + 1])
+
+
+def test_r_squared_separates_ramp_from_noise() -> None:
+    """R² vicino a 1 su una rampa pulita, basso su rumore attorno a un valore stabile."""
+    rng = random.Random(8)
+    ramp = PowerHistory(CAPACITY, (10.0,))
+    noise = PowerHistory(CAPACITY, (10.0,))
+    for second in range(CAPACITY):
+        ramp.append(float(second), 1000.0 + 80.0 * second + rng.gauss(0, 15))
+        noise.append(float(second), 2900.0 + rng.gauss(0, 15))
+
+    assert ramp.slope(10.0) == pytest.approx(80.0, rel=0.05)
+    assert ramp.r_squared(10.0) > 0.99
+    assert noise.r_squared(10.0) < 0.5
+
+    flat = PowerHistory(CAPACITY, (10.0,))
+    for second in range(5):
+        flat.append(float(second), 1500.0)
+    assert flat.slope(10.0) == 0.0
+    assert flat.r_squared(10.0) is None
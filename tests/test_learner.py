@@ -0,0 +1,66 @@
+"""Test dell'apprendimento degli assorbimenti dai gradini del contatore."""
+from __future__ import annotations
+
+import asyncio
+
+from custom_components.avoidblackout.const import LEARNER_WINDOW
+
+SWITCHES = ("switch.a", "switch.b", "switch.c")
+
+
+def _samples(home) -> dict[str, int]:
+    """Numero di campioni appresi per dispositivo."""
+    learned = home.manager._learner.as_dict()
+    return {entity_id: learned.get(entity_id, {}).get("samples", 0) for entity_id in SWITCHES}
+
+
+def test_isolated_toggle_learns_the_step(run, home) -> None:
+    """Una commutazione isolata registra il gradino del dispositivo."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 1000, on=False, report_power=False)
+        home.base = 500
+        await home.async_start()
+
+        home.toggle("switch.a", True)
+        await asyncio.sleep(LEARNER_WINDOW + 1)
+        home.toggle("switch.a", False)
+        await asyncio.sleep(LEARNER_WINDOW + 1)
+
+        power, _ = home.manager._learner.estimate("switch.a")
+        assert power == 1000
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_overlapping_toggles_leave_estimates_unchanged(run, home) -> None:
+    """Un distacco a gruppi e commutazioni ravvicinate non producono campioni."""
+
+    async def _scenario() -> None:
+        for entity_id in SWITCHES:
+            home.add_device(entity_id, 1000, report_power=False)
+        home.base = 2500
+        await home.async_start(batch_shedding=True)
+        learner = home.manager._learner
+        for entity_id in SWITCHES:
+            learner._samples[entity_id].extend([1000.0] * 3)
+        before = {entity_id: learner.estimate(entity_id) for entity_id in SWITCHES}
+
+        # 5500W con soglia 3000W: i tre interruttori vengono spenti insieme
+        home.set_base(2501)
+        await asyncio.sleep(LEARNER_WINDOW * 3)
+        assert sorted(entity_id for _, entity_id in home.turned_off) == list(SWITCHES)
+        assert _samples(home) == dict.fromkeys(SWITCHES, 3)
+        assert {entity_id: learner.estimate(entity_id) for entity_id in SWITCHES} == before
+
+        # Tre accensioni a cavallo delle rispettive finestre: nessuna è attribuibile
+        home.set_base(0)
+        for entity_id in SWITCHES:
+            home.toggle(entity_id, True)
+            await asyncio.sleep(LEARNER_WINDOW * 0.6)
+        await asyncio.sleep(LEARNER_WINDOW * 2)
+        assert _samples(home) == dict.fromkeys(SWITCHES, 3)
+        await home.async_stop()
+
+    run(_scenario())
@@ -0,0 +1,124 @@
+"""Test della scrittura differita e coalescente delle options."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+
+from homeassistant import config_entries
+from homeassistant.core import HomeAssistant
+
+from custom_components.avoidblackout.const import DOMAIN
+from custom_components.avoidblackout.options_writer import OptionsWriter
+
+DELAY = 10
+
+
+@pytest.fixture
+def entry(run, hass) -> config_entries.ConfigEntry:
+    """Config entry registrata in un ConfigEntries reale."""
+
+    async def _setup() -> config_entries.ConfigEntry:
+        hass.config_entries = config_entries.ConfigEntries(hass, {})
+        await hass.config_entries.async_initialize()
+        config_entry = config_entries.ConfigEntry(
+            version=1,
+            minor_version=1,
+            domain=DOMAIN,
+            title="AvoidBlackout",
+            data={"max_threshold": 3000, "debounce_time": 30},
+            source=config_entries.SOURCE_USER,
+            options={"max_threshold": 3000},
+        )
+        hass.config_entries._entries[config_entry.entry_id] = config_entry
+        return config_entry
+
+    return run(_setup())
+
+
+def _track_updates(
+    hass: HomeAssistant, entry: config_entries.ConfigEntry
+) -> list[dict[str, Any]]:
+    """Registra le options viste dal listener ad ogni scrittura."""
+    updates: list[dict[str, Any]] = []
+
+    async def _listener(hass: HomeAssistant, entry: config_entries.ConfigEntry) -> None:
+        updates.append(dict(entry.options))
+
+    entry.add_update_listener(_listener)
+    return updates
+
+
+def test_burst_of_changes_is_written_once(run, hass, entry) -> None:
+    """Modifiche ravvicinate confluiscono in una sola scrittura dopo la quiete."""
+    updates = _track_updates(hass, entry)
+    config = {"max_threshold": 3000, "debounce_time": 30}
+    writer = OptionsWriter(hass, entry, config, DELAY)
+
+    async def _scenario() -> None:
+        for threshold in range(3100, 4100, 100):
+            writer.async_set("max_threshold", threshold)
+            # Il valore è subito in memoria, la scrittura no
+            assert config["max_threshold"] == threshold
+            await asyncio.sleep(DELAY / 2)
+        writer.async_set("debounce_time", 45)
+        assert writer.dirty
+        assert not updates
+
+        await asyncio.sleep(DELAY + 1)
+        assert updates == [{"max_threshold": 4000, "debounce_time": 45}]
+        assert not writer.dirty
+        assert writer.persisted_version == writer.version == 11
+
+        # Nessuna nuova modifica: nessuna nuova scrittura
+        await asyncio.sleep(DELAY * 3)
+        assert len(updates) == 1
+
+    run(_scenario())
+
+
+def test_discarded_change_is_not_written(run, hass, entry) -> None:
+    """Una modifica superata dall'options flow non viene scritta."""
+    updates = _track_updates(hass, entry)
+    writer = OptionsWriter(hass, entry, {"max_threshold": 3000}, DELAY)
+
+    async def _scenario() -> None:
+        writer.async_set("max_threshold", 5000)
+        writer.async_discard("max_threshold")
+        assert not writer.dirty
+        await asyncio.sleep(DELAY * 2)
+        assert not updates
+        assert entry.options == {"max_threshold": 3000}
+
+        # Scartata una sola chiave: le altre vengono comunque scritte
+        writer.async_set("max_threshold", 5000)
+        writer.async_set("debounce_time", 20)
+        writer.async_discard("max_threshold")
+        assert writer.dirty
+        await asyncio.sleep(DELAY + 1)
+        assert updates == [{"max_threshold": 3000, "debounce_time": 20}]
+
+    run(_scenario())
+
+
+def test_flush_writes_immediately(run, hass, entry) -> None:
+    """async_flush (options flow, stop) scrive subito e annulla il timer."""
+    updates = _track_updates(hass, entry)
+    writer = OptionsWriter(hass, entry, {"max_threshold": 3000}, DELAY)
+
+    async def _scenario() -> None:
+        writer.async_set("max_threshold", 4200)
+        writer.async_flush()
+        assert entry.options == {"max_threshold": 4200}
+        assert not writer.dirty
+        await asyncio.sleep(DELAY * 2)
+        # Il listener è un task: una sola notifica, nessuna seconda scrittura dal timer
+        assert updates == [{"max_threshold": 4200}]
+
+        # Flush senza modifiche in attesa: nulla da scrivere
+        writer.async_flush()
+        await asyncio.sleep(0)
+        assert len(updates) == 1
+
+    run(_scenario())
@@ -0,0 +1,206 @@
+"""Test della macchina a stati del PowerManager sulla casa simulata."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.avoidblackout.const import STATE_MONITORING
+
+
+def test_verification_waits_for_a_slow_meter(run, home) -> None:
+    """Un contatore che riporta dopo la finestra di verifica non fa spegnere il successivo."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 1000)
+        home.add_device("switch.b", 1000)
+        home.base = 2000
+        home.meter_delay = 15
+        await home.async_start(max_threshold=3500, debounce_time=30, shed_verify_window=10)
+
+        await asyncio.sleep(100)
+        assert home.turned_off == [(30, "switch.a")]
+        assert home.is_on("switch.b")
+        metrics = home.manager.get_status()["shed_metrics"]["switch.a"]
+        assert metrics["verified"] == 1
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_verification_without_drop_sheds_next(run, home) -> None:
+    """Un campione dopo il distacco senza il calo atteso fa spegnere subito il successivo."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 1000)
+        home.add_device("switch.b", 1000)
+        home.base = 2000
+        home.meter_delay = 15
+        await home.async_start(max_threshold=3500, debounce_time=30, shed_verify_window=10)
+
+        await asyncio.sleep(35)
+        # Un altro carico compensa lo spegnimento: il contatore non mostra alcun calo
+        home.set_base(3100)
+        await asyncio.sleep(10)
+        assert home.turned_off == [(30, "switch.a"), (40, "switch.b")]
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_failed_restore_is_retried_with_backoff(run, home) -> None:
+    """Una riaccensione fallita torna in coda e viene ritentata con attesa crescente."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 1000)
+        home.base = 2500
+        await home.async_start(
+            auto_restore=True, min_off_time=20, restore_spacing=5, restore_margin=100
+        )
+        await asyncio.sleep(15)
+        assert home.turned_off == [(10, "switch.a")]
+        home.failing.add("switch.a")
+        home.set_base(500)
+        home.report_every(5)
+
+        await asyncio.sleep(250)
+        # Tentativi allo scadere di min_off_time, poi dopo 30s, 60s, 120s
+        assert [round(at) for at, _ in home.turned_on] == [30, 60, 120, 240]
+        status = home.manager.get_status()
+        assert status["restore_queue"] == ["switch.a"]
+        assert status["governor"]["devices"]["switch.a"]["restore_failures"] == 4
+
+        # Il dispositivo torna a rispondere: riacceso al tentativo successivo
+        home.failing.clear()
+        await asyncio.sleep(250)
+        assert [round(at) for at, _ in home.turned_on][-1] == 480
+        assert home.is_on("switch.a")
+        status = home.manager.get_status()
+        assert status["restore_queue"] == []
+        assert status["governor"]["devices"]["switch.a"]["restore_failures"] == 0
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_hard_threshold_skips_the_debounce(run, home) -> None:
+    """Oltre la soglia di emergenza si spegne subito; sotto vale il debounce."""
+
+    async def _scenario() -> None:
+        for entity_id in ("switch.a", "switch.b", "switch.c"):
+            home.add_device(entity_id, 1000)
+        home.base = 1000
+        await home.async_start(hard_threshold_pct=50)
+        home.report_every(1)
+
+        # 6000W oltre i 4500W di emergenza: nessuna attesa, poi un distacco per campione
+        await asyncio.sleep(2.5)
+        home.set_base(3000)
+        await asyncio.sleep(1)
+        assert [entity_id for _, entity_id in home.turned_off] == ["switch.a", "switch.b"]
+        assert home.turned_off[0][0] == 2.5
+
+        # 4000W: sopra soglia ma non in emergenza, il terzo attende il debounce
+        await asyncio.sleep(15)
+        assert home.turned_off[2][1] == "switch.c"
+        assert home.turned_off[2][0] == pytest.approx(home.turned_off[1][0] + 10)
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_batch_shedding_turns_off_the_smallest_group(run, home) -> None:
+    """Il gruppo più piccolo in ordine di priorità che copre l'eccesso si spegne in un passo."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 500)
+        home.add_device("switch.b", 1000)
+        home.add_device("switch.c", 2000)
+        home.add_device("switch.d", 800)
+        home.base = 1200
+        await home.async_start(batch_shedding=True)
+
+        # 5500W su 3000W: a+b non coprono 2500W (al netto del margine), a+b+c sì
+        await asyncio.sleep(40)
+        assert home.turned_off == [(10, "switch.a"), (10, "switch.b"), (10, "switch.c")]
+        assert home.is_on("switch.d")
+        assert home.manager.state == STATE_MONITORING
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_restore_in_reverse_order_with_spacing(run, home) -> None:
+    """Le riaccensioni partono dall'ultimo spento, una alla volta e distanziate."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 1000)
+        home.add_device("switch.b", 1000)
+        home.base = 2500
+        await home.async_start(auto_restore=True, min_off_time=20, restore_spacing=30)
+        await asyncio.sleep(25)
+        assert home.turned_off == [(10, "switch.a"), (20, "switch.b")]
+
+        home.set_base(500)
+        home.report_every(5)
+        await asyncio.sleep(100)
+        (first_at, first), (second_at, second) = home.turned_on
+        assert [first, second] == ["switch.b", "switch.a"]
+        # Tempo minimo spento e distanza dall'ultima azione rispettati
+        assert first_at >= 20 + 30
+        assert second_at - first_at >= 30
+        assert home.manager.get_status()["restore_queue"] == []
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_repeated_shed_doubles_the_minimum_off_time(run, home) -> None:
+    """Un dispositivo spento di nuovo entro 15 minuti resta spento il doppio."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 400)
+        home.base = 2700
+        await home.async_start(auto_restore=True, min_off_time=20, restore_spacing=5)
+        home.report_every(1)
+
+        await asyncio.sleep(12)
+        home.set_base(1000)
+        await asyncio.sleep(28)
+        home.set_base(2700)
+        await asyncio.sleep(12)
+        home.set_base(1000)
+        await asyncio.sleep(60)
+
+        assert home.turned_off == [(10, "switch.a"), (50, "switch.a")]
+        # 20s dopo il primo distacco, 40s dopo il secondo
+        assert home.turned_on == [(30, "switch.a"), (90, "switch.a")]
+        governor = home.manager.get_status()["governor"]["devices"]["switch.a"]
+        assert governor["backoff"] == 1
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_trip_curve_waits_for_accumulated_overload(run, home) -> None:
+    """Con la curva il sovraccarico lieve attende a lungo e quello grave accorcia l'attesa."""
+
+    async def _scenario() -> None:
+        home.add_device("switch.a", 1000)
+        home.add_device("switch.b", 1000)
+        home.base = 1300
+        await home.async_start(trip_curve_enabled=True, trip_curve="1.1:100,2.0:10")
+        home.report_every(5)
+
+        # Rapporto 1.1: intervento a 100s, nessun distacco al termine del debounce fisso
+        await asyncio.sleep(60)
+        assert home.turned_off == []
+
+        # Rapporto 2.0 con il 60% del calore già accumulato: restano 4s
+        home.set_base(4000)
+        await asyncio.sleep(5)
+        assert [entity_id for _, entity_id in home.turned_off] == ["switch.a"]
+        assert home.turned_off[0][0] == pytest.approx(64, abs=0.1)
+        await home.async_stop()
+
+    run(_scenario())
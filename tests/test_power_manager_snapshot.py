@@ -0,0 +1,123 @@
+"""Test dello snapshot persistente del PowerManager (Store di Home Assistant)."""
+from __future__ import annotations
+
+import asyncio
+
+from homeassistant.core import HomeAssistant, ServiceCall
+
+from custom_components.avoidblackout.const import (
+    STATE_MONITORING,
+    STATE_SHEDDING,
+    STATE_WAITING,
+)
+from custom_components.avoidblackout.coordinator import PowerCoordinator
+from custom_components.avoidblackout.power_manager import PowerManager
+
+ENTRY_ID = "snapshot_entry"
+SENSOR = "sensor.snapshot_power"
+MANAGED = ["switch.boiler", "switch.oven", "switch.dryer"]
+CONFIG = {
+    "power_sensors": [SENSOR],
+    "max_threshold": 3000,
+    "debounce_time": 30,
+    "managed_entities": MANAGED,
+}
+
+
+def _register_switch(hass: HomeAssistant, calls: list[tuple[float, str]]) -> None:
+    """Servizio turn_off che registra l'istante e riporta la potenza sotto soglia."""
+
+    async def _turn_off(call: ServiceCall) -> None:
+        entity_id = call.data["entity_id"]
+        calls.append((hass.loop.time(), entity_id))
+        hass.states.async_set(entity_id, "off")
+        hass.states.async_set(SENSOR, "1000", {"unit_of_measurement": "W"})
+
+    hass.services.async_register("switch", "turn_off", _turn_off)
+
+
+async def _start(hass: HomeAssistant) -> tuple[PowerCoordinator, PowerManager]:
+    """Avvia coordinator e manager legati alla stessa config entry."""
+    coordinator = PowerCoordinator(hass, CONFIG)
+    await coordinator.async_start()
+    manager = PowerManager(hass, coordinator, CONFIG, ENTRY_ID)
+    await manager.async_start()
+    return coordinator, manager
+
+
+def test_snapshot_round_trip_resumes_interrupted_wait(run, hass) -> None:
+    """Un'attesa interrotta da un riavvio riprende per il solo tempo residuo."""
+    calls: list[tuple[float, str]] = []
+
+    async def _scenario() -> None:
+        _register_switch(hass, calls)
+        hass.states.async_set(SENSOR, "1000", {"unit_of_measurement": "W"})
+        for entity_id in MANAGED:
+            hass.states.async_set(entity_id, "on")
+
+        coordinator, manager = await _start(hass)
+        hass.states.async_set(SENSOR, "3600", {"unit_of_measurement": "W"})
+        await asyncio.sleep(12)
+        assert manager.state == STATE_WAITING
+        assert not calls
+        await manager.async_stop()
+        await coordinator.async_stop()
+        assert manager.state == STATE_MONITORING
+
+        coordinator, manager = await _start(hass)
+        restarted = hass.loop.time()
+        assert manager.state == STATE_WAITING
+        await asyncio.sleep(30)
+        await manager.async_stop()
+        await coordinator.async_stop()
+        # Restano 18s dei 30 di debounce, non un'attesa completa
+        assert [entity_id for _, entity_id in calls] == ["switch.boiler"]
+        assert 16 <= calls[0][0] - restarted <= 20
+
+    run(_scenario())
+
+
+def test_snapshot_round_trip_discards_stale_devices(run, hass) -> None:
+    """Spenti e riaccensioni in coda sopravvivono al riavvio solo se ancora validi."""
+
+    async def _scenario() -> None:
+        hass.states.async_set(SENSOR, "1000", {"unit_of_measurement": "W"})
+        for entity_id in MANAGED:
+            hass.states.async_set(entity_id, "off")
+
+        coordinator, manager = await _start(hass)
+        manager._state = STATE_SHEDDING
+        manager._current_priority_index = 2
+        manager._shutdown_entities = ["switch.boiler", "switch.oven", "switch.removed"]
+        manager._restore_queue = {"switch.dryer": 800.0, "switch.oven": 2000.0}
+        manager._governor.record_shed("switch.boiler", hass.loop.time())
+        manager._governor.record_shed("switch.removed", hass.loop.time())
+        await manager.async_stop()
+        await coordinator.async_stop()
+
+        # Il forno è stato riacceso a mano durante il riavvio
+        hass.states.async_set("switch.oven", "on")
+        restored = PowerManager(hass, coordinator, CONFIG, ENTRY_ID)
+        await restored._async_load_snapshot()
+        assert restored.state == STATE_SHEDDING
+        assert restored.shutdown_entities == ("switch.boiler",)
+        assert restored._restore_queue == {"switch.dryer": 800.0}
+        assert restored._current_priority_index == 2
+        # Il governatore dimentica i dispositivi non più gestiti
+        governor = restored._governor.as_dict(hass.loop.time())
+        assert list(governor["devices"]) == ["switch.boiler"]
+
+        # Un'altra config entry non vede lo snapshot
+        other = PowerManager(hass, coordinator, CONFIG, "other_entry")
+        await other._async_load_snapshot()
+        assert other.state == STATE_MONITORING
+        assert other.shutdown_entities == ()
+
+        # Rimossa la config entry, lo snapshot non viene più ripristinato
+        await PowerManager.async_remove_store(hass, ENTRY_ID)
+        removed = PowerManager(hass, coordinator, CONFIG, ENTRY_ID)
+        await removed._async_load_snapshot()
+        assert removed.state == STATE_MONITORING
+        assert removed.shutdown_entities == ()
+
+    run(_scenario())
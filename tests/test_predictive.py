@@ -0,0 +1,84 @@
+"""Test del distacco predittivo: preavviso dal trend e replay di tracce sintetiche."""
+from __future__ import annotations
+
+import argparse
+import asyncio
+
+import pytest
+
+from benchmarks.bench_predictive_replay import _run
+from custom_components.avoidblackout.const import STATE_MONITORING
+
+LOAD = "switch.load"
+
+
+async def _ramp(home, start: float, rate: float, seconds: int) -> None:
+    """Fa salire la potenza totale di rate W/s per seconds secondi, un campione al secondo."""
+    draw = home.devices[LOAD]
+    for second in range(seconds):
+        home.set_base(start + rate * second - draw)
+        await asyncio.sleep(1)
+
+
+def _crossing_delay(home, crossed_at: float) -> float:
+    """Secondi tra il superamento della soglia e lo spegnimento del carico."""
+    assert [entity_id for _, entity_id in home.turned_off] == [LOAD]
+    return home.turned_off[0][0] - crossed_at
+
+
+def test_slow_ramp_does_not_shorten_debounce(run, home) -> None:
+    """Una rampa lenta prevista con largo anticipo non accorcia il debounce."""
+
+    async def _scenario() -> None:
+        home.add_device(LOAD, 1000)
+        home.base = 1000
+        await home.async_start(
+            debounce_time=30, predictive_shedding=True, predictive_horizon=60
+        )
+        # 20 W/s: superamento previsto un minuto prima, ma pendenza sotto il minimo
+        await _ramp(home, 2000, 20, 50)
+        crossed_at = home.elapsed
+        await _ramp(home, 3000, 20, 40)
+        assert _crossing_delay(home, crossed_at) == pytest.approx(30, abs=1)
+        await home.async_stop()
+
+    run(_scenario())
+
+
+def test_lead_is_capped_at_half_debounce(run, home) -> None:
+    """Un trend deciso seguito da un gradino accorcia il debounce al più della metà."""
+
+    async def _scenario() -> None:
+        home.add_device(LOAD, 1000)
+        home.base = 0
+        await home.async_start(
+            max_threshold=8000,
+            debounce_time=30,
+            predictive_shedding=True,
+            predictive_horizon=60,
+        )
+        # 110 W/s: superamento previsto oltre il debounce per tutta la rampa
+        await _ramp(home, 1000, 110, 28)
+        assert home.manager.state == STATE_MONITORING
+        crossed_at = home.elapsed
+        home.set_base(8500)
+        await asyncio.sleep(40)
+        assert _crossing_delay(home, crossed_at) == pytest.approx(15, abs=0.5)
+        await home.async_stop()
+
+    run(_scenario())
+
+
+@pytest.mark.parametrize("debounce", [10, 30])
+def test_replay_has_no_false_or_early_sheds(debounce) -> None:
+    """Sulle tracce sintetiche la previsione non anticipa né inventa distacchi."""
+    args = argparse.Namespace(traces=40, debounce=debounce, seed=1)
+    reactive = _run(args, predictive=False)
+    predictive = _run(args, predictive=True)
+
+    assert predictive["false_alarm_rate"] == 0
+    assert predictive["false_shed_rate"] == 0
+    assert predictive["early_shed_rate"] == 0
+    assert predictive["shed_count"] == reactive["shed_count"]
+    assert debounce / 2 <= predictive["shed_min"]
+    assert predictive["shed_max"] <= reactive["shed_max"]
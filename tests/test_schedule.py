@@ -0,0 +1,161 @@
+"""Test della soglia per fasce orarie: fasce notturne e transizioni a cavallo della settimana."""
+from __future__ import annotations
+
+from datetime import datetime
+
+import pytest
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.avoidblackout.schedule import (
+    DAY_SECONDS,
+    WEEK_SECONDS,
+    ThresholdSchedule,
+    ThresholdScheduler,
+)
+
+
+def _at(day: int, hour: int, minute: int = 0) -> int:
+    """Secondi da lunedì 00:00 (day: 0 = lunedì)."""
+    return day * DAY_SECONDS + hour * 3600 + minute * 60
+
+
+def test_overnight_range_wraps_into_next_day_and_week() -> None:
+    """Una fascia 22:00-06:00 di tutti i giorni copre anche lunedì mattina."""
+    schedule = ThresholdSchedule.from_config(
+        [{"start": "22:00", "end": "06:00", "max_threshold": 6000}]
+    )
+
+    assert schedule.threshold_at(_at(0, 5, 59)) == 6000  # da domenica sera
+    assert schedule.threshold_at(_at(0, 6)) is None
+    assert schedule.threshold_at(_at(2, 21, 59)) is None
+    assert schedule.threshold_at(_at(2, 22)) == 6000
+    assert schedule.threshold_at(_at(6, 23, 59)) == 6000
+
+    assert schedule.next_transition(_at(2, 12)) == (_at(2, 22), 6000)
+    assert schedule.next_transition(_at(2, 23)) == (_at(3, 6), None)
+    # Domenica notte: la fascia prosegue oltre la fine della settimana
+    assert schedule.next_transition(_at(6, 23)) == (WEEK_SECONDS + _at(0, 6), None)
+    # Lunedì 00:00 (fascia di domenica) più 06:00 e 22:00 di ogni giorno: le
+    # mezzanotti successive hanno la stessa soglia e si fondono
+    assert len(schedule) == 1 + 2 * 7
+
+
+def test_single_day_range_crossing_the_week_boundary() -> None:
+    """La fascia di domenica 23:00-01:00 viene spezzata sul lunedì successivo."""
+    schedule = ThresholdSchedule.from_config(
+        [{"days": ["sun"], "start": "23:00", "end": "01:00", "max_threshold": 4500}]
+    )
+
+    assert schedule.threshold_at(_at(0, 0, 30)) == 4500
+    assert schedule.threshold_at(_at(0, 1)) is None
+    assert schedule.threshold_at(_at(5, 23, 30)) is None
+    assert schedule.threshold_at(_at(6, 23, 30)) == 4500
+
+    assert schedule.next_transition(_at(5, 12)) == (_at(6, 23), 4500)
+    assert schedule.next_transition(_at(6, 23, 30)) == (WEEK_SECONDS + _at(0, 1), None)
+    assert schedule.next_transition(_at(0, 0, 30)) == (_at(0, 1), None)
+    assert schedule.as_list() == [
+        {"day": "mon", "time": "0:00:00", "threshold": 4500},
+        {"day": "mon", "time": "1:00:00", "threshold": None},
+        {"day": "sun", "time": "23:00:00", "threshold": 4500},
+    ]
+
+
+def test_adjacent_ranges_merge_and_full_day_range() -> None:
+    """Fasce contigue con la stessa soglia si fondono; start uguale a end copre il giorno."""
+    schedule = ThresholdSchedule.from_config(
+        [
+            {"days": ["sat"], "start": "00:00", "end": "00:00", "max_threshold": 5000},
+            {"days": ["sun"], "start": "00:00", "end": "12:00", "max_threshold": 5000},
+        ]
+    )
+
+    assert schedule.as_list() == [
+        {"day": "mon", "time": "0:00:00", "threshold": None},
+        {"day": "sat", "time": "0:00:00", "threshold": 5000},
+        {"day": "sun", "time": "12:00:00", "threshold": None},
+    ]
+    assert schedule.next_transition(_at(5, 8)) == (_at(6, 12), None)
+
+
+def test_constant_schedule_has_no_transition() -> None:
+    """Senza cambi di soglia non viene programmata alcuna transizione."""
+    schedule = ThresholdSchedule.from_config(
+        [{"start": "00:00", "end": "00:00", "max_threshold": 4000}]
+    )
+
+    assert len(schedule) == 1
+    assert schedule.threshold_at(_at(3, 15)) == 4000
+    assert schedule.next_transition(_at(3, 15)) is None
+
+
+@pytest.mark.parametrize(
+    "ranges",
+    [
+        [
+            {"start": "22:00", "end": "06:00", "max_threshold": 6000},
+            {"days": ["mon"], "start": "05:00", "end": "07:00", "max_threshold": 4000},
+        ],
+        [
+            {"days": ["sun"], "start": "20:00", "end": "02:00", "max_threshold": 6000},
+            {"days": ["mon"], "start": "01:00", "end": "03:00", "max_threshold": 4000},
+        ],
+        [{"start": "25:00", "end": "06:00", "max_threshold": 6000}],
+        [{"days": ["xyz"], "start": "22:00", "end": "06:00", "max_threshold": 6000}],
+        [{"start": "22:00", "end": "06:00", "max_threshold": 10}],
+        [{"start": "22:00", "end": "06:00"}],
+        {"start": "22:00", "end": "06:00", "max_threshold": 6000},
+    ],
+)
+def test_invalid_ranges_are_rejected(ranges) -> None:
+    """Sovrapposizioni (anche oltre la fine della settimana) e valori non validi."""
+    with pytest.raises(ValueError):
+        ThresholdSchedule.from_config(ranges)
+
+
+class _ThresholdTarget:
+    """Coordinator o manager finto: registra le soglie applicate."""
+
+    def __init__(self, applied: list[tuple[str, int]], name: str) -> None:
+        self._applied = applied
+        self._name = name
+
+    def update_threshold(self, threshold: int) -> None:
+        self._applied.append((self._name, threshold))
+
+
+def test_scheduler_applies_overnight_range_and_schedules_week_wrap(
+    hass, local_time_zone
+) -> None:
+    """Domenica notte vale la fascia; la transizione successiva è lunedì 06:00 locale."""
+    local_time_zone("Europe/Rome")
+    applied: list[tuple[str, int]] = []
+    scheduler = ThresholdScheduler(
+        hass,
+        _ThresholdTarget(applied, "coordinator"),
+        _ThresholdTarget(applied, "manager"),
+        3000,
+        ThresholdSchedule.from_config(
+            [{"start": "22:00", "end": "06:00", "max_threshold": 6000}]
+        ),
+    )
+    zone = dt_util.get_time_zone("Europe/Rome")
+
+    # Domenica 27/10/2024 è anche il giorno del ritorno all'ora solare
+    scheduler._async_update(dt_util.as_utc(datetime(2024, 10, 27, 23, 30, tzinfo=zone)))
+    assert scheduler.threshold == 6000
+    # Il manager viene aggiornato prima del coordinator
+    assert applied == [("manager", 6000), ("coordinator", 6000)]
+    assert scheduler.next_change == datetime(2024, 10, 28, 6, 0, tzinfo=zone)
+
+    scheduler.async_stop()
+    scheduler._async_handle_transition(
+        dt_util.as_utc(datetime(2024, 10, 28, 6, 0, tzinfo=zone))
+    )
+    assert scheduler.threshold == 3000
+    assert applied[-2:] == [("manager", 3000), ("coordinator", 3000)]
+    assert scheduler.next_change == datetime(2024, 10, 28, 22, 0, tzinfo=zone)
+
+    scheduler.async_stop()
+    assert scheduler.next_change is None